@@ -1,22 +1,98 @@
-from flask import Flask, request, jsonify, g
+from flask import Flask, Response, request, jsonify, g, has_app_context, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 import cloudscraper
+import requests
 import trafilatura
 import random
 import os
 import re
 import json
+import math
 import time
+import bisect
+import gzip
+import hashlib
+import cProfile
+import hmac
+import atexit
+import base64
 import logging
+import logging.handlers
+import pstats
+import queue
+import socket
+import sqlite3
+import threading
+import uuid
 import concurrent.futures
-from collections import defaultdict
-from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from itertools import islice
+from bs4 import BeautifulSoup, CData, Comment, NavigableString, Tag
+from bs4.dammit import EntitySubstitution
 from urllib.parse import urljoin, urlparse
+import urllib.robotparser
+import urllib3.connection
+import urllib3.util.connection
 
 # Robust decoding + mojibake repair
 from charset_normalizer import from_bytes  # pip install charset-normalizer
 from ftfy import fix_text                  # pip install ftfy
 
+# Optional accelerators — the app works without them
+try:
+    import orjson                          # pip install orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli                          # pip install brotli
+except ImportError:
+    brotli = None
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Fast JSON encoding (orjson when available, stdlib otherwise)
+# ────────────────────────────────────────────────────────────────────────────────
+JSON_ENCODER = os.environ.get("JSON_ENCODER", "auto").strip().lower()  # auto | orjson | stdlib
+_ORJSON_OPTS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+def json_dumps_bytes(obj) -> bytes:
+    """Compact, key-sorted UTF-8 JSON; falls back to stdlib for anything orjson rejects."""
+    if orjson is not None and JSON_ENCODER != "stdlib":
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTS)
+        except TypeError:  # orjson.JSONEncodeError subclasses TypeError (e.g. ints > 64 bit)
+            pass
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def json_loads(text):
+    """Parse JSON with orjson when available; stdlib for anything orjson rejects."""
+    if orjson is not None and JSON_ENCODER != "stdlib":
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:  # e.g. NaN or > 64-bit ints, which stdlib accepts
+            pass
+    return json.loads(text)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes responses with json_dumps_bytes()."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs or orjson is None or JSON_ENCODER == "stdlib":
+            return super().dumps(obj, **kwargs)
+        return json_dumps_bytes(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        if orjson is None or JSON_ENCODER == "stdlib" or self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(json_dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Structured JSON request logging
@@ -25,6 +101,217 @@ import sys
 logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
 logger = logging.getLogger("pagescraper")
 
+# Request threads only enqueue log records; one listener thread does the stdout writes
+_LOG_QUEUE = queue.SimpleQueue()
+_LOG_STDOUT = logging.StreamHandler(sys.stdout)
+_LOG_STDOUT.setFormatter(logging.Formatter("%(message)s"))
+_LOG_LISTENER = logging.handlers.QueueListener(_LOG_QUEUE, _LOG_STDOUT)
+_LOG_HANDLER = logging.handlers.QueueHandler(_LOG_QUEUE)
+logger.addHandler(_LOG_HANDLER)
+logger.propagate = False
+_LOG_LISTENER.start()
+
+
+def restart_log_listener():
+    """Give a forked worker its own queue + listener thread (threads do not survive fork)."""
+    global _LOG_QUEUE, _LOG_LISTENER
+    _LOG_QUEUE = queue.SimpleQueue()
+    _LOG_LISTENER = logging.handlers.QueueListener(_LOG_QUEUE, _LOG_STDOUT)
+    _LOG_HANDLER.queue = _LOG_QUEUE
+    _LOG_LISTENER.start()
+
+
+atexit.register(lambda: _LOG_LISTENER.stop())
+
+def native_lock():
+    """An OS-thread lock, even when gevent has patched threading.
+
+    A patched threading.Lock is a greenlet lock bound to the hub; it is not safe to
+    share with the native _CPU_POOL threads that run extraction in async mode. Only
+    for short critical sections that never yield: a greenlet blocking on it stalls
+    the hub until the holder lets go.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return threading.Lock()
+    return monkey.get_original("threading", "Lock")()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Metrics: per-stage latency histograms + request counters (Prometheus text format)
+# ────────────────────────────────────────────────────────────────────────────────
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+
+
+class Metrics:
+    """Tiny in-process metrics registry — counters and fixed-bucket histograms.
+
+    Each observation is a bisect plus a few integer adds under one lock, cheap
+    enough to leave on for every request. Values are per worker process.
+    """
+
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = native_lock()
+        self.histograms = {}   # (name, labels) -> {"counts": [...], "sum": float, "count": int}
+        self.counters = {}     # (name, labels) -> float
+        self.help = {}         # name -> (type, help text)
+
+    @staticmethod
+    def _labels(labels: dict) -> tuple:
+        def fmt(v):
+            if v is None:
+                return ""
+            if isinstance(v, bool):
+                return "true" if v else "false"
+            return str(v)
+        return tuple(sorted((k, fmt(v)) for k, v in labels.items()))
+
+    def describe(self, name: str, kind: str, text: str):
+        self.help[name] = (kind, text)
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, self._labels(labels))
+        idx = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self.histograms[key] = h
+            h["counts"][idx] += 1
+            h["sum"] += value
+            h["count"] += 1
+
+    def reset(self):
+        """Drop every recorded value (keeps the HELP/TYPE descriptions)."""
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, self._labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @staticmethod
+    def _fmt_labels(labels) -> str:
+        if not labels:
+            return ""
+        inner = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels)
+        return "{" + inner + "}"
+
+    def render(self, extra_counters=None) -> str:
+        """Prometheus text exposition (version 0.0.4)."""
+        with self.lock:
+            histograms = {k: {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]}
+                          for k, v in self.histograms.items()}
+            counters = dict(self.counters)
+        for name, value in (extra_counters or {}).items():
+            counters[(name, ())] = value
+
+        lines = []
+        seen = set()
+
+        def header(name, default_kind):
+            if name in seen:
+                return
+            seen.add(name)
+            kind, text = self.help.get(name, (default_kind, name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels) in sorted(counters):
+            header(name, "counter")
+            lines.append(f"{name}{self._fmt_labels(labels)} {counters[(name, labels)]:g}")
+        for (name, labels) in sorted(histograms):
+            header(name, "histogram")
+            h = histograms[(name, labels)]
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), h["counts"]):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{name}_bucket{self._fmt_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{self._fmt_labels(labels)} {h['sum']:.6f}")
+            lines.append(f"{name}_count{self._fmt_labels(labels)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+METRICS.describe("pagescraper_stage_seconds", "histogram",
+                 "Time spent in each pipeline stage (fetch, reader, decode, schema, focus, extract, outline, tables, encode).")
+METRICS.describe("pagescraper_request_seconds", "histogram",
+                 "End-to-end request latency by outcome reason, reader use and cache hit.")
+METRICS.describe("pagescraper_requests_total", "counter",
+                 "Requests by path, HTTP status, outcome reason, reader use and cache hit.")
+METRICS.describe("pagescraper_response_bytes_total", "counter",
+                 "Response body bytes on the wire (above COMPRESS_MIN_BYTES) by content encoding.")
+METRICS.describe("pagescraper_response_uncompressed_bytes_total", "counter",
+                 "Response body bytes before compression, by content encoding.")
+METRICS.describe("pagescraper_jobs_total", "counter", "Background /jobs results by status and reason.")
+METRICS.describe("pagescraper_job_seconds", "histogram", "Background /jobs run time (excluding queue wait).")
+METRICS.describe("pagescraper_coalesce_leaders_total", "counter", "Single-flight reads that ran the pipeline.")
+METRICS.describe("pagescraper_coalesced_total", "counter", "Reads that shared an in-flight result.")
+METRICS.describe("pagescraper_coalesce_follower_timeouts_total", "counter",
+                 "Coalesced reads that hit their own hard limit while waiting.")
+
+
+# Per-thread trace of the request currently running the pipeline (parse counters)
+_TRACE_LOCAL = threading.local()
+
+
+@contextmanager
+def bind_trace(trace: dict):
+    previous = getattr(_TRACE_LOCAL, "trace", None)
+    _TRACE_LOCAL.trace = trace
+    try:
+        yield trace
+    finally:
+        _TRACE_LOCAL.trace = previous
+
+
+class ExtractDeadline(Exception):
+    """The read's hard limit ran out between CPU stages; the pipeline answers TIMEOUT."""
+
+
+def deadline_passed() -> bool:
+    """True once the bound trace's deadline (start + hard_limit of the read) is behind us."""
+    trace = getattr(_TRACE_LOCAL, "trace", None)
+    deadline = trace.get("deadline") if trace is not None else None
+    return deadline is not None and time.time() >= deadline
+
+
+def check_deadline(stage: str):
+    """Raise ExtractDeadline before `stage` when the bound trace's deadline has passed."""
+    if deadline_passed():
+        raise ExtractDeadline(f"Hard limit reached before {stage}")
+
+
+def note_parse(kind: str):
+    """Count a full document parse against the bound trace, if any."""
+    trace = getattr(_TRACE_LOCAL, "trace", None)
+    if trace is not None:
+        parses = trace.setdefault("parses", {})
+        parses[kind] = parses.get(kind, 0) + 1
+
+
+@contextmanager
+def stage_timer(name: str, trace: dict | None = None):
+    """Time a pipeline stage into METRICS (and into trace["stages"] when given)."""
+    t0 = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        METRICS.observe("pagescraper_stage_seconds", elapsed, stage=name, outcome=outcome)
+        if trace is not None:
+            stages = trace.setdefault("stages", {})
+            stages[name] = stages.get(name, 0.0) + elapsed
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Adaptive rate limiter: escalating punishment, fast rejects, good actors unaffected
 # ────────────────────────────────────────────────────────────────────────────────
@@ -78,13 +365,16 @@ class AbuseDetector:
                 del self.violations[ip]
                 self.bans.pop(ip, None)
 
-    def _caller_ip(self):
+    def caller_ip(self):
         return request.headers.get("X-Forwarded-For", request.remote_addr) or "unknown"
 
-    def _detect_abuse(self, ip, now):
-        """Returns abuse reason string or None if behavior looks legitimate."""
+    def _detect_abuse(self, ip, now, pending=()):
+        """Returns abuse reason string or None if behavior looks legitimate.
+
+        `pending` hits are judged as if already recorded (a /jobs batch before it is accepted).
+        """
         cutoff = now - self.window
-        recent = [(t, d) for t, d in self.ip_hits.get(ip, []) if t > cutoff]
+        recent = [(t, d) for t, d in self.ip_hits.get(ip, []) if t > cutoff] + list(pending)
         total = len(recent)
         if total < 10:
             return None  # not enough data to judge
@@ -110,7 +400,7 @@ class AbuseDetector:
     def check(self, target_url=None):
         """Returns (allowed: bool, reason: str|None, retry_after: int|None)."""
         now = time.time()
-        ip = self._caller_ip()
+        ip = self.caller_ip()
         self._cleanup(now)
 
         # ── Cheapest check: active ban ──
@@ -136,8 +426,39 @@ class AbuseDetector:
         abuse_reason = self._detect_abuse(ip, now)
         if not abuse_reason:
             return True, None, None  # legitimate — no limits
+        return self._escalate(ip, now, abuse_reason)
+
+    def check_batch(self, target_urls, ip=None, new_request=True):
+        """check() for a /jobs batch or a /crawl page: every URL is charged as one hit against the caller.
+
+        The batch is judged as a whole before any of it is recorded, so an abusive batch is
+        rejected outright (one violation) and a clean one leaves the same trail as that many
+        /read calls. The global valve counts the request once (new_request): the job queue
+        and the crawl scheduler pace the fetches. ip is given when charging outside the
+        request (pages a /crawl schedules while it streams).
+        """
+        now = time.time()
+        ip = ip or self.caller_ip()
+        self._cleanup(now)
 
-        # Escalate
+        ban = self.bans.get(ip)
+        if ban and now < ban["until"]:
+            return False, "BANNED", int(ban["until"] - now) + 1
+
+        if new_request:
+            self.global_hits.append(now)
+            one_min_ago = now - 60
+            if sum(1 for t in self.global_hits if t > one_min_ago) >= self.global_rpm_hard:
+                return False, "GLOBAL_LIMIT", 3
+
+        pending = [(now, urlparse(u).hostname) for u in target_urls]
+        abuse_reason = self._detect_abuse(ip, now, pending)
+        if abuse_reason:
+            return self._escalate(ip, now, abuse_reason)
+        self.ip_hits[ip].extend(pending)
+        return True, None, None
+
+    def _escalate(self, ip, now, abuse_reason):
         v = self.violations[ip]
         v["count"] += 1
         v["last"] = now
@@ -156,47 +477,150 @@ class AbuseDetector:
 RATE_LIMITER = AbuseDetector()
 
 
+def request_body() -> dict:
+    """The request's JSON body, parsed once per request and cached on g."""
+    body = getattr(g, "req_body", None)
+    if body is None:
+        body = request.get_json(force=True, silent=True)
+        if not isinstance(body, dict):
+            body = {}
+        g.req_body = body
+    return body
+
+
+def note_outcome(ok, reason=None, length=0):
+    """Record the response outcome on g so _log_request never has to decode the response."""
+    if has_app_context():
+        g.resp_ok = ok
+        g.resp_reason = reason
+        g.resp_length = length or 0
+
+
 @app.before_request
 def _pre_request():
     g.req_start = time.time()
     g.req_url = None
     g.rate_limit_reason = None
-
-    # Abuse detection on POST endpoints (i.e., /read)
+    g.coalesced = False
+    g.coalesced_waiters = 0
+    g.used_reader = None
+    g.admitted = False
+    g.timeouts = None
+    g.net = None
+    g.extract_variant = None
+    g.req_body = None
+    g.resp_ok = None
+    g.resp_reason = None
+    g.resp_length = 0
+    g.streamed = False
+
+    # Abuse detection on POST endpoints (i.e., /read); /jobs and /crawl charge each URL themselves
     if request.method == "POST":
-        body = request.get_json(force=True, silent=True) or {}
+        body = request_body()
         target_url = body.get("url")
         g.req_url = target_url
+        if request.endpoint in ("create_jobs", "crawl"):
+            return None
         allowed, reason, retry_after = RATE_LIMITER.check(target_url=target_url)
         if not allowed:
-            g.rate_limit_reason = reason
-            resp = jsonify({
-                "ok": False,
-                "reason": reason,
-                "message": f"Rate limited: {reason}",
-                "retry_after": retry_after,
-            })
-            resp.status_code = 429
-            resp.headers["Retry-After"] = str(retry_after or 5)
-            return resp
+            return rate_limited_response(reason, retry_after)
+
+
+def rate_limited_response(reason, retry_after):
+    """The 429 answer for a request the AbuseDetector turned away."""
+    g.rate_limit_reason = reason
+    note_outcome(False, reason)
+    resp = jsonify({
+        "ok": False,
+        "reason": reason,
+        "message": f"Rate limited: {reason}",
+        "retry_after": retry_after,
+    })
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(retry_after or 5)
+    return resp
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Response compression (br/gzip) negotiated from Accept-Encoding
+# ────────────────────────────────────────────────────────────────────────────────
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1400") or "1400")
+COMPRESS_MIMETYPES = {"application/json", "application/x-ndjson", "text/plain", "text/html"}
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4   # br q4 is about gzip-6 size at a fraction of the CPU
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 1.0
+        accepted[token] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+@app.after_request
+def _compress_response(response):
+    if (COMPRESS_MIN_BYTES <= 0
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+    if not encoding:
+        METRICS.inc("pagescraper_response_bytes_total", len(data), encoding="identity")
+        return response
+    with stage_timer("compress"):
+        compressed = compress_bytes(data, encoding)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    METRICS.inc("pagescraper_response_bytes_total", len(compressed), encoding=encoding)
+    METRICS.inc("pagescraper_response_uncompressed_bytes_total", len(data), encoding=encoding)
+    return response
 
 
 @app.after_request
 def _log_request(response):
+    # A streamed /read is still running here; read_stream_records() logs it at its summary
+    if not getattr(g, "streamed", False):
+        log_request_line(response.status_code)
+    return response
+
+
+def log_request_line(status: int):
+    """Write the request's log line and count it in the request metrics, from what is on g."""
     elapsed = round(time.time() - getattr(g, "req_start", time.time()), 3)
     target_url = getattr(g, "req_url", None)
 
-    ok = None
-    reason = None
-    content_length = 0
-    try:
-        resp_data = response.get_json(silent=True)
-        if resp_data and isinstance(resp_data, dict):
-            ok = resp_data.get("ok")
-            reason = resp_data.get("reason")
-            content_length = resp_data.get("length", 0)
-    except Exception:
-        pass
+    ok = getattr(g, "resp_ok", None)
+    reason = getattr(g, "resp_reason", None)
+    content_length = getattr(g, "resp_length", 0)
 
     log_entry = {
         "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
@@ -206,15 +630,37 @@ def _log_request(response):
         "target_domain": urlparse(target_url).hostname if target_url else None,
         "caller_ip": request.headers.get("X-Forwarded-For", request.remote_addr),
         "caller_ua": request.headers.get("User-Agent"),
-        "status": response.status_code,
+        "status": status,
         "ok": ok,
         "reason": reason,
         "rate_limited": getattr(g, "rate_limit_reason", None),
         "content_length": content_length,
+        "coalesced": getattr(g, "coalesced", False),
+        "coalesced_waiters": getattr(g, "coalesced_waiters", 0),
+        "used_reader": getattr(g, "used_reader", None),
+        "timeouts": getattr(g, "timeouts", None),
+        "net": getattr(g, "net", None),
+        "extract_variant": getattr(g, "extract_variant", None),
         "elapsed_s": elapsed,
     }
     logger.info(json.dumps(log_entry))
-    return response
+
+    # Label by route, not raw path, so scanned and 404 paths cannot grow the series set
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    observe_request(route, status, ok, reason, log_entry["used_reader"], log_entry["coalesced"], elapsed)
+
+
+def observe_request(route, status, ok, reason, used_reader, cache_hit, elapsed):
+    """Count one finished request in pagescraper_requests_total (and the /read latency histogram)."""
+    labels = {
+        # "DOMAIN_SCRAPING:<domain>" / "BANNED:<reason>" keep only their kind: a label per domain is unbounded
+        "reason": reason.split(":", 1)[0] if reason else ("OK" if ok else None),
+        "used_reader": used_reader,
+        "cache_hit": cache_hit,
+    }
+    METRICS.inc("pagescraper_requests_total", path=route, status=status, **labels)
+    if route == "/read":
+        METRICS.observe("pagescraper_request_seconds", elapsed, **labels)
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -293,13 +739,27 @@ def domain_key(url: str) -> str:
     parsed = urlparse(url)
     return (parsed.hostname or "").lower()
 
+def normalize_url(url: str) -> str:
+    """Canonical form for dedup/coalescing: lowercase scheme+host, no default port, no fragment."""
+    parsed = urlparse((url or "").strip())
+    scheme = (parsed.scheme or "").lower()
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = parsed.path or "/"
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"{scheme}://{host}{path}{query}"
+
 def build_headers(profile: dict) -> dict:
     headers = dict(profile)
     headers["Referer"] = "https://www.google.com"
     return headers
 
+READER_BASE_URL = os.environ.get("READER_BASE_URL", "https://r.jina.ai/")
+
 def build_reader_url(url: str) -> str:
-    return f"https://r.jina.ai/{url}"
+    return f"{READER_BASE_URL}{url}"
 
 def parse_reader_text(text: str):
     title = None
@@ -325,6 +785,8 @@ def detect_soft_block(html: str) -> str | None:
             return marker
     return None
 
+ROBOTS_USER_AGENT = "page_scraper"
+
 def parse_crawl_delay(robots_txt: str) -> float | None:
     current_agent = None
     for line in (robots_txt or "").splitlines():
@@ -335,7 +797,7 @@ def parse_crawl_delay(robots_txt: str) -> float | None:
             current_agent = line.split(":", 1)[1].strip().lower()
             continue
         if line.lower().startswith("crawl-delay:"):
-            if current_agent in ("*", "page_scraper"):
+            if current_agent in ("*", ROBOTS_USER_AGENT):
                 val = line.split(":", 1)[1].strip()
                 try:
                     return float(val)
@@ -343,11 +805,270 @@ def parse_crawl_delay(robots_txt: str) -> float | None:
                     return None
     return None
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Memory governance: download byte cap, DOM node cap, degraded extraction
+# ────────────────────────────────────────────────────────────────────────────────
+MAX_DOWNLOAD_BYTES = int(os.environ.get("MAX_DOWNLOAD_BYTES", str(10 * 1024 * 1024)) or "0")
+MAX_DOM_NODES = int(os.environ.get("MAX_DOM_NODES", "50000") or "0")
+# Above this much markup, skip the whole-document trafilatura retries (each is another full tree)
+LITE_EXTRACTION_BYTES = int(os.environ.get("LITE_EXTRACTION_BYTES", str(2 * 1024 * 1024)) or "0")
+TAG_OPEN_RE = re.compile(r"<[A-Za-z]")
+
+METRICS.describe("pagescraper_degraded_total", "counter",
+                 "Pages processed in a degraded mode (body_truncated, dom_truncated, lite_extraction).")
+
+
+def cap_body_hook(max_bytes: int):
+    """requests response hook (used with stream=True): keep at most max_bytes of decoded body.
+
+    The body is read in chunks and the socket is dropped once the cap is passed, so
+    a 200 MB page costs max_bytes, not 200 MB. resp.truncated tells the caller.
+    """
+    def hook(resp, *args, **kwargs):
+        resp.truncated = False
+        if resp._content is not False:
+            return resp
+        chunks, total = [], 0
+        for chunk in resp.iter_content(64 * 1024):
+            chunks.append(chunk)
+            total += len(chunk)
+            if max_bytes and total > max_bytes:
+                resp.truncated = True
+                break
+        body = b"".join(chunks)
+        resp._content = body[:max_bytes] if resp.truncated else body
+        resp._content_consumed = not resp.truncated
+        resp.close()  # truncated: drop the connection; complete: return it to the pool
+        resp._content_consumed = True
+        return resp
+    return hook
+
+
+def cap_markup_nodes(html: str, max_nodes: int) -> tuple[str, bool]:
+    """Cut markup just before its (max_nodes+1)-th start tag; lxml closes whatever is left open."""
+    if not max_nodes or html.count("<") <= max_nodes:
+        return html, False
+    for i, m in enumerate(TAG_OPEN_RE.finditer(html)):
+        if i == max_nodes:
+            return html[:m.start()], True
+    return html, False
+
+
+def release_soup(soup):
+    """Free a parse tree now; BeautifulSoup's parent/sibling links otherwise wait for the cyclic GC."""
+    if soup is not None:
+        soup.decompose()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Per-domain latency tracking for adaptive timeouts
+# ────────────────────────────────────────────────────────────────────────────────
+ADAPTIVE_TIMEOUTS = os.environ.get("ADAPTIVE_TIMEOUTS", "1").lower() not in {"0", "false", "no", "off"}
+ADAPTIVE_MIN_SAMPLES = int(os.environ.get("ADAPTIVE_MIN_SAMPLES", "3") or "3")
+ADAPTIVE_MARGIN_SECONDS = float(os.environ.get("ADAPTIVE_MARGIN_SECONDS", "0.5") or "0.5")
+ADAPTIVE_MIN_TIMEOUT = float(os.environ.get("ADAPTIVE_MIN_TIMEOUT", "1.0") or "1.0")
+
+
+class LatencyTracker:
+    """Per-key smoothed latency and variance (Jacobson/Karels, as TCP does for RTO).
+
+    timeout() = srtt + 4·rttvar + margin: fast, steady domains get tight timeouts,
+    slow or jittery ones get room. A timeout is fed back as a sample at the value
+    that expired, so repeated timeouts walk the estimate up instead of sticking.
+    """
+
+    def __init__(self, max_keys: int = 5000):
+        self.lock = native_lock()
+        self.max_keys = max_keys
+        self.stats = {}   # key -> {"srtt", "rttvar", "n", "fail"}
+
+    def observe(self, key: str, seconds: float | None, ok: bool = True):
+        with self.lock:
+            st = self.stats.pop(key, None)  # re-insert so dict order tracks recency
+            if st is None:
+                if len(self.stats) >= self.max_keys:
+                    self.stats.pop(next(iter(self.stats)))
+                st = {"srtt": None, "rttvar": 0.0, "n": 0, "fail": 0.0}
+            if seconds is not None:
+                if st["srtt"] is None:
+                    st["srtt"], st["rttvar"] = seconds, seconds / 2
+                else:
+                    st["rttvar"] += 0.25 * (abs(st["srtt"] - seconds) - st["rttvar"])
+                    st["srtt"] += 0.125 * (seconds - st["srtt"])
+                st["n"] += 1
+            st["fail"] += 0.2 * ((0.0 if ok else 1.0) - st["fail"])
+            self.stats[key] = st
+
+    def get(self, key: str) -> dict | None:
+        with self.lock:
+            st = self.stats.get(key)
+            return dict(st) if st else None
+
+    def timeout(self, key: str) -> float | None:
+        st = self.get(key)
+        if not st or st["srtt"] is None or st["n"] < ADAPTIVE_MIN_SAMPLES:
+            return None
+        return max(ADAPTIVE_MIN_TIMEOUT, st["srtt"] + 4 * st["rttvar"] + ADAPTIVE_MARGIN_SECONDS)
+
+
+LATENCY = LatencyTracker()
+
+
+def is_timeout_error(e: Exception) -> bool:
+    return isinstance(e, TimeoutError) or "timed out" in str(e).lower() or "timeout" in type(e).__name__.lower()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# WARC record/replay of fetched responses (WARC_MODE=record|replay)
+# ────────────────────────────────────────────────────────────────────────────────
+WARC_MODE = os.environ.get("WARC_MODE", "off").strip().lower()          # off | record | replay
+WARC_DIR = os.environ.get("WARC_DIR", "warcs")
+WARC_MAX_BYTES = int(os.environ.get("WARC_MAX_BYTES", str(512 * 1024 * 1024)) or "0")
+# Hop-by-hop / transport headers that no longer describe the stored (decoded) body
+WARC_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+
+def _warc_record(headers: dict, block: bytes) -> bytes:
+    """One gzip member holding one WARC/1.1 record, so each record can be read by seek+length."""
+    head = "WARC/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    head += f"Content-Length: {len(block)}\r\n\r\n"
+    return gzip.compress(head.encode("utf-8") + block + b"\r\n\r\n", compresslevel=6)
+
+
+def _warc_digest(data: bytes) -> str:
+    return "sha1:" + base64.b32encode(hashlib.sha1(data).digest()).decode("ascii")
+
+
+class WarcArchive:
+    """Append-only rotating .warc.gz files plus a JSONL index per file.
+
+    Each index line maps a normalized target URL to (file, offset, length) of its
+    gzip member; replay loads every index into a dict once, so a lookup is one dict
+    hit and one seek. The newest record for a URL wins.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.path = None
+        self.fh = None
+        self.index_fh = None
+        self.seq = 0
+        self.index = None          # normalized url -> {"file", "offset", "length"}
+
+    def _open_next(self):
+        if self.fh:
+            self.fh.close()
+            self.index_fh.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self.seq += 1
+        stamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+        name = f"pagescraper-{stamp}-{os.getpid()}-{self.seq:05d}.warc.gz"
+        self.path = os.path.join(self.directory, name)
+        self.fh = open(self.path, "ab")
+        self.index_fh = open(self.path + ".idx", "a", encoding="utf-8")
+        info = b"software: page_scraper\r\nformat: WARC File Format 1.1\r\n"
+        self.fh.write(_warc_record({
+            "WARC-Type": "warcinfo",
+            "WARC-Record-ID": f"<urn:uuid:{uuid.uuid4()}>",
+            "WARC-Date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "WARC-Filename": name,
+            "Content-Type": "application/warc-fields",
+        }, info))
+
+    def record(self, url: str, resp):
+        """Store one final response (status line, headers, decoded body) for url."""
+        body = resp.content or b""
+        reason = getattr(resp, "reason", "") or ""
+        lines = [f"HTTP/1.1 {resp.status_code} {reason}".rstrip()]
+        lines += [f"{k}: {v}" for k, v in resp.headers.items() if k.lower() not in WARC_DROP_HEADERS]
+        lines.append(f"Content-Length: {len(body)}")
+        http_block = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", "replace") + body
+        data = _warc_record({
+            "WARC-Type": "response",
+            "WARC-Record-ID": f"<urn:uuid:{uuid.uuid4()}>",
+            "WARC-Date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "WARC-Target-URI": url,
+            "WARC-Payload-Digest": _warc_digest(body),
+            "Content-Type": "application/http; msgtype=response",
+        }, http_block)
+        with self.lock:
+            if self.fh is None or (self.max_bytes and self.fh.tell() + len(data) > self.max_bytes):
+                self._open_next()
+            offset = self.fh.tell()
+            self.fh.write(data)
+            self.fh.flush()
+            self.index_fh.write(json.dumps({
+                "url": normalize_url(url), "file": os.path.basename(self.path), "offset": offset,
+                "length": len(data), "status": resp.status_code, "ts": round(time.time(), 3),
+            }) + "\n")
+            self.index_fh.flush()
+
+    def load_index(self) -> dict:
+        with self.lock:
+            if self.index is None:
+                index = {}
+                if os.path.isdir(self.directory):
+                    for name in sorted(os.listdir(self.directory)):
+                        if not name.endswith(".warc.gz.idx"):
+                            continue
+                        with open(os.path.join(self.directory, name), encoding="utf-8") as fh:
+                            for line in fh:
+                                try:
+                                    entry = json.loads(line)
+                                except ValueError:
+                                    continue  # torn last line of a file still being written
+                                prev = index.get(entry["url"])
+                                if prev is None or entry.get("ts", 0) >= prev.get("ts", 0):
+                                    index[entry["url"]] = entry
+                self.index = index
+            return self.index
+
+    def lookup(self, url: str):
+        """The archived response for url as a requests.Response, or None."""
+        entry = self.load_index().get(normalize_url(url))
+        if entry is None:
+            return None
+        with open(os.path.join(self.directory, entry["file"]), "rb") as fh:
+            fh.seek(entry["offset"])
+            raw = gzip.decompress(fh.read(entry["length"]))
+        _, _, rest = raw.partition(b"\r\n\r\n")                   # WARC headers
+        http_head, _, body = rest.partition(b"\r\n\r\n")          # HTTP headers
+        if body.endswith(b"\r\n\r\n"):
+            body = body[:-4]
+        status_line, *header_lines = http_head.decode("latin-1").split("\r\n")
+        resp = requests.Response()
+        resp.status_code = int(status_line.split(" ", 2)[1])
+        resp.reason = status_line.split(" ", 2)[2] if status_line.count(" ") >= 2 else ""
+        for line in header_lines:
+            k, _, v = line.partition(":")
+            resp.headers[k.strip()] = v.strip()
+        resp._content = body
+        resp.url = url
+        resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+        return resp
+
+    def close(self):
+        with self.lock:
+            if self.fh:
+                self.fh.close()
+                self.index_fh.close()
+                self.fh = None
+
+
+WARC_ARCHIVE = WarcArchive(WARC_DIR, WARC_MAX_BYTES) if WARC_MODE in ("record", "replay") else None
+if WARC_ARCHIVE is not None:
+    atexit.register(WARC_ARCHIVE.close)
+
+
 class FetchManager:
     def __init__(self):
         self.sessions = {}
         self.last_request = {}
         self.robots_cache = {}
+        self.domain_hits = {}      # domain -> decayed fetch count, for keep-warm (see hot_domains)
+        self.domain_origins = {}   # domain -> scheme://netloc it was last fetched on
 
     def get_session(self, key: str):
         session = self.sessions.get(key)
@@ -381,33 +1102,88 @@ class FetchManager:
             time.sleep(delay - elapsed)
 
     def get_crawl_delay(self, key: str, headers: dict) -> float | None:
-        cached = self.robots_cache.get(key)
-        if cached and (time.time() - cached["ts"] < 3600):
-            return cached["delay"]
         if not key:
             return None
-        robots_url = f"https://{key}/robots.txt"
+        return self.get_robots(f"https://{key}", headers)["delay"]
+
+    def get_robots(self, origin: str, headers: dict | None = None) -> dict:
+        """Cached robots.txt for an origin (scheme://host[:port]): {"parser", "delay", "ts"}."""
+        cached = self.robots_cache.get(origin)
+        if cached and (time.time() - cached["ts"] < 3600):
+            return cached
+        parser = urllib.robotparser.RobotFileParser()
+        delay = None
+        if WARC_MODE == "replay":
+            parser.allow_all = True  # replay never touches the network
+            entry = {"parser": parser, "delay": None, "ts": time.time()}
+            self.robots_cache[origin] = entry
+            return entry
         try:
+            key = domain_key(origin)
             session = self.get_session(key)
-            resp = session.get(robots_url, headers=headers, timeout=5)
-            if resp and resp.status_code == 200:
+            resp = session.get(f"{origin}/robots.txt", headers=headers or build_headers(HEADER_PROFILES[0]),
+                               timeout=5)
+            if resp is not None and resp.status_code == 200:
+                parser.parse(resp.text.splitlines())
                 delay = parse_crawl_delay(resp.text)
+            elif resp is not None and resp.status_code in (401, 403):
+                parser.disallow_all = True
             else:
-                delay = None
+                parser.allow_all = True
         except Exception:
-            delay = None
-        self.robots_cache[key] = {"delay": delay, "ts": time.time()}
-        return delay
-
-    def fetch(self, url: str, timeout: int = 15, max_retries: int = 3):
+            parser.allow_all = True
+        entry = {"parser": parser, "delay": delay, "ts": time.time()}
+        self.robots_cache[origin] = entry
+        return entry
+
+    def note_domain(self, key: str, url: str):
+        parsed = urlparse(url)
+        self.domain_origins[key] = f"{parsed.scheme}://{parsed.netloc}"
+        self.domain_hits[key] = self.domain_hits.get(key, 0.0) + 1
+
+    def hot_domains(self, n: int, min_hits: float = 0.0, decay: float = 0.5) -> list[str]:
+        """Top-n domains with at least min_hits recent fetches, then age every count by `decay` (once per round)."""
+        hits = dict(self.domain_hits)
+        top = sorted((k for k, v in hits.items() if v >= min_hits), key=hits.get, reverse=True)[:n]
+        self.domain_hits = {k: v * decay for k, v in hits.items() if v * decay >= 0.1}
+        return top
+
+    def can_fetch(self, url: str) -> bool:
+        parsed = urlparse(url)
+        robots = self.get_robots(f"{parsed.scheme}://{parsed.netloc}")
+        return robots["parser"].can_fetch(ROBOTS_USER_AGENT, url)
+
+    def fetch(self, url: str, timeout: int = 15, max_retries: int = 3, extra_headers: dict | None = None):
+        if WARC_MODE == "replay":
+            return WARC_ARCHIVE.lookup(url)
+        resp = self._fetch(url, timeout=timeout, max_retries=max_retries, extra_headers=extra_headers)
+        if WARC_MODE == "record" and resp is not None and resp.status_code != 304:
+            WARC_ARCHIVE.record(url, resp)
+        return resp
+
+    def _fetch(self, url: str, timeout: int = 15, max_retries: int = 3, extra_headers: dict | None = None):
         key = domain_key(url)
+        self.note_domain(key, url)
+        start_keep_warm()
+        with net_timings() as net:
+            resp = self._fetch_attempts(url, key, timeout, max_retries, extra_headers)
+        if resp is not None:
+            resp.net_timings = net
+        return resp
+
+    def _fetch_attempts(self, url: str, key: str, timeout: int, max_retries: int, extra_headers: dict | None):
         for attempt in range(max_retries + 1):
             profile = random.choice(HEADER_PROFILES)
             headers = build_headers(profile)
+            if extra_headers:
+                headers.update(extra_headers)
             self.rate_limit(key, headers)
             session = self.get_session(key)
+            t0 = time.perf_counter()
             try:
-                resp = session.get(url, headers=headers, timeout=timeout, allow_redirects=True)
+                resp = session.get(url, headers=headers, timeout=timeout, allow_redirects=True,
+                                   stream=True, hooks={"response": cap_body_hook(MAX_DOWNLOAD_BYTES)})
+                LATENCY.observe(key, time.perf_counter() - t0, ok=resp is not None and resp.status_code < 500)
                 self.last_request[key] = time.time()
                 if not resp:
                     continue
@@ -418,6 +1194,7 @@ class FetchManager:
                         continue
                 return resp
             except Exception as e:
+                LATENCY.observe(key, timeout if is_timeout_error(e) else None, ok=False)
                 if attempt < max_retries:
                     backoff = 0.8 * (2 ** attempt) + random.random() * 0.5
                     time.sleep(backoff)
@@ -426,14 +1203,33 @@ class FetchManager:
         return None
 
     def fetch_reader(self, url: str, timeout: int = 20, max_retries: int = 2):
+        if WARC_MODE == "replay":
+            return WARC_ARCHIVE.lookup(build_reader_url(url))
+        resp = self._fetch_reader(url, timeout=timeout, max_retries=max_retries)
+        if WARC_MODE == "record" and resp is not None:
+            WARC_ARCHIVE.record(build_reader_url(url), resp)
+        return resp
+
+    def _fetch_reader(self, url: str, timeout: int = 20, max_retries: int = 2):
+        with net_timings() as net:
+            resp = self._fetch_reader_attempts(url, timeout, max_retries)
+        if resp is not None:
+            resp.net_timings = net
+        return resp
+
+    def _fetch_reader_attempts(self, url: str, timeout: int, max_retries: int):
         reader_url = build_reader_url(url)
+        latency_key = f"reader:{domain_key(url)}"
         for attempt in range(max_retries + 1):
             profile = random.choice(HEADER_PROFILES)
             headers = build_headers(profile)
             headers["Accept"] = "text/plain,text/html;q=0.9,*/*;q=0.8"
             session = self.get_reader_session()
+            t0 = time.perf_counter()
             try:
-                resp = session.get(reader_url, headers=headers, timeout=timeout, allow_redirects=True)
+                resp = session.get(reader_url, headers=headers, timeout=timeout, allow_redirects=True,
+                                   stream=True, hooks={"response": cap_body_hook(MAX_DOWNLOAD_BYTES)})
+                LATENCY.observe(latency_key, time.perf_counter() - t0, ok=resp is not None and resp.status_code == 200)
                 if not resp:
                     continue
                 if resp.status_code in (429, 500, 502, 503, 504) and attempt < max_retries:
@@ -442,6 +1238,7 @@ class FetchManager:
                     continue
                 return resp
             except Exception as e:
+                LATENCY.observe(latency_key, timeout if is_timeout_error(e) else None, ok=False)
                 if attempt < max_retries:
                     backoff = 1.0 * (2 ** attempt) + random.random() * 0.5
                     time.sleep(backoff)
@@ -451,23 +1248,531 @@ class FetchManager:
 
 FETCH_MANAGER = FetchManager()
 
-# Thread-pool for hard-timeout wrapper — lets us abort hanging cloudscraper calls
-_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+# ────────────────────────────────────────────────────────────────────────────────
+# DNS cache, per-fetch DNS/connect/TLS timings, keep-warm for hot domains
+# ────────────────────────────────────────────────────────────────────────────────
+DNS_CACHE_TTL = float(os.environ.get("DNS_CACHE_TTL", "300") or "0")          # 0 disables the cache
+DNS_NEGATIVE_TTL = float(os.environ.get("DNS_NEGATIVE_TTL", "30") or "0")
+DNS_CACHE_MAX_ENTRIES = 4096
+KEEP_WARM_TOP_N = int(os.environ.get("KEEP_WARM_TOP_N", "10") or "0")         # 0 disables keep-warm
+KEEP_WARM_INTERVAL_SECONDS = float(os.environ.get("KEEP_WARM_INTERVAL_SECONDS", "30") or "30")
+KEEP_WARM_MIN_HITS = float(os.environ.get("KEEP_WARM_MIN_HITS", "3") or "0")  # decayed fetch count to count as hot
+# Only "no such name" answers are cached; EAI_AGAIN and other transient failures retry next time
+DNS_NEGATIVE_ERRNOS = {getattr(socket, name) for name in ("EAI_NONAME", "EAI_NODATA") if hasattr(socket, name)}
+
+METRICS.describe("pagescraper_net_seconds", "histogram",
+                 "Time spent opening origin connections, by phase (dns, connect, tls).")
+METRICS.describe("pagescraper_dns_cache_total", "counter", "DNS lookups by result (hit, miss, negative_hit).")
+METRICS.describe("pagescraper_keep_warm_total", "counter", "Keep-warm refreshes of hot domains, by outcome.")
+
+
+class DnsCache:
+    """getaddrinfo() results per (host, port), shared by every session in the process.
+
+    The system resolver does not hand out record TTLs, so answers live for
+    DNS_CACHE_TTL seconds. Names that do not exist (EAI_NONAME/EAI_NODATA) are cached
+    for DNS_NEGATIVE_TTL so a dead domain fails fast on retries instead of waiting
+    on the resolver each time; a temporary resolver failure is not cached.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, max_entries: int = DNS_CACHE_MAX_ENTRIES):
+        self.lock = native_lock()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries = {}   # (host, port) -> (expires_at, addrinfo list | socket.gaierror)
+
+    def resolve(self, host: str, port: int, refresh: bool = False) -> tuple[list, bool]:
+        """(addrinfo list, cache_hit). Raises socket.gaierror, cached or fresh."""
+        key = (host, port)
+        now = time.time()
+        if self.ttl > 0 and not refresh:
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                if isinstance(entry[1], socket.gaierror):
+                    METRICS.inc("pagescraper_dns_cache_total", result="negative_hit")
+                    raise socket.gaierror(*entry[1].args)
+                METRICS.inc("pagescraper_dns_cache_total", result="hit")
+                return entry[1], True
+        METRICS.inc("pagescraper_dns_cache_total", result="miss")
+        try:
+            infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if e.errno in DNS_NEGATIVE_ERRNOS:
+                self._store(key, now + self.negative_ttl, e, self.negative_ttl)
+            raise
+        self._store(key, now + self.ttl, infos, self.ttl)
+        return infos, False
+
+    def _store(self, key, expires_at: float, value, ttl: float):
+        if ttl <= 0:
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            if len(self.entries) >= self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            self.entries[key] = (expires_at, value)
+
+    def expires_in(self, host: str, port: int) -> float:
+        with self.lock:
+            entry = self.entries.get((host, port))
+        return entry[0] - time.time() if entry else 0.0
+
+
+DNS_CACHE = DnsCache(DNS_CACHE_TTL, DNS_NEGATIVE_TTL)
+_NET_LOCAL = threading.local()
+
+
+@contextmanager
+def net_timings():
+    """Collect DNS, TCP connect and TLS handshake time of connections this thread opens in the block.
+
+    A reused pooled connection adds nothing, so "connections": 0 means the fetch
+    went out on a warm connection.
+    """
+    acc = {"dns_s": 0.0, "connect_s": 0.0, "tls_s": 0.0, "connections": 0, "dns_cached": 0}
+    previous = getattr(_NET_LOCAL, "acc", None)
+    _NET_LOCAL.acc = acc
+    try:
+        yield acc
+    finally:
+        _NET_LOCAL.acc = previous
+
+
+def _note_net(phase: str, seconds: float):
+    METRICS.observe("pagescraper_net_seconds", seconds, phase=phase)
+    acc = getattr(_NET_LOCAL, "acc", None)
+    if acc is not None:
+        acc[f"{phase}_s"] += seconds
+
+
+_urllib3_create_connection = urllib3.util.connection.create_connection
+_urllib3_https_connect = urllib3.connection.HTTPSConnection.connect
+
+
+def _create_connection(address, *args, **kwargs):
+    """urllib3's create_connection with the lookup served from DNS_CACHE and each phase timed."""
+    host, port = address
+    t0 = time.perf_counter()
+    try:
+        infos, cached = DNS_CACHE.resolve(host, port)
+    finally:
+        t1 = time.perf_counter()
+        _NET_LOCAL.last_connect_s = t1 - t0
+        _note_net("dns", t1 - t0)
+    acc = getattr(_NET_LOCAL, "acc", None)
+    if acc is not None:
+        acc["connections"] += 1
+        acc["dns_cached"] += int(cached)
+    error = None
+    try:
+        # Hand urllib3 one literal address at a time: it keeps its own family
+        # filtering, socket options and timeout handling, and resolves nothing
+        for sockaddr in dict.fromkeys(info[4][0] for info in infos):
+            try:
+                return _urllib3_create_connection((sockaddr, port), *args, **kwargs)
+            except OSError as e:
+                error = e
+        raise error or OSError(f"getaddrinfo returned no addresses for {host}")
+    finally:
+        _NET_LOCAL.last_connect_s = time.perf_counter() - t0
+        _note_net("connect", time.perf_counter() - t1)
+
+
+def _https_connect(self):
+    """HTTPSConnection.connect, timing the TLS handshake as what follows the TCP connect."""
+    _NET_LOCAL.last_connect_s = 0.0
+    t0 = time.perf_counter()
+    try:
+        return _urllib3_https_connect(self)
+    finally:
+        _note_net("tls", max(0.0, time.perf_counter() - t0 - _NET_LOCAL.last_connect_s))
+
+
+# Every session (origin, reader, robots) connects through urllib3, so patching these
+# two covers them all without touching the process-wide socket.getaddrinfo
+urllib3.util.connection.create_connection = _create_connection
+urllib3.connection.HTTPSConnection.connect = _https_connect
+
+
+def note_fetch_net(trace: dict, resp):
+    """Add a response's connection timings to the trace (summed over origin and reader fetches)."""
+    net = getattr(resp, "net_timings", None)
+    if not net:
+        return
+    total = trace.setdefault("net", {"dns_s": 0.0, "connect_s": 0.0, "tls_s": 0.0, "connections": 0, "dns_cached": 0})
+    for k, v in net.items():
+        total[k] += v
+
+
+def net_summary(trace: dict) -> dict | None:
+    """A trace's connection timings in milliseconds, plus their share of fetch + reader time."""
+    net = trace.get("net")
+    if not net:
+        return None
+    stages = trace.get("stages", {})
+    fetch_seconds = stages.get("fetch", 0.0) + stages.get("reader", 0.0)
+    out = {
+        "dns_ms": round(net["dns_s"] * 1000, 1),
+        "connect_ms": round(net["connect_s"] * 1000, 1),
+        "tls_ms": round(net["tls_s"] * 1000, 1),
+        "connections": net["connections"],
+        "dns_cached": net["dns_cached"],
+    }
+    if fetch_seconds:
+        out["share_of_fetch"] = round(min(1.0, (net["dns_s"] + net["connect_s"] + net["tls_s"]) / fetch_seconds), 3)
+    return out
+
+
+def keep_warm_round(n: int = KEEP_WARM_TOP_N, interval: float = KEEP_WARM_INTERVAL_SECONDS) -> list[dict]:
+    """Refresh DNS and the pooled connection of the top-n recently fetched domains.
+
+    Only domains with at least KEEP_WARM_MIN_HITS (decayed) recent fetches count, so
+    a one-off fetch never earns a site unsolicited pings. DNS is re-resolved when
+    its entry would expire before the next round. A domain that saw no fetch during
+    the last interval gets a HEAD /robots.txt on its own session, which re-opens (or
+    keeps open) its keep-alive connection; the ping counts as a request to it.
+    """
+    results = []
+    for key in FETCH_MANAGER.hot_domains(n, min_hits=KEEP_WARM_MIN_HITS):
+        origin = FETCH_MANAGER.domain_origins.get(key)
+        if not origin:
+            continue
+        parsed = urlparse(origin)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        out = {"domain": key, "dns": False, "ping": False}
+        try:
+            if DNS_CACHE.expires_in(parsed.hostname, port) < 2 * interval:
+                DNS_CACHE.resolve(parsed.hostname, port, refresh=True)
+                out["dns"] = True
+            if time.time() - FETCH_MANAGER.last_request.get(key, 0.0) > interval:
+                FETCH_MANAGER.last_request[key] = time.time()
+                FETCH_MANAGER.get_session(key).head(f"{origin}/robots.txt", headers=build_headers(HEADER_PROFILES[0]),
+                                                    timeout=5, allow_redirects=False)
+                out["ping"] = True
+            METRICS.inc("pagescraper_keep_warm_total", outcome="ok")
+        except Exception as e:
+            out["error"] = str(e)[:200]
+            METRICS.inc("pagescraper_keep_warm_total", outcome="error")
+        results.append(out)
+    return results
+
+
+def _keep_warm_worker(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            keep_warm_round(interval=interval)
+        except Exception as e:
+            logger.info(json.dumps({"event": "keep_warm_failed", "error": str(e)[:200]}))
+
+
+_KEEP_WARM_PID = None
+_KEEP_WARM_LOCK = threading.Lock()
+
+
+def start_keep_warm():
+    """Start this process's keep-warm thread once (threads do not survive fork, hence the pid)."""
+    global _KEEP_WARM_PID
+    if KEEP_WARM_TOP_N <= 0 or WARC_MODE == "replay" or _KEEP_WARM_PID == os.getpid():
+        return
+    with _KEEP_WARM_LOCK:
+        if _KEEP_WARM_PID == os.getpid():
+            return
+        _KEEP_WARM_PID = os.getpid()
+    threading.Thread(target=_keep_warm_worker, args=(KEEP_WARM_INTERVAL_SECONDS,), daemon=True,
+                     name="keep-warm").start()
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Async serving mode (gunicorn gevent worker, see gunicorn_async.py)
+# ────────────────────────────────────────────────────────────────────────────────
+def _gevent_patched() -> bool:
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+# True when sockets are cooperative: network waits park a greenlet, not an OS thread
+ASYNC_MODE = _gevent_patched()
+ASYNC_CPU_THREADS = int(os.environ.get("ASYNC_CPU_THREADS", "4") or "4")
+_CPU_POOL = None
+
+
+def run_cpu_bound(fn, *args):
+    """Run CPU-heavy extraction off the event loop in async mode; inline otherwise.
+
+    In async mode the work goes to a native gevent thread pool so the hub keeps
+    serving other requests' network I/O while a page is being parsed. The pool is
+    our own, not the hub's: gevent's thread resolver runs getaddrinfo on the hub
+    pool, and DNS lookups must not queue behind multi-second extractions.
+    """
+    global _CPU_POOL
+    if not ASYNC_MODE:
+        return fn(*args)
+    if _CPU_POOL is None:
+        from gevent.threadpool import ThreadPool
+        _CPU_POOL = ThreadPool(ASYNC_CPU_THREADS)
+    return _CPU_POOL.apply(fn, args)
+
+
+# Thread-pool for hard-timeout wrapper — lets us abort hanging cloudscraper calls.
+# In async mode its "threads" are greenlets, so it is sized for many parked fetches.
+_FETCH_POOL_SIZE = int(os.environ.get("FETCH_POOL_SIZE", "") or (500 if ASYNC_MODE else 4))
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=_FETCH_POOL_SIZE)
+# Crawl pages and queued jobs fetch on their own pool, so a big crawl or job backlog
+# never holds the slots interactive /read requests (and admission control) count on
+_BACKGROUND_POOL_SIZE = int(os.environ.get("BACKGROUND_FETCH_POOL_SIZE", "") or (100 if ASYNC_MODE else 4))
+_BACKGROUND_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=_BACKGROUND_POOL_SIZE)
+_FETCH_LOCAL = threading.local()
+
+
+@contextmanager
+def background_fetches():
+    """Send this thread's fetch_with_hard_timeout() calls in the block to the background pool."""
+    previous = getattr(_FETCH_LOCAL, "executor", None)
+    _FETCH_LOCAL.executor = _BACKGROUND_EXECUTOR
+    try:
+        yield
+    finally:
+        _FETCH_LOCAL.executor = previous
 
 
 def fetch_with_hard_timeout(fn, hard_limit_seconds):
     """Run fn() in a thread; raise TimeoutError if it doesn't finish in time."""
-    future = _EXECUTOR.submit(fn)
+    executor = getattr(_FETCH_LOCAL, "executor", None) or _EXECUTOR
+    future = executor.submit(fn)
+    if executor is _EXECUTOR:
+        # A timed-out fetch keeps its thread until fn() returns; admission sees it until then
+        ADMISSION.fetch_started()
+        future.add_done_callback(lambda _f: ADMISSION.fetch_finished())
     try:
         return future.result(timeout=hard_limit_seconds)
     except concurrent.futures.TimeoutError:
         future.cancel()
         raise TimeoutError(f"Hard timeout after {hard_limit_seconds}s")
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Single-flight: concurrent identical /read calls share one fetch + extraction
+# ────────────────────────────────────────────────────────────────────────────────
+READ_COALESCE = os.environ.get("READ_COALESCE", "1").lower() not in {"0", "false", "no", "off"}
+
+
+class SingleFlight:
+    """Runs fn() once per key while it is in flight; later callers wait for that result.
+
+    The first caller (leader) runs fn() inline on its own request thread, no extra
+    thread is spawned. Followers block on the leader's future bounded by their own
+    timeout, so every caller keeps its own hard limit even when it joins late.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}                          # key -> {"future": Future, "waiters": int}
+        self.stats = {"leaders": 0, "coalesced": 0, "follower_timeouts": 0}
+
+    def do(self, key, fn, timeout=None):
+        """Returns (result, shared: bool, waiters: int). Raises TimeoutError for late followers."""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                flight["waiters"] += 1
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = {"future": concurrent.futures.Future(), "waiters": 0}
+                self.flights[key] = flight
+                self.stats["leaders"] += 1
+                leader = True
+
+        future = flight["future"]
+        if not leader:
+            try:
+                return future.result(timeout=timeout), True, 0
+            except concurrent.futures.TimeoutError:
+                with self.lock:
+                    self.stats["follower_timeouts"] += 1
+                raise TimeoutError(f"Coalesced wait exceeded {timeout}s")
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+        return result, False, flight["waiters"]
+
+    def in_flight(self, key) -> bool:
+        with self.lock:
+            return key in self.flights
+
+
+SINGLE_FLIGHT = SingleFlight()
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Admission control: shed /read requests that cannot finish inside their hard limit
+# ────────────────────────────────────────────────────────────────────────────────
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "1").lower() not in {"0", "false", "no", "off"}
+ADMISSION_MAX_INFLIGHT = int(os.environ.get("ADMISSION_MAX_INFLIGHT", "0") or "0")  # 0 = deadline check only
+ADMISSION_EWMA_ALPHA = 0.2
+
+
+class AdmissionController:
+    """Deadline-aware admission for /read.
+
+    Keeps an EWMA of fetch and extraction time, a count of admitted reads and a
+    count of busy _EXECUTOR slots (which also covers streamed reads, change checks
+    and fetches still running after their caller timed out). A new read waits behind
+    load // fetch_slots full waves of fetches, load being the larger of the two
+    counts; if that wait plus its own fetch and extraction would overrun its
+    hard_limit it is rejected up front, while rejecting is still cheap, instead of
+    holding a fetch slot only to time out.
+    """
+
+    def __init__(self, fetch_slots: int, max_in_flight: int = 0):
+        self.lock = native_lock()
+        self.fetch_slots = max(1, fetch_slots)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.fetch_busy = 0                         # submitted, unfinished _EXECUTOR fetches
+        self.ewma = {}                              # stage -> seconds
+        self.stats = {"admitted": 0, "shed": 0}
+
+    def observe(self, stage: str, seconds: float):
+        with self.lock:
+            prev = self.ewma.get(stage)
+            self.ewma[stage] = seconds if prev is None else prev + ADMISSION_EWMA_ALPHA * (seconds - prev)
+
+    def fetch_started(self):
+        with self.lock:
+            self.fetch_busy += 1
+
+    def fetch_finished(self):
+        with self.lock:
+            self.fetch_busy = max(0, self.fetch_busy - 1)
+
+    def _load(self) -> int:
+        return max(self.in_flight, self.fetch_busy)
+
+    def _estimate(self) -> float | None:
+        fetch = self.ewma.get("fetch")
+        if fetch is None:
+            return None
+        waves = self._load() // self.fetch_slots
+        return (waves + 1) * fetch + self.ewma.get("extract", 0.0)
+
+    def try_admit(self, hard_limit: float) -> tuple[bool, float | None, int]:
+        """Returns (admitted, estimated_seconds, retry_after_seconds)."""
+        with self.lock:
+            estimate = self._estimate()
+            queued = self._load() >= self.fetch_slots
+            too_late = queued and estimate is not None and estimate > hard_limit
+            too_many = bool(self.max_in_flight) and self.in_flight >= self.max_in_flight
+            if ADMISSION_CONTROL and (too_late or too_many):
+                self.stats["shed"] += 1
+                drain = (self._load() // self.fetch_slots) * (self.ewma.get("fetch") or 1.0)
+                return False, estimate, max(1, math.ceil(drain))
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return True, estimate, 0
+
+    def release(self):
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+
+ADMISSION = AdmissionController(_FETCH_POOL_SIZE, ADMISSION_MAX_INFLIGHT)
+METRICS.describe("pagescraper_admission_in_flight", "gauge", "Admitted /read requests not yet finished.")
+METRICS.describe("pagescraper_admission_fetch_busy", "gauge", "Fetch pool slots currently running a fetch.")
+METRICS.describe("pagescraper_admission_shed_total", "counter",
+                 "Reads rejected as OVERLOADED because they could not finish within hard_limit.")
+METRICS.describe("pagescraper_admission_fetch_ewma_seconds", "gauge", "Recent fetch time (EWMA) used for admission.")
+
+
+class ReadShed(Exception):
+    """A read that did not fit admission; carries what the OVERLOADED answer reports."""
+
+    def __init__(self, estimate, retry_after):
+        super().__init__("OVERLOADED")
+        self.estimate = estimate
+        self.retry_after = retry_after
+
+
+def admit_read(hard_limit: float):
+    """Admit the current /read against ADMISSION or raise ReadShed. Idempotent per request."""
+    if getattr(g, "admitted", False):
+        return
+    admitted, estimate, retry_after = ADMISSION.try_admit(hard_limit)
+    if not admitted:
+        raise ReadShed(estimate, retry_after)
+    g.admitted = True
+
+
+def overloaded_response(url: str, shed: ReadShed):
+    resp, status = soft_fail(url, "Server busy: request would not finish within its hard limit",
+                             reason="OVERLOADED", extra={
+                                 "length": 0,
+                                 "retry_after": shed.retry_after,
+                                 "estimated_s": round(shed.estimate, 2) if shed.estimate is not None else None,
+                             })
+    resp.headers["Retry-After"] = str(shed.retry_after)
+    return resp, status
+
+
+@app.teardown_request
+def _release_admission(exc=None):
+    if getattr(g, "admitted", False):
+        g.admitted = False
+        ADMISSION.release()
+
+# ────────────────────────────────────────────────────────────────────────────────
+# On-demand profiling: debug_timings flag, cProfile capture, sampled production profiles
+# ────────────────────────────────────────────────────────────────────────────────
+DEBUG_TIMINGS_ENABLED = os.environ.get("DEBUG_TIMINGS", "").lower() in {"1", "true", "yes"}
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0") or "0")
+PROFILE_TOP_N = int(os.environ.get("PROFILE_TOP_N", "15") or "15")
+PROFILE_DUMP_DIR = os.environ.get("PROFILE_DUMP_DIR", "")
+
+
+def profile_top_functions(profiler: cProfile.Profile, limit: int = 15) -> list[dict]:
+    """Hottest functions by own time from a finished cProfile run."""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, lineno, func), (cc, nc, tt, ct, _callers) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{lineno}({func})",
+            "calls": nc,
+            "tottime_ms": round(tt * 1000, 2),
+            "cumtime_ms": round(ct * 1000, 2),
+        })
+    rows.sort(key=lambda r: r["tottime_ms"], reverse=True)
+    return rows[:limit]
+
+
+def dump_profile(profiler: cProfile.Profile, url: str):
+    """Write a .prof file (loadable with pstats/snakeviz) when PROFILE_DUMP_DIR is set."""
+    if not PROFILE_DUMP_DIR:
+        return None
+    try:
+        os.makedirs(PROFILE_DUMP_DIR, exist_ok=True)
+        name = f"{int(time.time() * 1000)}-{domain_key(url) or 'unknown'}.prof"
+        path = os.path.join(PROFILE_DUMP_DIR, name)
+        profiler.dump_stats(path)
+        return path
+    except Exception:
+        return None
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Soft responses (always HTTP 200 for n8n)
 # ────────────────────────────────────────────────────────────────────────────────
-def soft_fail(url, message, reason, http_status=None, extra=None):
+def fail_payload(url, message, reason, http_status=None, extra=None):
     payload = {
         "ok": False,
         "reason": reason,
@@ -477,11 +1782,17 @@ def soft_fail(url, message, reason, http_status=None, extra=None):
     }
     if extra:
         payload.update(extra)
+    return payload
+
+def soft_fail(url, message, reason, http_status=None, extra=None):
+    payload = fail_payload(url, message, reason, http_status=http_status, extra=extra)
+    note_outcome(False, reason, payload.get("length", 0))
     return jsonify(payload), 200
 
 def soft_ok(data):
     data = data or {}
     data["ok"] = True
+    note_outcome(True, None, data.get("length", 0))
     return jsonify(data), 200
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -513,17 +1824,37 @@ def slice_body_html(raw_html: str) -> str | None:
 # ────────────────────────────────────────────────────────────────────────────────
 # Light cleaners and metadata
 # ────────────────────────────────────────────────────────────────────────────────
-def clean_dom_full(html):
-    soup = BeautifulSoup(html, "lxml")
+def make_soup(markup):
+    note_parse("bs4")
+    return BeautifulSoup(markup, "lxml")
+
+def trafilatura_extract(html, **kwargs):
+    if isinstance(html, str):
+        note_parse("trafilatura")  # a pre-parsed tree (parse_extraction_tree) is only copied
+    return trafilatura.extract(html, **kwargs)
+
+def strip_non_content(soup):
     for tag in soup(["script", "style", "noscript", "template"]):
         tag.decompose()
     for c in soup.find_all(string=lambda t: isinstance(t, Comment)):
         c.extract()
     return soup
 
+def clean_dom_full(html):
+    return strip_non_content(make_soup(html))
+
 def fix_str(s):
     return fix_text(s) if isinstance(s, str) else s
 
+# Pure-ASCII text without entities, CRs or control characters is a fix_text() no-op
+_FIX_TEXT_NEEDED_RE = re.compile(r"[&\r\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+
+def fix_text_fast(s: str) -> str:
+    """fix_text() that skips ftfy entirely for text it would return unchanged."""
+    if s.isascii() and not _FIX_TEXT_NEEDED_RE.search(s):
+        return s
+    return fix_text(s)
+
 def get_meta(soup, url):
     title = (soup.title.string.strip() if soup.title and soup.title.string else None)
     md = soup.find("meta", attrs={"name": "description"})
@@ -549,42 +1880,47 @@ def get_meta(soup, url):
 # ────────────────────────────────────────────────────────────────────────────────
 # Markdown helpers (HTML -> Markdown)
 # ────────────────────────────────────────────────────────────────────────────────
-def html_inline_to_md(node) -> str:
-    if isinstance(node, NavigableString):
-        return fix_text(str(node))
-    if not isinstance(node, Tag):
-        return ""
+INLINE_MD_MARKS = {"strong": "**", "b": "**", "em": "*", "i": "*", "code": "`"}
+
+
+def _inline_md_open(node: Tag):
+    """(prefix, suffix) a tag contributes around its children's inline Markdown."""
     name = node.name.lower()
-    inner = "".join(html_inline_to_md(child) for child in node.children)
     if name == "a":
         href = (node.get("href") or "").strip()
-        text = inner or fix_text(node.get_text(strip=True))
-        return f"[{text}]({href})" if href else text
-    if name in ("strong", "b"):
-        return f"**{inner}**"
-    if name in ("em", "i"):
-        return f"*{inner}*"
-    if name == "code":
-        return f"`{inner}`"
+        return ("[", f"]({href})") if href else ("", "")
+    mark = INLINE_MD_MARKS.get(name)
+    if mark:
+        return mark, mark
     if name == "img":
         src = (node.get("src") or "").strip()
         alt = fix_text(node.get("alt") or "")
-        return f"![{alt}]({src})" if src else ""
-    return inner
-
-def html_block_to_md(tag: Tag) -> str:
-    name = tag.name.lower()
-    if name == "blockquote":
-        text = "".join(html_inline_to_md(c) for c in tag.children).strip()
-        lines = [fix_text(ln) for ln in re.split(r"\r?\n+", text) if ln.strip()]
-        return "\n".join(["> " + ln for ln in lines])
-    if name == "li":
-        text = "".join(html_inline_to_md(c) for c in tag.children).strip()
-        if tag.find_parent("ol"):
-            return f"1. {text}"
-        return f"- {text}"
-    text = "".join(html_inline_to_md(c) for c in tag.children).strip()
-    return text
+        return (f"![{alt}]({src})" if src else ""), ""
+    return "", ""
+
+
+def html_inline_to_md(node) -> str:
+    """Inline Markdown of a subtree, rendered iteratively (no recursion limit on deep markup)."""
+    if isinstance(node, NavigableString):
+        return fix_text_fast(str(node))
+    if not isinstance(node, Tag):
+        return ""
+    parts = []
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if type(item) is tuple:  # ("suffix", text) pushed when its tag was entered
+            parts.append(item[1])
+        elif isinstance(item, NavigableString):
+            parts.append(fix_text_fast(str(item)))
+        elif isinstance(item, Tag):
+            prefix, suffix = _inline_md_open(item)
+            if prefix:
+                parts.append(prefix)
+            if suffix:
+                stack.append(("suffix", suffix))
+            stack.extend(reversed(item.contents))
+    return "".join(parts)
 
 def heading_md(level_num: int, title: str) -> str:
     level_num = max(1, min(6, int(level_num)))
@@ -642,36 +1978,132 @@ def choose_content_root(body_root: Tag) -> Tag:
 
 def focus_body_html(body_html: str) -> str:
     """Body HTML → BeautifulSoup → drop chrome → choose content root → return focused HTML string."""
-    soup = BeautifulSoup(body_html, "lxml")
+    soup = make_soup(body_html)
     body = soup.body or soup
     drop_chrome_blocks(body)
     root = choose_content_root(body)
     # Return just the chosen root's inner HTML (not the whole body)
-    return "".join(str(c) for c in root.contents) if root else str(body)
+    focused = "".join(str(c) for c in root.contents) if root else str(body)
+    release_soup(soup)
+    return focused
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Text extraction helpers
 # ────────────────────────────────────────────────────────────────────────────────
-def extract_main_text(focused_html: str, full_html: str | None = None) -> str:
-    # Try trafilatura with favor_precision=False for broader extraction
-    text = trafilatura.extract(focused_html, favor_precision=False, include_comments=False) or ""
-    if not text and full_html:
-        text = trafilatura.extract(full_html, favor_precision=False, include_comments=False) or ""
-    # Try with favor_recall=True as another fallback
-    if not text:
-        text = trafilatura.extract(focused_html, favor_recall=True, include_comments=False) or ""
-    if not text and full_html:
-        text = trafilatura.extract(full_html, favor_recall=True, include_comments=False) or ""
-    # Fallback to BeautifulSoup text extraction
-    if not text:
-        soup = BeautifulSoup(focused_html, "lxml")
-        text = soup.get_text(" ", strip=True)
-    if not text and full_html:
-        soup = BeautifulSoup(full_html, "lxml")
-        text = soup.get_text(" ", strip=True)
-    return fix_text(text.strip())
+# Trafilatura cascade: each document is parsed once; variants run on that tree (trafilatura
+# copies it) in EXTRACT_CASCADE order until one scores EXTRACT_QUALITY_THRESHOLD
+EXTRACT_VARIANTS = {
+    "focused": ("focused", {"favor_precision": False}),
+    "full": ("full", {"favor_precision": False}),
+    "focused_recall": ("focused", {"favor_recall": True}),
+    "full_recall": ("full", {"favor_recall": True}),
+}
+EXTRACT_CASCADE = [v for v in (s.strip() for s in os.environ.get(
+    "EXTRACT_CASCADE", "focused,full,focused_recall,full_recall").split(",")) if v in EXTRACT_VARIANTS]
+EXTRACT_QUALITY_THRESHOLD = float(os.environ.get("EXTRACT_QUALITY_THRESHOLD", "0.6") or "0.6")
+EXTRACT_TARGET_WORDS = int(os.environ.get("EXTRACT_TARGET_WORDS", "150") or "150")
+_TREE_TEXT_XPATH = "//text()[not(ancestor::script or ancestor::style or ancestor::template)]"
 
-# ────────────────────────────────────────────────────────────────────────────────
+METRICS.describe("pagescraper_extract_variant_total", "counter",
+                 "Main-text extractions by winning cascade variant (tune EXTRACT_CASCADE from this).")
+
+
+def parse_extraction_tree(html: str):
+    """lxml tree exactly as trafilatura would build it from the string; None if it rejects it."""
+    note_parse("lxml")
+    try:
+        return trafilatura.load_html(html)
+    except (TypeError, ValueError):
+        return None
+
+
+def tree_text(tree) -> str:
+    """Visible text of an lxml tree, space-joined like BeautifulSoup's get_text(" ", strip=True)."""
+    return " ".join(t.strip() for t in tree.xpath(_TREE_TEXT_XPATH) if t.strip())
+
+
+def extraction_quality(text: str, doc_words: int) -> float:
+    """0..1: enough words (or most of a short document's text), mostly in prose-length lines."""
+    words = len(text.split())
+    if not words:
+        return 0.0
+    volume = min(1.0, words / EXTRACT_TARGET_WORDS)
+    if doc_words:
+        volume = max(volume, min(1.0, 2.0 * words / doc_words))
+    lines = [ln for ln in text.splitlines() if ln.strip()]
+    short = sum(1 for ln in lines if len(ln.strip()) <= 20) / max(1, len(lines))
+    return round(volume * (1.0 - 0.5 * short), 3)
+
+
+def note_extract(variant: str, score: float, tried: list[str]):
+    """Record the winning cascade variant on the bound trace and in METRICS."""
+    METRICS.inc("pagescraper_extract_variant_total", variant=variant)
+    trace = getattr(_TRACE_LOCAL, "trace", None)
+    if trace is not None:
+        trace["extract"] = {"variant": variant, "score": score, "tried": tried}
+
+
+def extract_main_text(focused_html: str, full_html: str | None = None) -> str:
+    trees, texts, words = {}, {}, {}
+
+    def tree_for(which):
+        if which not in trees:
+            html = focused_html if which == "focused" else full_html
+            trees[which] = parse_extraction_tree(html) if html else None
+        return trees[which]
+
+    def doc_text(which):
+        if which not in texts:
+            tree = tree_for(which)
+            texts[which] = tree_text(tree) if tree is not None else ""
+        return texts[which]
+
+    def doc_words(which):
+        if which not in words:
+            words[which] = len(doc_text(which).split())
+        return words[which]
+
+    best_text, best_score, best_variant, tried = "", 0.0, "none", []
+    for name in EXTRACT_CASCADE:
+        if best_text and deadline_passed():
+            # Out of time: keep the best text so far instead of trying the next variant
+            trace = getattr(_TRACE_LOCAL, "trace", None)
+            if trace is not None:
+                trace.setdefault("degraded", []).append("deadline_extract")
+            break
+        which, kwargs = EXTRACT_VARIANTS[name]
+        tree = tree_for(which)
+        if tree is None:
+            continue
+        tried.append(name)
+        text = (trafilatura_extract(tree, include_comments=False, **kwargs) or "").strip()
+        if not text:
+            continue
+        # Coverage is against the document this variant read, whose tree is already parsed
+        score = extraction_quality(text, doc_words(which))
+        if score > best_score:
+            best_text, best_score, best_variant = text, score, name
+        if best_score >= EXTRACT_QUALITY_THRESHOLD:
+            break
+
+    if not best_text:
+        # Fallback to the documents' plain text
+        for which in ("focused", "full") if full_html else ("focused",):
+            if tree_for(which) is not None:
+                best_text = doc_text(which)
+            else:
+                # trafilatura rejected the markup; BeautifulSoup still gets text out of it
+                soup = make_soup(focused_html if which == "focused" else full_html)
+                best_text = soup.get_text(" ", strip=True)
+                release_soup(soup)
+            if best_text:
+                best_variant = f"{which}_text"
+                break
+    trees.clear()
+    note_extract(best_variant, best_score, tried)
+    return fix_text(best_text.strip())
+
+# ────────────────────────────────────────────────────────────────────────────────
 # Outline from focused body -> sections + flat Markdown
 # ────────────────────────────────────────────────────────────────────────────────
 def looks_menuish(text: str) -> bool:
@@ -696,23 +2128,100 @@ def looks_boilerplate(text: str) -> bool:
     ]
     return any(b in t for b in blacklist)
 
+OUTLINE_BLOCK_TAGS = {"p", "li", "blockquote"}
+OUTLINE_HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def render_outline_blocks(root) -> list[dict]:
+    """Outline blocks (p/li/blockquote Markdown, h1-h6 titles) in document order, in one walk.
+
+    Iterative pre-order walk with an explicit stack. Each text node is fix_text()ed
+    once and appended to the part lists of every block still open around it, so a
+    <p> inside an <li> inside a <blockquote> is rendered in one pass, not three.
+    Nested blocks still produce their own entries, as the find_all() version did.
+    """
+    blocks = []
+    open_blocks = []    # part lists of the p/li/blockquote elements around the current node
+    open_headings = []  # part lists of the headings around the current node
+    ol_depth = 0
+    stack = list(reversed(root.contents))
+    while stack:
+        item = stack.pop()
+        if type(item) is tuple:  # exit marker pushed when its element was entered
+            kind, value = item
+            if kind == "suffix":
+                for parts in open_blocks:
+                    parts.append(value)
+            elif kind == "block":
+                text = "".join(open_blocks.pop()).strip()
+                if value["tag"] == "blockquote":
+                    lines = [fix_text_fast(ln) for ln in re.split(r"\r?\n+", text) if ln.strip()]
+                    text = "\n".join(["> " + ln for ln in lines])
+                elif value["tag"] == "li":
+                    text = f"1. {text}" if value.pop("ordered") else f"- {text}"
+                value["text"] = text.strip()
+            elif kind == "heading":
+                value["title"] = fix_text_fast(" ".join(open_headings.pop()))
+            else:  # "ol"
+                ol_depth -= 1
+            continue
+        if isinstance(item, NavigableString):
+            if open_blocks:
+                text = fix_text_fast(str(item))
+                for parts in open_blocks:
+                    parts.append(text)
+            if open_headings and type(item) in (NavigableString, CData):
+                stripped = item.strip()
+                if stripped:
+                    for parts in open_headings:
+                        parts.append(stripped)
+            continue
+        if not isinstance(item, Tag):
+            continue
+        name = item.name.lower()
+        if name in OUTLINE_BLOCK_TAGS:
+            entry = {"tag": name}
+            if name == "li":
+                entry["ordered"] = ol_depth > 0
+            blocks.append(entry)
+            open_blocks.append([])
+            stack.append(("block", entry))
+        elif name in OUTLINE_HEADING_TAGS:
+            level_num = int(name[1])
+            entry = {"tag": f"h{level_num}", "level": level_num}
+            blocks.append(entry)
+            open_headings.append([])
+            stack.append(("heading", entry))
+        elif name == "ol":
+            ol_depth += 1
+            stack.append(("ol", None))
+        if open_blocks:
+            prefix, suffix = _inline_md_open(item)
+            if prefix:
+                for parts in open_blocks:
+                    parts.append(prefix)
+            if suffix:
+                stack.append(("suffix", suffix))
+        stack.extend(reversed(item.contents))
+    return blocks
+
+
 def extract_outline_from_focused_body(focused_body_html: str):
-    soup = BeautifulSoup(focused_body_html, "lxml")
-    root = soup.body or soup
-    allowed_blocks = ["h1","h2","h3","h4","h5","h6","p","li","blockquote"]
+    soup = make_soup(focused_body_html)
+    outline = outline_from_root(soup.body or soup)
+    release_soup(soup)
+    return outline
+
 
+def outline_from_root(root):
+    """(sections, flat_markdown) of an already-parsed focused body; the tree is not modified."""
     blocks = []
-    for el in root.find_all(allowed_blocks):
-        name = el.name.lower()
-        if name in ("p", "li", "blockquote"):
-            md_line = html_block_to_md(el).strip()
-            if len(md_line) >= 2 and not looks_menuish(md_line) and not looks_boilerplate(md_line):
-                blocks.append({"tag": name, "text": md_line})
-        else:
-            title = fix_text(el.get_text(" ", strip=True))
-            if title:
-                level_num = int(name[1])
-                blocks.append({"tag": f"h{level_num}", "level": level_num, "title": title})
+    for b in render_outline_blocks(root):
+        if "title" in b:
+            if b["title"]:
+                blocks.append(b)
+        elif len(b["text"]) >= 2 and not looks_menuish(b["text"]) and not looks_boilerplate(b["text"]):
+            blocks.append(b)
 
     sections = []
     current = None
@@ -767,44 +2276,96 @@ ALLOWED_TAGS = {
     "br","hr",
 }
 
-def strip_html_from_focused_body(focused_body_html: str) -> str:
-    soup = BeautifulSoup(focused_body_html, "lxml")
-    root = soup.body or soup
-
-    for tag in root(["script","style","noscript","template","svg"]):
-        tag.decompose()
-    for c in root.find_all(string=lambda t: isinstance(t, Comment)):
-        c.extract()
-
-    for el in list(root.find_all(True)):
-        name = el.name.lower()
-        if name not in ALLOWED_TAGS:
-            el.unwrap()
+CLEAN_DROP_TAGS = {"script", "style", "noscript", "template", "svg"}
+CLEAN_VOID_TAGS = {"img", "br", "hr"}
+
+
+def _clean_attrs(el: Tag) -> list[tuple[str, str]]:
+    """Attributes an allowed tag keeps in cleaned HTML (href on links, src/alt on images)."""
+    if el.name == "a":
+        href = (el.get("href") or "").strip()
+        return [("href", href)] if href.lower().startswith(("http://", "https://", "#", "/")) else []
+    if el.name == "img":
+        src = (el.get("src") or "").strip()
+        alt = fix_text(el.get("alt") or "")
+        attrs = [("alt", alt)] if alt else []  # sorted, as bs4's formatter emits them
+        return attrs + ([("src", src)] if src.lower().startswith(("http://", "https://", "data:image")) else [])
+    return []
+
+
+def clean_html_of(node, max_rows: int | None = None, max_cols: int | None = None,
+                  max_cells: int | None = None) -> str:
+    """Cleaned HTML of one node: ALLOWED_TAGS kept (attributes stripped), other tags unwrapped,
+    script/style/svg dropped, comments removed.
+
+    Serialized straight from the tree (as BeautifulSoup's minimal formatter would)
+    without mutating or re-parsing it, so the same tree can feed the outline and
+    the tables. With max_rows, <tr> elements with cells past that many are left out;
+    with max_cols, so are the <th>/<td> cells of a row past that many, and with
+    max_cells every row once that many cells have been written.
+    """
+    parts = []
+    rows = 0
+    cols = 0
+    cells = 0
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if type(item) is str:  # closing tag pushed when its element was entered
+            parts.append(item)
             continue
-        if name in {"table","thead","tbody","tr"}:
-            el.attrs = {}
+        if type(item) is int:  # a row was left: restore the enclosing row's cell count
+            cols = item
             continue
-        if name == "a":
-            href = (el.get("href") or "").strip()
-            el.attrs = {}
-            if href.lower().startswith(("http://","https://","#","/")):
-                el.attrs["href"] = href
-        elif name == "img":
-            src = (el.get("src") or "").strip()
-            alt = fix_text(el.get("alt") or "")
-            el.attrs = {}
-            if src.lower().startswith(("http://","https://","data:image")):
-                el.attrs["src"] = src
-            if alt:
-                el.attrs["alt"] = alt
-        elif name in {"th","td"}:
-            el.attrs = {}
-        else:
-            el.attrs = {}
+        if isinstance(item, NavigableString):
+            if not isinstance(item, Comment):
+                parts.append(item.output_ready("minimal"))
+            continue
+        if not isinstance(item, Tag):
+            continue
+        name = item.name.lower()
+        if name in CLEAN_DROP_TAGS:
+            continue
+        if name == "tr":
+            row_cells = sum(1 for c in item.contents if getattr(c, "name", None) in TABLE_CELL_TAGS) \
+                if max_rows is not None or max_cells is not None else 0
+            if row_cells:
+                rows += 1
+                if max_cols is not None:
+                    row_cells = min(row_cells, max_cols)
+                # A row that does not fit the cell budget whole is left out, as table_rows() does
+                if (max_rows is not None and rows > max_rows) or (max_cells is not None and cells + row_cells > max_cells):
+                    continue
+            stack.append(cols)
+            cols = 0
+        elif name in TABLE_CELL_TAGS:
+            cols += 1
+            if max_cols is not None and cols > max_cols:
+                continue
+            cells += 1
+        if name in ALLOWED_TAGS:
+            attrs = "".join(f" {k}={EntitySubstitution.substitute_xml(v, make_quoted_attribute=True)}"
+                            for k, v in _clean_attrs(item))
+            if name in CLEAN_VOID_TAGS and not item.contents:
+                parts.append(f"<{name}{attrs}/>")
+                continue
+            parts.append(f"<{name}{attrs}>")
+            stack.append(f"</{name}>")
+        stack.extend(reversed(item.contents))
+    return "".join(parts)
+
+
+def clean_html_fragment(root) -> str:
+    """Cleaned HTML of a parsed focused body (its children; the <body> itself is not emitted)."""
+    cleaned = "".join(clean_html_of(c) for c in root.contents)
+    return cleaned.strip() if getattr(root, "name", None) == "body" else cleaned
 
-    if getattr(root, "name", None) == "body":
-        return "".join(str(c) for c in root.contents).strip()
-    return str(root)
+
+def strip_html_from_focused_body(focused_body_html: str) -> str:
+    soup = make_soup(focused_body_html)
+    cleaned = clean_html_fragment(soup.body or soup)
+    release_soup(soup)
+    return cleaned
 
 # ────────────────────────────────────────────────────────────────────────────────
 def clamp(s, n):
@@ -813,67 +2374,123 @@ def clamp(s, n):
     return s if len(s) <= n else (s[:n] + "... [truncated]")
 
 
+TABLE_MAX_ROWS = int(os.environ.get("TABLE_MAX_ROWS", "1000") or "1000")
+TABLE_MAX_COLS = int(os.environ.get("TABLE_MAX_COLS", "50") or "50")
+TABLE_MAX_CELLS = int(os.environ.get("TABLE_MAX_CELLS", "10000") or "10000")  # per table, header included
+TABLE_MAX_TABLES = int(os.environ.get("TABLE_MAX_TABLES", "20") or "20")
+TABLE_CELL_TAGS = {"th", "td"}
+
+
 def cell_to_text(cell: Tag) -> str:
     """Convert a table cell (th/td) to inline Markdown-ish text."""
     return "".join(html_inline_to_md(c) for c in cell.children).strip()
 
 
-def table_to_markdown(table: Tag) -> str:
-    rows = []
-    headers = None
+def table_rows(table: Tag, max_rows: int = TABLE_MAX_ROWS, max_cols: int = TABLE_MAX_COLS,
+               max_cells: int = TABLE_MAX_CELLS):
+    """(headers, rows, truncated) of one table, stopping after max_rows body rows, max_cols
+    cells per row or max_cells cells in all.
 
-    for tr in table.find_all("tr"):
-        cells = tr.find_all(["th", "td"])
+    The first row with a <th> is the header; without one, headers are "Col N".
+    Rows are padded to a common width. Cells past the budgets are never collected
+    or converted, so a very wide or long table costs no more than the part kept.
+    """
+    headers, rows = None, []
+    truncated = False
+    cells_left = max_cells
+    # Lazy scan, stopped below: only rows with cells count toward max_rows, so spacer
+    # <tr>s cannot end the table early without marking it truncated
+    for tr in (el for el in table.descendants if el.name == "tr"):
+        # Cells are the row's own children; a descendant scan (which also walks every
+        # cell's contents) is only the fallback for cells wrapped in other markup
+        cells = list(islice((el for el in tr.children if el.name in TABLE_CELL_TAGS), max_cols + 1))
+        if not cells:
+            cells = list(islice((el for el in tr.descendants if el.name in TABLE_CELL_TAGS), max_cols + 1))
         if not cells:
             continue
+        if len(cells) > max_cols:
+            cells, truncated = cells[:max_cols], True
+        if len(cells) > cells_left:
+            truncated = True
+            break
+        cells_left -= len(cells)
         texts = [cell_to_text(c) for c in cells]
         if headers is None and any(c.name == "th" for c in cells):
             headers = texts
-        else:
+        elif len(rows) < max_rows:
             rows.append(texts)
+        else:
+            truncated = True
+            break
 
     if not headers and rows:
         headers = [f"Col {i+1}" for i in range(len(rows[0]))]
-
     if not headers:
-        return ""
+        return None, [], truncated
 
     col_count = max(len(headers), max((len(r) for r in rows), default=0))
     headers = headers + [""] * (col_count - len(headers))
-    normalized_rows = []
-    for r in rows:
-        normalized_rows.append(r + [""] * (col_count - len(r)))
+    rows = [r + [""] * (col_count - len(r)) for r in rows]
+    return headers, rows, truncated
+
 
+def rows_to_markdown(headers: list[str], rows: list[list[str]], caption: str | None) -> str:
     lines = ["| " + " | ".join(headers) + " |"]
-    lines.append("| " + " | ".join(["---"] * col_count) + " |")
-    for r in normalized_rows:
+    lines.append("| " + " | ".join(["---"] * len(headers)) + " |")
+    for r in rows:
         lines.append("| " + " | ".join(r) + " |")
-
-    caption_el = table.find("caption")
-    caption = fix_text(caption_el.get_text(" ", strip=True)) if caption_el else None
     md = "\n".join(lines)
     return (caption + "\n" + md).strip() if caption else md
 
 
-def extract_tables_from_focused_body(focused_body_html: str, max_tables: int = 20):
-    """Extract tables as Markdown strings and cleaned HTML."""
-    soup = BeautifulSoup(focused_body_html, "lxml")
+def extract_tables_from_root(root, max_tables: int = TABLE_MAX_TABLES, structured: bool = False):
+    """Tables of an already-parsed focused body: Markdown, cleaned HTML and caption per table.
+
+    One walk per table for the cells and one for the cleaned HTML, both cut at
+    TABLE_MAX_ROWS rows, TABLE_MAX_COLS cells per row and TABLE_MAX_CELLS cells;
+    "truncated" marks tables that were cut. structured adds
+    "headers" and "rows" (lists of cell strings).
+    """
     tables = []
-    for idx, table in enumerate(soup.find_all("table")):
-        if idx >= max_tables:
-            break
-        md = table_to_markdown(table)
-        cleaned_html = strip_html_from_focused_body(str(table))
-        tables.append({
-            "markdown": md,
-            "html": cleaned_html,
-            "caption": fix_text(table.find("caption").get_text(" ", strip=True)) if table.find("caption") else None,
-        })
+    for table in root.find_all("table", limit=max_tables):
+        caption_el = table.find("caption", recursive=False)
+        caption = fix_text(caption_el.get_text(" ", strip=True)) if caption_el else None
+        headers, rows, truncated = table_rows(table)
+        entry = {
+            "markdown": rows_to_markdown(headers, rows, caption) if headers else "",
+            # + 1 row: the header
+            "html": clean_html_of(table, max_rows=TABLE_MAX_ROWS + 1, max_cols=TABLE_MAX_COLS,
+                                  max_cells=TABLE_MAX_CELLS),
+            "caption": caption,
+        }
+        if truncated:
+            entry["truncated"] = True
+        if structured:
+            entry["headers"] = headers or []
+            entry["rows"] = rows
+        tables.append(entry)
     return tables
 
 
-SCHEMA_LD_JSON_RE = re.compile(r"<script[^>]+type=['\"]application/ld\+json['\"][^>]*>(.*?)</script>", re.IGNORECASE | re.DOTALL)
-SCHEMA_TAG_RE = re.compile(r"<schema[^>]*>(.*?)</schema>", re.IGNORECASE | re.DOTALL)
+def extract_tables_from_focused_body(focused_body_html: str, max_tables: int = TABLE_MAX_TABLES,
+                                     structured: bool = False):
+    """Extract tables as Markdown strings and cleaned HTML."""
+    soup = make_soup(focused_body_html)
+    tables = extract_tables_from_root(soup, max_tables, structured)
+    release_soup(soup)
+    return tables
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Structured data (JSON-LD, microdata, OpenGraph) from the already-parsed page
+# ────────────────────────────────────────────────────────────────────────────────
+SCHEMA_IN_OUTLINE = os.environ.get("SCHEMA_IN_OUTLINE", "1").strip().lower() not in {"0", "false", "no", "off"}
+MICRODATA_MAX_DEPTH = 16
+OPENGRAPH_PREFIXES = ("og:", "article:", "product:", "profile:", "book:", "music:", "video:", "twitter:")
+_MICRODATA_URL_ATTRS = {
+    "a": "href", "area": "href", "link": "href", "audio": "src", "embed": "src", "iframe": "src",
+    "img": "src", "source": "src", "track": "src", "video": "src", "object": "data",
+}
 
 
 def find_schema_type(data):
@@ -895,22 +2512,104 @@ def find_schema_type(data):
     return None
 
 
-def extract_schema_markup(raw_html: str):
-    schema_blocks = []
-    for m in SCHEMA_LD_JSON_RE.finditer(raw_html):
-        schema_raw = m.group(1)
-        schema_type = None
-        try:
-            data = json.loads(schema_raw.strip())
-            schema_type = find_schema_type(data)
-        except Exception:
-            schema_type = None
-        schema_blocks.append({"raw": schema_raw, "type": schema_type})
+def parse_json_ld(raw: str):
+    """Decoded JSON-LD block, tolerating the <!-- --> / CDATA wrappers some CMSes add; None if invalid."""
+    text = raw.strip()
+    for prefix, suffix in (("<!--", "-->"), ("//<![CDATA[", "//]]>"), ("<![CDATA[", "]]>")):
+        if text.startswith(prefix) and text.endswith(suffix):
+            text = text[len(prefix):-len(suffix)].strip()
+    try:
+        return json_loads(text)
+    except ValueError:
+        return None
+
+
+def _microdata_value(el, base_url: str):
+    attr = _MICRODATA_URL_ATTRS.get(el.name)
+    if el.name == "meta":
+        return el.get("content", "")
+    if attr:
+        value = (el.get(attr) or "").strip()
+        return urljoin(base_url, value) if value else ""
+    if el.name in ("data", "meter"):
+        return el.get("value", "")
+    if el.name == "time" and el.get("datetime"):
+        return el["datetime"]
+    return fix_text(el.get_text(" ", strip=True))
+
+
+def microdata_item(scope, base_url: str, depth: int = 0) -> dict:
+    """One itemscope: {"type", "id"?, "properties": {name: [values]}}; nested items become dicts.
+
+    Properties are the itemprop descendants whose nearest itemscope is this one,
+    found with an explicit stack so deep markup cannot hit the recursion limit.
+    """
+    item = {"type": scope.get("itemtype")}
+    if scope.get("itemid"):
+        item["id"] = scope["itemid"]
+    item["properties"] = {}
+    stack = [c for c in reversed(scope.contents) if isinstance(c, Tag)]
+    while stack:
+        el = stack.pop()
+        is_scope = el.has_attr("itemscope")
+        names = (el.get("itemprop") or "").split()
+        if names:
+            if is_scope:
+                value = (microdata_item(el, base_url, depth + 1) if depth < MICRODATA_MAX_DEPTH
+                         else {"type": el.get("itemtype"), "properties": {}})
+            else:
+                value = _microdata_value(el, base_url)
+            for name in names:
+                item["properties"].setdefault(name, []).append(value)
+        if not is_scope:
+            stack.extend(c for c in reversed(el.contents) if isinstance(c, Tag))
+    return item
+
 
-    for m in SCHEMA_TAG_RE.finditer(raw_html):
-        schema_blocks.append({"raw": m.group(1), "type": "schema"})
+def _structured_tag(tag) -> bool:
+    name = tag.name
+    if name == "script":
+        return (tag.get("type") or "").strip().lower() == "application/ld+json"
+    if name == "meta":
+        return (tag.get("property") or tag.get("name") or "").strip().lower().startswith(OPENGRAPH_PREFIXES)
+    return name == "schema" or (tag.has_attr("itemscope") and not tag.has_attr("itemprop"))
 
-    return schema_blocks
+
+def extract_structured_data(soup, base_url: str, want_objects: bool = False) -> dict:
+    """JSON-LD, microdata and OpenGraph in one walk over a parsed page (before scripts are stripped).
+
+    Returns {"schema_blocks": [{"raw", "type"}], "structured": {...} or None}.
+    schema_blocks always comes back (it feeds schema_markup and the outline);
+    the parsed objects, microdata and OpenGraph only when want_objects.
+    """
+    schema_blocks, json_ld, microdata, opengraph = [], [], [], {}
+    for tag in soup.find_all(_structured_tag):
+        if tag.name == "script":
+            raw = tag.string or ""
+            data = parse_json_ld(raw)
+            schema_blocks.append({"raw": raw, "type": find_schema_type(data) if data is not None else None})
+            if want_objects and data is not None:
+                json_ld.extend(data if isinstance(data, list) else [data])
+        elif tag.name == "schema":
+            schema_blocks.append({"raw": tag.decode_contents(), "type": "schema"})
+        elif not want_objects:
+            continue
+        elif tag.name == "meta":
+            key = (tag.get("property") or tag.get("name")).strip().lower()
+            content = tag.get("content")
+            if content is None:
+                continue
+            value = fix_text(content.strip())
+            if key not in opengraph:
+                opengraph[key] = value
+            elif isinstance(opengraph[key], list):
+                opengraph[key].append(value)
+            else:
+                opengraph[key] = [opengraph[key], value]
+        else:
+            microdata.append(microdata_item(tag, base_url))
+    structured = {"json_ld": json_ld, "microdata": microdata, "opengraph": opengraph} if want_objects else None
+    return {"schema_blocks": schema_blocks, "structured": structured}
 
 
 def schema_sections_from_markup(schema_blocks):
@@ -932,6 +2631,21 @@ def schema_sections_from_markup(schema_blocks):
 def home():
     return "Trafilatura scraper is running."
 
+
+@app.route("/metrics")
+def metrics():
+    stats = SINGLE_FLIGHT.stats
+    body = METRICS.render(extra_counters={
+        "pagescraper_coalesce_leaders_total": stats["leaders"],
+        "pagescraper_coalesced_total": stats["coalesced"],
+        "pagescraper_coalesce_follower_timeouts_total": stats["follower_timeouts"],
+        "pagescraper_admission_in_flight": ADMISSION.in_flight,
+        "pagescraper_admission_fetch_busy": ADMISSION.fetch_busy,
+        "pagescraper_admission_shed_total": ADMISSION.stats["shed"],
+        "pagescraper_admission_fetch_ewma_seconds": ADMISSION.ewma.get("fetch", 0.0),
+    })
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
 def extract_sitemap_urls(html_or_xml: str, base_url: str) -> list[str]:
     """Extract a list of URLs from sitemap XML or from HTML <a href>. Returns absolute URLs only."""
     urls = []
@@ -946,7 +2660,7 @@ def extract_sitemap_urls(html_or_xml: str, base_url: str) -> list[str]:
                 urls.append(u)
         return urls
     # HTML: all <a href="...">
-    soup = BeautifulSoup(text, "lxml")
+    soup = make_soup(text)
     for a in soup.find_all("a", href=True):
         href = (a["href"] or "").strip()
         if href.startswith("http://") or href.startswith("https://"):
@@ -956,11 +2670,45 @@ def extract_sitemap_urls(html_or_xml: str, base_url: str) -> list[str]:
     return urls
 
 
-@app.route("/read", methods=["POST"])
-def read_page():
-    data = request.get_json(force=True, silent=True) or {}
-    url = data.get("url")
-    g.req_url = url
+MARKDOWN_LINK_RE = re.compile(r"\]\((https?://[^)\s]+)")
+
+
+def extract_page_links(soup, base_url: str) -> list[str]:
+    """Absolute, fragment-free http(s) links from an already-parsed page, in document order.
+
+    Honours <base href> and skips rel="nofollow" anchors.
+    """
+    base_tag = soup.find("base", href=True)
+    base = urljoin(base_url, base_tag["href"]) if base_tag else base_url
+    links, seen = [], set()
+    for a in soup.find_all("a", href=True):
+        if "nofollow" in (a.get("rel") or []):
+            continue
+        href = (a["href"] or "").strip()
+        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:", "data:")):
+            continue
+        link = urljoin(base, href).split("#", 1)[0]
+        if link.startswith(("http://", "https://")) and link not in seen:
+            seen.add(link)
+            links.append(link)
+    return links
+
+
+def extract_markdown_links(text: str) -> list[str]:
+    """Links from reader (markdown) output, for pages that only came back through the reader."""
+    return list(dict.fromkeys(m.group(1) for m in MARKDOWN_LINK_RE.finditer(text or "")))
+
+
+def _bool_option(value, default: bool) -> bool:
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes", "on"}
+    return bool(value)
+
+
+def parse_read_options(data: dict) -> dict:
+    """Normalize the /read JSON body into the options the pipeline needs."""
     max_chars_raw = data.get("max_chars", 5000)
     # Fast-mode + hard wall-clock cap so upstream timeouts don't exceed client limits
     fast_mode_raw = data.get("fast_mode")
@@ -985,7 +2733,6 @@ def read_page():
         reader_retries = 2
         hard_limit = float(os.environ.get("READ_HARD_TIMEOUT_SECONDS", "25") or "25")
 
-    start_ts = time.time()
     try:
         max_chars = int(max_chars_raw) if max_chars_raw not in (None, "") else 5000
     except (ValueError, TypeError):
@@ -1004,91 +2751,380 @@ def read_page():
     else:
         clean_html = bool(clean_html_raw)
 
-    if not url or not isinstance(url, str) or not url.startswith(("http://", "https://")):
-        return soft_fail(url, "Invalid or missing URL", reason="INPUT", extra={"length": 0})
+    # structured_data: parsed JSON-LD / microdata / OpenGraph objects in the response
+    structured_data = _bool_option(data.get("structured_data"), False)
+    # schema_in_outline: repeat JSON-LD blocks as outline sections + flat_outline (legacy shape)
+    schema_in_outline = _bool_option(data.get("schema_in_outline"), SCHEMA_IN_OUTLINE)
+    # structured_tables: also return each table as "headers" + "rows" (lists of cell strings)
+    structured_tables = _bool_option(data.get("structured_tables"), False)
+    # stream: NDJSON records (meta, sections, tables, summary) as each stage finishes
+    stream = _bool_option(data.get("stream"), False)
+
+    return {
+        "max_chars": max_chars,
+        "fast_mode": fast_mode,
+        "fetch_timeout": fetch_timeout,
+        "fetch_retries": fetch_retries,
+        "reader_timeout": reader_timeout,
+        "reader_retries": reader_retries,
+        "hard_limit": hard_limit,
+        "return_html": return_html,
+        "is_sitemap": is_sitemap,
+        "clean_html": clean_html,
+        "structured_data": structured_data,
+        "schema_in_outline": schema_in_outline,
+        "structured_tables": structured_tables,
+        "stream": stream,
+        "collect_links": False,  # /crawl turns this on to get "links" from the parsed DOM
+    }
+
+
+def adaptive_timeouts(url: str, opts: dict, budget: float) -> dict:
+    """Per-attempt fetch/reader timeouts and retries for url's domain, bounded by the budget left.
+
+    Once LATENCY has ADAPTIVE_MIN_SAMPLES for the domain its learned timeout replaces
+    the fast_mode constant from parse_read_options(); learned retries are kept only
+    while another attempt still fits the budget, and dropped for domains that keep failing.
+    """
+    key = domain_key(url)
+    budget = max(0.0, budget)
+    out = {"budget_s": round(budget, 3)}
+    for kind, latency_key in (("fetch", key), ("reader", f"reader:{key}")):
+        timeout = float(opts[f"{kind}_timeout"])
+        retries = opts[f"{kind}_retries"]
+        source = "default"
+        learned = LATENCY.timeout(latency_key) if ADAPTIVE_TIMEOUTS else None
+        timeout = max(0.1, min(learned or timeout, budget))
+        if learned is not None:
+            source = "adaptive"
+            attempts_fit = int(budget // (timeout + 0.8)) or 1  # 0.8s ~ FetchManager's first backoff
+            retries = min(max(retries, 1), attempts_fit - 1)
+            if LATENCY.get(latency_key)["fail"] > 0.8:
+                retries = 0
+        out[f"{kind}_timeout"] = round(timeout, 2)
+        out[f"{kind}_retries"] = retries
+        out[f"{kind}_source"] = source
+    return out
+
+
+def wants_debug_timings(data: dict) -> bool:
+    """debug_timings is honoured only when DEBUG_TIMINGS=1 or the caller presents ADMIN_TOKEN."""
+    raw = data.get("debug_timings")
+    if isinstance(raw, str):
+        raw = raw.strip().lower() in {"1", "true", "yes", "on"}
+    if not raw:
+        return False
+    if DEBUG_TIMINGS_ENABLED:
+        return True
+    token = request.headers.get("X-Admin-Token") or ""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def build_timings(trace: dict, start_ts: float) -> dict:
+    timings = {
+        "total_ms": round((time.time() - start_ts) * 1000, 1),
+        "stages_ms": {k: round(v * 1000, 1) for k, v in trace.get("stages", {}).items()},
+        "bytes_downloaded": trace.get("bytes_downloaded", 0),
+        "dom_nodes": trace.get("dom_nodes"),
+        "parses": dict(trace.get("parses", {})),
+        "used_reader": trace.get("used_reader"),
+        "timeouts": trace.get("timeouts"),
+        "extract": trace.get("extract"),
+        "net": net_summary(trace),
+    }
+    if "profile" in trace:
+        timings["profile"] = trace["profile"]
+    if "profile_dump" in trace:
+        timings["profile_dump"] = trace["profile_dump"]
+    return timings
+
+
+def read_flight_key(url: str, opts: dict) -> tuple:
+    """Coalescing key: normalized URL plus every option that changes the unclamped output.
+
+    max_chars is deliberately absent — each caller clamps the shared result itself.
+    """
+    return (
+        normalize_url(url),
+        opts["fast_mode"],
+        opts["is_sitemap"],
+        opts["return_html"],
+        opts["clean_html"],
+        opts["structured_data"],
+        opts["schema_in_outline"],
+        opts["structured_tables"],
+    )
+
+
+def parse_html_document(html: str, url: str, trace: dict, want_links: bool = False,
+                        want_body_html: bool = False, want_structured: bool = False) -> dict:
+    """First CPU stage: parse the page once for meta, schema and links, then focus the body.
+
+    Returns those plus focused_html (input of the later stages), full_html for the
+    main-text retries (None in lite mode) and, with want_body_html, the raw body.
+    Oversized markup is processed in a degraded mode (recorded in trace["degraded"])
+    rather than parsed whole.
+    """
+    with bind_trace(trace):
+        degraded = trace.setdefault("degraded", [])
+        html, dom_truncated = cap_markup_nodes(html, MAX_DOM_NODES)
+        if dom_truncated:
+            degraded.append("dom_truncated")
+        lite = bool(LITE_EXTRACTION_BYTES) and len(html) > LITE_EXTRACTION_BYTES
+        if lite:
+            degraded.append("lite_extraction")
+
+        check_deadline("parse")
+        body_slice = slice_body_html(html)  # exact body
+        with stage_timer("parse", trace):
+            soup_full = make_soup(html)
+        with stage_timer("schema", trace):
+            structured = extract_structured_data(soup_full, url, want_structured)
+        with stage_timer("parse", trace):
+            strip_non_content(soup_full)
+        if trace.get("debug"):
+            trace["dom_nodes"] = sum(1 for _ in soup_full.find_all(True))
+        meta = get_meta(soup_full, url)
+        links = None
+        if want_links:
+            with stage_timer("links", trace):
+                links = extract_page_links(soup_full, url)
+
+        if body_slice is not None:
+            # Focus the body to main/article or best content container
+            body_html = body_slice
+            full_html = html
+        else:
+            # Fallback: no <body> found — focus from cleaned full soup
+            body_html = str(soup_full)
+            full_html = body_html
+        release_soup(soup_full)
+        del soup_full, body_slice
+        check_deadline("focus")
+        with stage_timer("focus", trace):
+            focused_html = focus_body_html(body_html)
+
+        return {
+            "meta": meta,
+            "links": links,
+            "schema_blocks": structured["schema_blocks"],
+            "structured": structured["structured"],
+            "focused_html": focused_html,
+            # lite: no whole-document retries, each of which would build another full tree
+            "full_html": None if lite else full_html,
+            "body_html": body_html if want_body_html else None,
+        }
+
+
+def render_focused_document(focused_html: str, trace: dict, want_clean_html: bool = False,
+                            want_structured_tables: bool = False) -> dict:
+    """Second CPU stage: outline, tables and cleaned HTML, all from one tree of the focused body.
+
+    Once the deadline has passed after the outline, tables and cleaned HTML are
+    skipped (degraded "deadline_tables") rather than overrunning the hard limit.
+    """
+    with bind_trace(trace):
+        check_deadline("outline")
+        with stage_timer("parse", trace):
+            focused_soup = make_soup(focused_html)
+            focused_root = focused_soup.body or focused_soup
+        with stage_timer("outline", trace):
+            sections, flat_md = outline_from_root(focused_root)
+        tables, clean_html = [], None
+        if deadline_passed():
+            trace.setdefault("degraded", []).append("deadline_tables")
+            want_clean_html = False
+        else:
+            with stage_timer("tables", trace):
+                tables = extract_tables_from_root(focused_root, structured=want_structured_tables)
+        if any(t.get("truncated") for t in tables):
+            trace.setdefault("degraded", []).append("table_truncated")
+        if want_clean_html:
+            with stage_timer("clean_html", trace):
+                clean_html = clean_html_fragment(focused_root)
+        release_soup(focused_soup)
+        return {"sections": sections, "flat_md": flat_md, "tables": tables, "clean_html": clean_html}
+
+
+def extract_document_text(focused_html: str, full_html: str | None, trace: dict) -> str:
+    """Last CPU stage: main text via the extraction cascade (the slowest of the three)."""
+    with bind_trace(trace):
+        with stage_timer("extract", trace):
+            main_text = extract_main_text(focused_html, full_html=full_html)
+        return fix_text((main_text or "").strip())
+
+
+def extract_html_document(html: str, url: str, trace: dict, want_clean_html: bool = False,
+                          want_links: bool = False, want_body_html: bool = False,
+                          want_structured: bool = False, want_structured_tables: bool = False) -> dict:
+    """CPU-bound half of the pipeline in one call: parse, schema, focus, outline, tables, main text.
+
+    The stages run in the order /read streams them. Each binds the trace itself and
+    touches no request-scoped state, so any of them may run on another native
+    thread via run_cpu_bound(); each tree is released as soon as its output exists.
+    """
+    doc = parse_html_document(html, url, trace, want_links, want_body_html, want_structured)
+    doc.update(render_focused_document(doc["focused_html"], trace, want_clean_html, want_structured_tables))
+    doc["main_text"] = extract_document_text(doc.pop("focused_html"), doc.pop("full_html"), trace)
+    return doc
+
+
+def response_text(resp) -> str:
+    # Use resp.text directly instead of robust_decode to avoid encoding issues
+    return resp.text or robust_decode(resp.content, fallback_text="")
+
+
+def run_read_pipeline(url: str, opts: dict, start_ts: float, trace: dict | None = None, emit=None) -> dict:
+    """Fetch + extract one page. Returns an unclamped payload dict (ok or fail).
+
+    The payload may be shared between coalesced callers, so it must not be mutated
+    after it is returned; clamp_read_payload() builds each caller's own copy.
+    Stage timings and used_reader are recorded into `trace` when given. emit(kind,
+    record), when given, is called with "meta", then each "section" and "table",
+    as soon as each is known (unclamped, from the calling thread).
+    """
+    trace = trace if trace is not None else {}
+    trace["used_reader"] = False
+    with bind_trace(trace):
+        return _run_read_pipeline(url, opts, start_ts, trace, emit or (lambda kind, record: None))
+
+
+def meta_record(url: str, meta: dict) -> dict:
+    return {
+        "title": meta.get("title"),
+        "meta_description": meta.get("meta_description"),
+        "url": url,
+        "canonical": meta.get("canonical") or url,
+        "robots": meta.get("robots"),
+        "lang": meta.get("lang"),
+        "h1": meta.get("h1"),
+    }
+
+
+def _run_read_pipeline(url: str, opts: dict, start_ts: float, trace: dict, emit) -> dict:
+    hard_limit = opts["hard_limit"]
+    is_sitemap = opts["is_sitemap"]
+    timeouts = adaptive_timeouts(url, opts, hard_limit - (time.time() - start_ts))
+    trace["timeouts"] = timeouts
+    fetch_timeout = timeouts["fetch_timeout"]
+    fetch_retries = timeouts["fetch_retries"]
+    reader_timeout = timeouts["reader_timeout"]
+    reader_retries = timeouts["reader_retries"]
 
     try:
         def _do_fetch():
             """Fetch logic that runs inside the hard-timeout wrapper."""
-            _resp = FETCH_MANAGER.fetch(url, timeout=fetch_timeout, max_retries=fetch_retries)
+            t0 = time.perf_counter()
+            try:
+                return _fetch_with_fallback()
+            finally:
+                ADMISSION.observe("fetch", time.perf_counter() - t0)
+
+        def _fetch_with_fallback():
+            with stage_timer("fetch", trace):
+                _resp = FETCH_MANAGER.fetch(url, timeout=fetch_timeout, max_retries=fetch_retries)
+            note_fetch_net(trace, _resp)
             _used_reader = False
             if not _resp:
-                _rr = FETCH_MANAGER.fetch_reader(url, timeout=reader_timeout, max_retries=reader_retries)
+                with stage_timer("reader", trace):
+                    _rr = FETCH_MANAGER.fetch_reader(url, timeout=reader_timeout, max_retries=reader_retries)
+                note_fetch_net(trace, _rr)
                 if _rr and _rr.status_code == 200:
                     return _rr, True
                 return None, False
             if _resp.status_code in (401, 403, 429, 451, 503):
-                _rr = FETCH_MANAGER.fetch_reader(url, timeout=reader_timeout, max_retries=reader_retries)
+                with stage_timer("reader", trace):
+                    _rr = FETCH_MANAGER.fetch_reader(url, timeout=reader_timeout, max_retries=reader_retries)
+                note_fetch_net(trace, _rr)
                 if _rr and _rr.status_code == 200:
                     return _rr, True
                 return _resp, False
             return _resp, _used_reader
 
+        def _do_reader_fallback():
+            with stage_timer("reader", trace):
+                _rr = FETCH_MANAGER.fetch_reader(url, timeout=reader_timeout, max_retries=reader_retries)
+            note_fetch_net(trace, _rr)
+            return _rr
+
+        # The budget started at admission (start_ts); time spent queued counts against it
+        budget = hard_limit - (time.time() - start_ts)
+        if budget <= 0:
+            return fail_payload(url, "Timeout fetching page", reason="TIMEOUT", extra={"length": 0})
         try:
-            resp, used_reader = fetch_with_hard_timeout(_do_fetch, hard_limit)
+            resp, used_reader = fetch_with_hard_timeout(_do_fetch, budget)
+            trace["used_reader"] = used_reader
+            if resp is not None:
+                trace["bytes_downloaded"] = trace.get("bytes_downloaded", 0) + len(resp.content or b"")
         except TimeoutError:
-            return soft_fail(url, "Timeout fetching page", reason="TIMEOUT", extra={"length": 0})
+            return fail_payload(url, "Timeout fetching page", reason="TIMEOUT", extra={"length": 0})
 
         if not resp:
-            return soft_fail(url, "Network error - unable to fetch page", reason="NETWORK", extra={"length": 0})
+            return fail_payload(url, "Network error - unable to fetch page", reason="NETWORK", extra={"length": 0})
 
         if not used_reader and resp.status_code in (401, 403, 429, 451, 503):
-            return soft_fail(url, "Crawlers are blocked", reason="BLOCKED",
-                             http_status=resp.status_code, extra={"length": 0, "block_type": "access_denied"})
+            return fail_payload(url, "Crawlers are blocked", reason="BLOCKED",
+                                http_status=resp.status_code, extra={"length": 0, "block_type": "access_denied"})
 
         if resp.status_code != 200:
-            return soft_fail(url, f"Failed to load page (HTTP {resp.status_code})", reason="NETWORK",
-                             http_status=resp.status_code, extra={"length": 0})
+            return fail_payload(url, f"Failed to load page (HTTP {resp.status_code})", reason="NETWORK",
+                                http_status=resp.status_code, extra={"length": 0})
 
         ctype = (resp.headers.get("Content-Type") or "").lower()
         allowed_mime = "text/html" in ctype or "application/xhtml+xml" in ctype
         if is_sitemap:
             allowed_mime = allowed_mime or "text/xml" in ctype or "application/xml" in ctype
         if not used_reader and not allowed_mime:
-            return soft_fail(url, "Unsupported MIME type", reason="UNSUPPORTED_MIME",
-                             http_status=resp.status_code, extra={"length": 0, "content_type": ctype})
+            return fail_payload(url, "Unsupported MIME type", reason="UNSUPPORTED_MIME",
+                                http_status=resp.status_code, extra={"length": 0, "content_type": ctype})
 
-        # Use resp.text directly instead of robust_decode to avoid encoding issues
-        html = resp.text or robust_decode(resp.content, fallback_text="")
+        with stage_timer("decode", trace):
+            html = response_text(resp)
         remaining = hard_limit - (time.time() - start_ts)
         block_marker = None if used_reader else detect_soft_block(html)
         if block_marker and remaining > 2:
             try:
-                reader_resp = fetch_with_hard_timeout(
-                    lambda: FETCH_MANAGER.fetch_reader(url, timeout=reader_timeout, max_retries=reader_retries),
-                    remaining - 1)
+                reader_resp = fetch_with_hard_timeout(_do_reader_fallback, remaining - 1)
                 if reader_resp and reader_resp.status_code == 200:
                     resp = reader_resp
                     used_reader = True
-                    html = resp.text or robust_decode(resp.content, fallback_text="")
+                    trace["used_reader"] = True
+                    trace["bytes_downloaded"] = trace.get("bytes_downloaded", 0) + len(resp.content or b"")
+                    with stage_timer("decode", trace):
+                        html = response_text(resp)
             except TimeoutError:
                 pass  # continue with original response
-        schema_blocks = extract_schema_markup(html)
         remaining = hard_limit - (time.time() - start_ts)
         if not used_reader and len(html) < 200 and remaining > 2:
             try:
-                reader_resp = fetch_with_hard_timeout(
-                    lambda: FETCH_MANAGER.fetch_reader(url, timeout=reader_timeout, max_retries=reader_retries),
-                    remaining - 1)
+                reader_resp = fetch_with_hard_timeout(_do_reader_fallback, remaining - 1)
                 if reader_resp and reader_resp.status_code == 200:
                     resp = reader_resp
                     used_reader = True
-                    html = resp.text or robust_decode(resp.content, fallback_text="")
-                    schema_blocks = extract_schema_markup(html)
+                    trace["used_reader"] = True
+                    trace["bytes_downloaded"] = trace.get("bytes_downloaded", 0) + len(resp.content or b"")
+                    with stage_timer("decode", trace):
+                        html = response_text(resp)
             except TimeoutError:
                 pass  # continue with what we have
 
+        # Keep only what later stages need from the response; its bytes can go now
+        resp_status = resp.status_code
+        if getattr(resp, "truncated", False):
+            trace.setdefault("degraded", []).append("body_truncated")
+        resp = None
+
         # Sitemap-only mode: return list of URLs as JSON, nothing else
         if is_sitemap:
             urls = extract_sitemap_urls(html, url)
-            return jsonify({"ok": True, "urls": urls}), 200
+            return {"ok": True, "urls": urls}
 
         if used_reader and ("text/html" not in ctype and "application/xhtml+xml" not in ctype):
             title, reader_url, reader_content = parse_reader_text(html)
             main_text = fix_text(reader_content or html).strip()
             if not main_text:
-                return soft_fail(url, "Empty or suspicious page", reason="EMPTY",
-                                 http_status=resp.status_code, extra={"length": 0})
+                return fail_payload(url, "Empty or suspicious page", reason="EMPTY",
+                                    http_status=resp_status, extra={"length": 0})
             sections = [{
                 "title": "Content",
                 "level": "H2",
@@ -1105,40 +3141,52 @@ def read_page():
                 "h1": None,
             }
             body_html_for_output = None
-            focused_body_html = None
+            links = extract_markdown_links(html) if opts.get("collect_links") else None
+            schema_blocks, structured = [], None
+            emit("meta", meta_record(url, meta))
         else:
-            body_slice = slice_body_html(html)  # exact body
-            soup_full = clean_dom_full(html)
-
-            if body_slice is not None:
-                # Focus the body to main/article or best content container
-                focused_body_html = focus_body_html(body_slice)
-                body_html_for_output = body_slice
-                main_text = extract_main_text(focused_body_html, full_html=html)
-                sections, flat_md = extract_outline_from_focused_body(focused_body_html)
-                tables = extract_tables_from_focused_body(focused_body_html)
-            else:
-                # Fallback: no <body> found — focus from cleaned full soup
-                fallback_html = str(soup_full)
-                body_html_for_output = fallback_html
-                focused_body_html = focus_body_html(fallback_html)
-                main_text = extract_main_text(focused_body_html, full_html=fallback_html)
-                sections, flat_md = extract_outline_from_focused_body(focused_body_html)
-                tables = extract_tables_from_focused_body(focused_body_html)
-
-            main_text = fix_text((main_text or "").strip())
-            meta = get_meta(soup_full, url)
-
-        if schema_blocks:
+            # Three CPU stages instead of one extract_html_document() call so a streaming
+            # caller gets meta, then sections and tables, before the main-text cascade runs
+            want_clean_html = opts["return_html"] and opts["clean_html"]
+            # The hard limit bounds extraction too: stages check it in between (ExtractDeadline)
+            trace["deadline"] = start_ts + hard_limit
+            t0 = time.perf_counter()
+            doc = run_cpu_bound(parse_html_document, html, url, trace, opts.get("collect_links", False),
+                                opts["return_html"] and not opts["clean_html"], opts["structured_data"])
+            html = None
+            meta = doc["meta"]
+            emit("meta", meta_record(url, meta))
+            doc.update(run_cpu_bound(render_focused_document, doc["focused_html"], trace,
+                                     want_clean_html, opts["structured_tables"]))
+            main_text = None  # filled in below, after sections and tables are out
+            sections, flat_md = doc["sections"], doc["flat_md"]
+            tables = doc["tables"]
+            body_html_for_output = doc["body_html"]
+            links = doc["links"]
+            schema_blocks, structured = doc["schema_blocks"], doc["structured"]
+
+        if schema_blocks and opts["schema_in_outline"]:
             schema_sections = schema_sections_from_markup(schema_blocks)
             sections.extend(schema_sections)
             flat_md = sections_to_markdown(sections)
+        for section in sections[:200]:
+            emit("section", section)
+        for table in tables:
+            emit("table", table)
+        if main_text is None and deadline_passed():
+            # No time left for the main-text cascade: the outline's text stands in for it
+            trace.setdefault("degraded", []).append("deadline_main_text")
+            main_text = "\n\n".join(p for s in sections for p in s.get("paragraphs") or [])
+            ADMISSION.observe("extract", time.perf_counter() - t0)
+        elif main_text is None:
+            main_text = run_cpu_bound(extract_document_text, doc.pop("focused_html"), doc.pop("full_html"), trace)
+            ADMISSION.observe("extract", time.perf_counter() - t0)
 
         if not main_text and not sections:
-            return soft_fail(url, "Could not extract readable content", reason="EXTRACT_FAIL",
-                             extra={"length": 0})
+            return fail_payload(url, "Could not extract readable content", reason="EXTRACT_FAIL",
+                                extra={"length": 0})
 
-        # Build response in the required order
+        # Build response in the required order (values unclamped; see clamp_read_payload)
         result = {}
         result["title"] = meta.get("title")
         result["meta_description"] = meta.get("meta_description")
@@ -1152,39 +3200,1322 @@ def read_page():
             "flat_outline": len(flat_md or ""),
         }
         result["h1"] = meta.get("h1")
-        result["flat_outline"] = clamp(flat_md, max_chars)
+        result["flat_outline"] = flat_md
         result["schema_markup"] = [block["raw"] for block in schema_blocks if block.get("raw")]
-        result["tables"] = [
-            {
-                "markdown": clamp(t.get("markdown"), max_chars),
-                "html": clamp(t.get("html"), max_chars),
-                "caption": t.get("caption"),
-            }
-            for t in tables
-        ]
+        if structured is not None:
+            result["structured_data"] = structured
+        result["tables"] = tables
 
-        if return_html:
+        if opts["return_html"]:
             if used_reader and not body_html_for_output:
-                result["html"] = clamp(main_text, max_chars)
-            elif clean_html:
-                result["html"] = clamp(strip_html_from_focused_body(focused_body_html), max_chars)
+                result["html"] = main_text
+            elif opts["clean_html"]:
+                result["html"] = doc["clean_html"]
             else:
-                result["html"] = clamp(body_html_for_output, max_chars)
+                result["html"] = body_html_for_output
 
         result["outline_sections"] = sections[:200]
-
-        return soft_ok(result)
-
+        if links is not None:
+            result["links"] = links
+        if trace.get("degraded"):
+            result["degraded"] = list(trace["degraded"])
+            for mode in trace["degraded"]:
+                METRICS.inc("pagescraper_degraded_total", mode=mode)
+        result["ok"] = True
+        return result
+
+    except ExtractDeadline:
+        return fail_payload(url, "Timeout extracting page", reason="TIMEOUT", extra={"length": 0})
     except Exception as e:
         msg = (str(e) or "Unexpected error")
         low = msg.lower()
         if "timed out" in low or "timeout" in low:
-            return soft_fail(url, "Timeout fetching page", reason="TIMEOUT", extra={"length": 0})
+            return fail_payload(url, "Timeout fetching page", reason="TIMEOUT", extra={"length": 0})
         if "captcha" in low or "cloudflare" in low:
-            return soft_fail(url, "Crawlers are blocked", reason="BLOCKED", extra={"length": 0})
-        return soft_fail(url, msg, reason="UNKNOWN", extra={"length": 0})
+            return fail_payload(url, "Crawlers are blocked", reason="BLOCKED", extra={"length": 0})
+        return fail_payload(url, msg, reason="UNKNOWN", extra={"length": 0})
+
+
+def clamp_table(t: dict, max_chars: int) -> dict:
+    out = {
+        "markdown": clamp(t.get("markdown"), max_chars),
+        "html": clamp(t.get("html"), max_chars),
+        "caption": t.get("caption"),
+    }
+    if t.get("truncated"):
+        out["truncated"] = True
+    if "rows" in t:
+        out["headers"] = [clamp(h, max_chars) for h in t.get("headers") or []]
+        out["rows"] = [[clamp(c, max_chars) for c in row] for row in t["rows"]]
+    return out
+
+
+def clamp_read_payload(payload: dict, url: str, max_chars: int) -> dict:
+    """Per-caller copy of a (possibly shared) pipeline payload with max_chars applied."""
+    out = dict(payload)
+    if "url" in out:
+        out["url"] = url
+    if not payload.get("ok") or "urls" in payload:
+        return out
+    del out["ok"]  # soft_ok() re-adds it last
+    out["flat_outline"] = clamp(payload.get("flat_outline"), max_chars)
+    out["tables"] = [clamp_table(t, max_chars) for t in payload.get("tables") or []]
+    if "html" in payload:
+        out["html"] = clamp(payload["html"], max_chars)
+    out["outline_sections"] = list(payload.get("outline_sections") or [])
+    return out
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Streaming /read: NDJSON records as the pipeline produces them
+# ────────────────────────────────────────────────────────────────────────────────
+# Payload keys already sent as meta/section/table records, left out of the summary
+STREAMED_KEYS = ("title", "meta_description", "canonical", "robots", "lang", "h1",
+                 "flat_outline", "tables", "outline_sections")
+# Streamed reads run their pipeline here; its fetches still go through _EXECUTOR
+_STREAM_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("STREAM_POOL_SIZE", "") or (500 if ASYNC_MODE else 16)))
+
+METRICS.describe("pagescraper_stream_first_record_seconds", "histogram",
+                 "Time from request start to the first record of a streamed /read, by record type.")
+
+
+def read_stream_records(url: str, opts: dict, start_ts: float, debug: bool = False, holds_slot: bool = False):
+    """Start a streamed read; returns the generator of its records: meta, a section per
+    outline section, a table per table, then summary.
+
+    Records are clamped to max_chars like the JSON response. The summary carries the
+    rest of the payload (ok, length, lengths, schema_markup, html, degraded, ...) or,
+    when the read failed, reason/message. It always comes last, by the hard limit.
+
+    The pipeline starts at once on _STREAM_EXECUTOR. With holds_slot it owns the
+    request's admission slot and releases it when it finishes, so a stream abandoned
+    at its hard limit still counts as load while its pipeline runs. The request's log
+    line and metrics are written when the stream ends, with the summary's outcome.
+    """
+    records = queue.Queue()
+    trace = {"debug": debug}
+
+    def _run():
+        try:
+            payload = run_read_pipeline(url, opts, start_ts, trace, emit=lambda kind, record: records.put((kind, record)))
+        except Exception as e:
+            payload = fail_payload(url, str(e) or "Unexpected error", reason="UNKNOWN", extra={"length": 0})
+        finally:
+            if holds_slot:
+                ADMISSION.release()
+        records.put(("summary", payload))
+
+    _STREAM_EXECUTOR.submit(_run)
+    return _stream_records(url, opts, start_ts, debug, records, trace)
+
+
+def _stream_records(url: str, opts: dict, start_ts: float, debug: bool, records: queue.Queue, trace: dict):
+    counts = {"section": 0, "table": 0}
+    first_record_s = None
+    outcome = (False, "CLIENT_CLOSED", 0)  # until the summary is known
+    try:
+        while True:
+            remaining = opts["hard_limit"] - (time.time() - start_ts)
+            try:
+                kind, record = records.get(timeout=max(0.0, remaining))
+            except queue.Empty:
+                kind, record = "summary", fail_payload(url, "Timeout fetching page", reason="TIMEOUT",
+                                                       extra={"length": 0})
+            if first_record_s is None:
+                first_record_s = time.time() - start_ts
+                METRICS.observe("pagescraper_stream_first_record_seconds", first_record_s, record=kind)
+            if kind == "summary":
+                break
+            if kind in counts:
+                index = counts[kind]
+                counts[kind] += 1
+                record = clamp_table(record, opts["max_chars"]) if kind == "table" else record
+                yield {"type": kind, "index": index, **record}
+            else:
+                yield {"type": kind, **record}
+
+        ok = bool(record.get("ok"))
+        outcome = (ok, record.get("reason"), record.get("length", 0))
+        summary = clamp_read_payload(record, url, opts["max_chars"])
+        for key in STREAMED_KEYS:
+            summary.pop(key, None)
+        summary = {"type": "summary", **summary, "ok": ok,
+                   "section_count": counts["section"], "table_count": counts["table"]}
+        if debug:
+            summary["timings"] = build_timings(trace, start_ts)
+        logger.info(json.dumps({
+            "event": "read_stream",
+            "target_url": url,
+            "ok": ok,
+            "reason": record.get("reason"),
+            "sections": counts["section"],
+            "tables": counts["table"],
+            "first_record_s": round(first_record_s, 3),
+            "elapsed_s": round(time.time() - start_ts, 3),
+        }))
+        yield summary
+    finally:
+        # Also runs when the client goes away mid-stream (GeneratorExit at a yield)
+        note_outcome(*outcome)
+        g.used_reader = trace.get("used_reader")
+        g.timeouts = trace.get("timeouts")
+        g.net = net_summary(trace)
+        g.extract_variant = (trace.get("extract") or {}).get("variant")
+        log_request_line(200)
+
+
+@app.route("/read", methods=["POST"])
+def read_page():
+    data = request_body()
+    url = data.get("url")
+    g.req_url = url
+    start_ts = time.time()
+    opts = parse_read_options(data)
+
+    if not url or not isinstance(url, str) or not url.startswith(("http://", "https://")):
+        return soft_fail(url, "Invalid or missing URL", reason="INPUT", extra={"length": 0})
+
+    debug = wants_debug_timings(data)
+    wants_profile = debug and _bool_option(data.get("profile"), False)
+    if wants_profile and opts["stream"]:
+        # A streamed pipeline runs on another thread than this request's profiler would
+        return soft_fail(url, "profile is not supported with stream", reason="INPUT", extra={"length": 0})
+    if wants_profile and ASYNC_MODE:
+        # cProfile is per OS thread: on the hub it records other greenlets' work, and
+        # this read's extraction runs on _CPU_POOL threads it never sees
+        return soft_fail(url, "profile is not supported in async mode", reason="INPUT", extra={"length": 0})
+    sampled = not opts["stream"] and not ASYNC_MODE and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+    profile = wants_profile or sampled
+    coalesce = READ_COALESCE and not debug and not profile and not opts["stream"]
+
+    # Admission: joining an in-flight read is free; anything else must fit its hard limit.
+    # The hard-limit budget starts here (start_ts), not when the fetch gets a thread.
+    if not (coalesce and SINGLE_FLIGHT.in_flight(read_flight_key(url, opts))):
+        try:
+            admit_read(opts["hard_limit"])
+        except ReadShed as shed:
+            return overloaded_response(url, shed)
+
+    if opts["stream"]:
+        # Flask tears the request down before the body streams, so the pipeline starts
+        # now and takes over the admission slot; the log line is written with the summary
+        records = read_stream_records(url, opts, start_ts, debug, holds_slot=g.admitted)
+        g.admitted = False
+        g.streamed = True
+
+        def _stream():
+            for record in records:
+                yield json_dumps_bytes(record) + b"\n"
+
+        return Response(stream_with_context(_stream()), mimetype="application/x-ndjson")
+
+    def _run():
+        # A coalescing caller skipped admission to join a flight; if that flight ended
+        # before it joined, it leads its own pipeline now and must be admitted first
+        admit_read(opts["hard_limit"])
+        trace = {"debug": debug}
+        if not profile:
+            return run_read_pipeline(url, opts, start_ts, trace), trace
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (one per process on 3.12+)
+            return run_read_pipeline(url, opts, start_ts, trace), trace
+        try:
+            result = run_read_pipeline(url, opts, start_ts, trace)
+        finally:
+            profiler.disable()
+        trace["profile"] = profile_top_functions(profiler, PROFILE_TOP_N)
+        dump_path = dump_profile(profiler, url)
+        if dump_path:
+            trace["profile_dump"] = dump_path
+        return result, trace
+
+    # Single-flight: identical concurrent reads share one fetch + extraction.
+    # Debug/profiled reads always run their own pipeline so the numbers are theirs.
+    if coalesce:
+        key = read_flight_key(url, opts)
+        remaining = opts["hard_limit"] - (time.time() - start_ts)
+        try:
+            (payload, trace), shared, waiters = SINGLE_FLIGHT.do(key, _run, timeout=max(0.0, remaining))
+        except ReadShed as shed:
+            return overloaded_response(url, shed)
+        except TimeoutError:
+            g.coalesced = True
+            return soft_fail(url, "Timeout fetching page", reason="TIMEOUT", extra={"length": 0})
+        g.coalesced = shared
+        g.coalesced_waiters = waiters
+    else:
+        payload, trace = _run()
+    g.used_reader = trace.get("used_reader")
+    g.timeouts = trace.get("timeouts")
+    g.net = net_summary(trace)
+    g.extract_variant = (trace.get("extract") or {}).get("variant")
+    if sampled:
+        logger.info(json.dumps({
+            "event": "profile_sample",
+            "target_url": url,
+            "elapsed_s": round(time.time() - start_ts, 3),
+            "top_functions": trace.get("profile", []),
+        }))
+
+    out = clamp_read_payload(payload, url, opts["max_chars"])
+    if debug:
+        out["timings"] = build_timings(trace, start_ts)
+    with stage_timer("encode"):
+        if not payload.get("ok") or "urls" in payload:
+            note_outcome(payload.get("ok"), payload.get("reason"), payload.get("length", 0))
+            return jsonify(out), 200
+        return soft_ok(out)
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Async job API: persistent SQLite queue, background workers, webhook callbacks
+# ────────────────────────────────────────────────────────────────────────────────
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2") or "2")
+JOB_RESULT_TTL_SECONDS = int(os.environ.get("JOB_RESULT_TTL_SECONDS", "86400") or "86400")
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "120") or "120")
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3") or "3")  # claims before a lost job is failed
+JOB_MAX_BATCH = int(os.environ.get("JOB_MAX_BATCH", "100") or "100")  # stays under RATE_LIMIT_EXTREME_RPM
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+WEBHOOK_RETRIES = 3
+
+
+class JobStore:
+    """SQLite-backed job queue. Safe across threads and gunicorn workers sharing one file.
+
+    Claims are a single UPDATE … RETURNING, so two workers can never run the same
+    job. A job stuck in 'running' past JOB_LEASE_SECONDS (its worker died) is
+    requeued by the next sweep, unless it has been claimed JOB_MAX_ATTEMPTS times
+    already: then it is failed, so a page that kills its worker cannot loop forever.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            batch_id TEXT,
+            status TEXT NOT NULL,            -- queued | running | done | failed
+            priority INTEGER NOT NULL DEFAULT 0,
+            body TEXT NOT NULL,
+            webhook TEXT,
+            result TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            webhook_status TEXT,
+            created REAL NOT NULL,
+            started REAL,
+            finished REAL,
+            expires REAL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created);
+        CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id);
+        CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(self.SCHEMA)
+                    self._ready = True
+        return conn
+
+    def enqueue(self, bodies: list[dict], priorities: list[int], webhook: str | None = None,
+                batch_id: str | None = None) -> list[str]:
+        """Insert one queued job per body; priorities are already-validated ints, one per body."""
+        now = time.time()
+        ids = [uuid.uuid4().hex for _ in bodies]
+        rows = [(job_id, batch_id, "queued", prio, json.dumps(b), b.get("webhook") or webhook, now)
+                for job_id, b, prio in zip(ids, bodies, priorities)]
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO jobs (id, batch_id, status, priority, body, webhook, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return ids
+
+    def claim(self) -> sqlite3.Row | None:
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1 "
+                "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' "
+                "            ORDER BY priority DESC, created LIMIT 1) AND status = 'queued' "
+                "RETURNING *", (time.time(),)).fetchone()
+        finally:
+            conn.close()
+
+    def finish(self, job_id: str, status: str, result: dict):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished = ?, expires = ? WHERE id = ?",
+                (status, json_dumps_bytes(result).decode("utf-8"), now, now + JOB_RESULT_TTL_SECONDS, job_id))
+        finally:
+            conn.close()
+
+    def set_webhook_status(self, job_id: str, webhook_status: str):
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (webhook_status, job_id))
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> sqlite3.Row | None:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+
+    def batch(self, batch_id: str) -> list[sqlite3.Row]:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT * FROM jobs WHERE batch_id = ? ORDER BY created, rowid",
+                                (batch_id,)).fetchall()
+        finally:
+            conn.close()
+
+    def sweep(self):
+        """Drop expired results; requeue jobs whose worker vanished, or fail them once out of attempts."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM jobs WHERE expires IS NOT NULL AND expires < ?", (now,))
+            lost = [(row["id"], json.loads(row["body"]).get("url")) for row in conn.execute(
+                "SELECT id, body FROM jobs WHERE status = 'running' AND started < ? AND attempts >= ?",
+                (now - JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS))]
+            for job_id, url in lost:
+                result = fail_payload(url, f"Job lost its worker {JOB_MAX_ATTEMPTS} times", reason="JOB_ABANDONED",
+                                      extra={"length": 0})
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', result = ?, finished = ?, expires = ? "
+                    "WHERE id = ? AND status = 'running'",
+                    (json_dumps_bytes(result).decode("utf-8"), now, now + JOB_RESULT_TTL_SECONDS, job_id))
+            conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running' AND started < ? AND attempts < ?",
+                         (now - JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS))
+        finally:
+            conn.close()
+
+    def counts(self) -> dict:
+        conn = self._connect()
+        try:
+            return {row["status"]: row["n"] for row in
+                    conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+        finally:
+            conn.close()
+
+
+def job_to_dict(row: sqlite3.Row, include_result: bool = True) -> dict:
+    out = {
+        "id": row["id"],
+        "batch_id": row["batch_id"],
+        "status": row["status"],
+        "priority": row["priority"],
+        "url": json.loads(row["body"]).get("url"),
+        "attempts": row["attempts"],
+        "created": row["created"],
+        "started": row["started"],
+        "finished": row["finished"],
+        "expires": row["expires"],
+        "webhook_status": row["webhook_status"],
+    }
+    if include_result and row["result"]:
+        out["result"] = json.loads(row["result"])
+    return out
+
+
+def post_webhook(url: str, payload: dict) -> str:
+    """POST the finished job to the caller's webhook; returns a short delivery status."""
+    data = json_dumps_bytes(payload)
+    headers = {"Content-Type": "application/json", "User-Agent": "page_scraper-webhook"}
+    if WEBHOOK_SECRET:
+        digest = hmac.new(WEBHOOK_SECRET.encode("utf-8"), data, hashlib.sha256).hexdigest()
+        headers["X-Signature"] = f"sha256={digest}"
+    status = "failed"
+    for attempt in range(WEBHOOK_RETRIES):
+        try:
+            resp = requests.post(url, data=data, headers=headers, timeout=10)
+            if 200 <= resp.status_code < 300:
+                return f"delivered:{resp.status_code}"
+            status = f"failed:{resp.status_code}"
+            if resp.status_code < 500 and resp.status_code != 429:
+                return status
+        except Exception as e:
+            status = f"failed:{type(e).__name__}"
+        time.sleep(1.0 * (2 ** attempt) + random.random() * 0.5)
+    return status
+
+
+def run_job(row: sqlite3.Row) -> tuple[str, dict]:
+    """Run one /read job body through the same pipeline as POST /read."""
+    body = json.loads(row["body"])
+    url = body.get("url")
+    opts = parse_read_options(body)
+    with background_fetches():
+        payload = run_read_pipeline(url, opts, time.time())
+    out = clamp_read_payload(payload, url, opts["max_chars"])
+    out["ok"] = bool(payload.get("ok"))  # clamp_read_payload leaves ok for soft_ok() to add
+    return ("done" if payload.get("ok") else "failed"), out
+
+
+class JobQueue:
+    """Background workers draining JobStore, once per process.
+
+    Never started by importing app.py (tools and tests import it too): the serving
+    hooks (after_fork, the async config's post_worker_init, __main__) start it, and
+    so does the first /jobs call.
+    """
+
+    def __init__(self, store: JobStore, workers: int):
+        self.store = store
+        self.workers = workers
+        self.started_pid = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+
+    def ensure_started(self):
+        if self.started_pid == os.getpid() or self.workers <= 0:
+            return
+        with self.lock:
+            if self.started_pid == os.getpid():
+                return
+            self.started_pid = os.getpid()  # re-start after fork (gunicorn --preload)
+            for i in range(self.workers):
+                threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True).start()
+            threading.Thread(target=self._sweeper, name="job-sweeper", daemon=True).start()
+
+    def notify(self):
+        self.wakeup.set()
+
+    def _worker(self):
+        while True:
+            try:
+                row = self.store.claim()
+            except Exception as e:
+                logger.info(json.dumps({"event": "job_claim_error", "error": str(e)[:200]}))
+                row = None
+            if row is None:
+                self.wakeup.wait(1.0)
+                self.wakeup.clear()
+                continue
+            started = time.time()
+            try:
+                status, result = run_job(row)
+            except Exception as e:
+                status, result = "failed", fail_payload(json.loads(row["body"]).get("url"),
+                                                        str(e) or "Unexpected error", reason="UNKNOWN",
+                                                        extra={"length": 0})
+            self.store.finish(row["id"], status, result)
+            METRICS.inc("pagescraper_jobs_total", status=status, reason=result.get("reason") or "OK")
+            METRICS.observe("pagescraper_job_seconds", time.time() - started, status=status)
+            if row["webhook"]:
+                delivered = post_webhook(row["webhook"], {
+                    "job_id": row["id"], "batch_id": row["batch_id"], "status": status, "result": result,
+                })
+                self.store.set_webhook_status(row["id"], delivered)
+            logger.info(json.dumps({
+                "event": "job", "job_id": row["id"], "batch_id": row["batch_id"], "status": status,
+                "target_url": result.get("url"), "reason": result.get("reason"),
+                "elapsed_s": round(time.time() - started, 3),
+                "queued_s": round(started - row["created"], 3),
+            }))
+
+    def _sweeper(self):
+        while True:
+            try:
+                self.store.sweep()
+            except Exception:
+                pass
+            time.sleep(60)
+
+
+JOB_STORE = JobStore(JOBS_DB_PATH)
+JOB_QUEUE = JobQueue(JOB_STORE, JOB_WORKERS)
+
+
+def job_priority(value) -> int:
+    """Parse a job priority: an int or an integer string, None/"" meaning 0. Raises ValueError."""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(value)
+    return int(value)
+
+
+def _valid_job_body(body) -> str | None:
+    if not isinstance(body, dict):
+        return "Job must be a JSON object"
+    url = body.get("url")
+    if not url or not isinstance(url, str) or not url.startswith(("http://", "https://")):
+        return "Invalid or missing URL"
+    webhook = body.get("webhook")
+    if webhook and not (isinstance(webhook, str) and webhook.startswith(("http://", "https://"))):
+        return "Invalid webhook URL"
+    try:
+        job_priority(body.get("priority"))
+    except ValueError:
+        return "priority must be an integer"
+    return None
+
+
+@app.route("/jobs", methods=["POST"])
+def create_jobs():
+    """Enqueue one job ({"url": …}) or a batch ({"jobs": [{…}, …]} or {"urls": [...]})."""
+    data = request_body()
+    shared = {k: v for k, v in data.items() if k not in ("jobs", "urls")}
+    if isinstance(data.get("jobs"), list):
+        bodies = [dict(shared, **j) if isinstance(j, dict) else j for j in data["jobs"]]
+    elif isinstance(data.get("urls"), list):
+        bodies = [dict(shared, url=u) for u in data["urls"]]
+    else:
+        bodies = [data]
+
+    if not bodies or len(bodies) > JOB_MAX_BATCH:
+        return soft_fail(None, f"A batch must hold 1..{JOB_MAX_BATCH} jobs", reason="INPUT")
+    errors = [{"index": i, "message": err} for i, b in enumerate(bodies) if (err := _valid_job_body(b))]
+    if errors:
+        return soft_fail(None, "Invalid job(s)", reason="INPUT", extra={"errors": errors})
+    webhook = data.get("webhook")
+    if webhook and not (isinstance(webhook, str) and webhook.startswith(("http://", "https://"))):
+        return soft_fail(None, "Invalid webhook URL", reason="INPUT")
+    allowed, reason, retry_after = RATE_LIMITER.check_batch([b["url"] for b in bodies])
+    if not allowed:
+        return rate_limited_response(reason, retry_after)
+
+    # Bodies inherit the top-level priority through `shared`, so validating each body covers both
+    priorities = [job_priority(b.get("priority")) for b in bodies]
+    batch_id = uuid.uuid4().hex if len(bodies) > 1 else None
+    job_ids = JOB_STORE.enqueue(bodies, priorities, webhook=webhook, batch_id=batch_id)
+    JOB_QUEUE.ensure_started()
+    JOB_QUEUE.notify()
+    return soft_ok({"job_ids": job_ids, "batch_id": batch_id, "status": "queued"})
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    JOB_QUEUE.ensure_started()
+    row = JOB_STORE.get(job_id)
+    if row is not None:
+        return soft_ok({"job": job_to_dict(row)})
+    rows = JOB_STORE.batch(job_id)
+    if rows:
+        jobs = [job_to_dict(r, include_result=request.args.get("results") in ("1", "true")) for r in rows]
+        counts = {}
+        for j in jobs:
+            counts[j["status"]] = counts.get(j["status"], 0) + 1
+        return soft_ok({"batch_id": job_id, "counts": counts, "jobs": jobs})
+    return soft_fail(None, "Unknown or expired job id", reason="NOT_FOUND", extra={"job_id": job_id})
+
+# ────────────────────────────────────────────────────────────────────────────────
+# /crawl: bounded site crawl streamed as NDJSON
+# ────────────────────────────────────────────────────────────────────────────────
+CRAWL_MAX_PAGES = int(os.environ.get("CRAWL_MAX_PAGES", "1000") or "1000")
+CRAWL_MAX_DEPTH = int(os.environ.get("CRAWL_MAX_DEPTH", "10") or "10")
+CRAWL_MAX_CONCURRENCY = int(os.environ.get("CRAWL_MAX_CONCURRENCY", "16") or "16")
+CRAWL_DELAY_MS = int(os.environ.get("CRAWL_DELAY_MS", "500") or "500")
+CRAWL_MAX_SECONDS = float(os.environ.get("CRAWL_MAX_SECONDS", "600") or "600")
+CRAWL_SITEMAP_MAX_URLS = 50000
+CRAWL_SKIP_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".bmp", ".avif",
+    ".pdf", ".zip", ".gz", ".tar", ".rar", ".7z", ".dmg", ".exe",
+    ".mp3", ".mp4", ".mov", ".avi", ".webm", ".wav",
+    ".css", ".js", ".json", ".xml", ".rss", ".woff", ".woff2", ".ttf",
+)
+# Crawl pages run here; their fetches go through _BACKGROUND_EXECUTOR, not _EXECUTOR
+_CRAWL_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("CRAWL_POOL_SIZE", "") or (500 if ASYNC_MODE else 16)))
+
+METRICS.describe("pagescraper_crawl_pages_total", "counter", "Pages fetched by /crawl, by outcome.")
+
+
+class BloomFilter:
+    """Fixed-memory set membership for very large frontiers.
+
+    A false positive only means a URL is treated as already seen (skipped), never
+    fetched twice.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> bool:
+        """Add item; True if it was not (probably) present before."""
+        new = False
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                new = True
+        return new
+
+
+class CrawlFrontier:
+    """Breadth-first frontier deduplicated on normalize_url() (a set, or a BloomFilter)."""
+
+    def __init__(self, bloom_capacity: int | None = None):
+        self.queue = deque()
+        self.seen = set() if not bloom_capacity else None
+        self.bloom = BloomFilter(bloom_capacity) if bloom_capacity else None
+        self.discovered = 0
+
+    def add(self, url: str, depth: int) -> bool:
+        key = normalize_url(url)
+        if self.bloom is not None:
+            if not self.bloom.add(key):
+                return False
+        elif key in self.seen:
+            return False
+        else:
+            self.seen.add(key)
+        self.discovered += 1
+        self.queue.append((url, depth))
+        return True
+
+    def pop(self) -> tuple[str, int]:
+        return self.queue.popleft()
+
+    def __len__(self):
+        return len(self.queue)
+
+
+def _bounded_int(raw, default: int, low: int, high: int) -> int:
+    try:
+        val = int(raw) if raw not in (None, "") else default
+    except (TypeError, ValueError):
+        val = default
+    return max(low, min(high, val))
+
+
+def _bounded_seconds(raw, default: float, high: float) -> float:
+    """A positive, finite number of seconds capped at high; None/"" mean default. Raises ValueError."""
+    if raw in (None, ""):
+        return default
+    try:
+        val = float(raw) if not isinstance(raw, bool) else math.nan
+    except (TypeError, ValueError):
+        val = math.nan
+    if not math.isfinite(val) or val <= 0:
+        raise ValueError("max_seconds must be a positive number")
+    return min(val, high)
+
+
+def parse_crawl_options(data: dict) -> dict:
+    """Normalize the /crawl body. Raises ValueError for unusable input."""
+    seed = data.get("url")
+    sitemap = data.get("sitemap")
+    if not sitemap and seed and parse_read_options(data)["is_sitemap"]:
+        sitemap, seed = seed, None
+    for value in (seed, sitemap):
+        if value is not None and not (isinstance(value, str) and value.startswith(("http://", "https://"))):
+            raise ValueError("Invalid or missing URL")
+    if not seed and not sitemap:
+        raise ValueError("Invalid or missing URL")
+    patterns = {}
+    for name in ("include", "exclude"):
+        if data.get(name):
+            try:
+                patterns[name] = re.compile(str(data[name]))
+            except re.error as e:
+                raise ValueError(f"Invalid {name} pattern: {e}")
+    max_pages = _bounded_int(data.get("max_pages"), 50, 1, CRAWL_MAX_PAGES)
+    page_opts = parse_read_options(data)
+    page_opts["is_sitemap"] = False
+    page_opts["collect_links"] = True
+    return {
+        "seed": seed,
+        "sitemap": sitemap,
+        "max_pages": max_pages,
+        "max_depth": _bounded_int(data.get("max_depth"), 2, 0, CRAWL_MAX_DEPTH),
+        "concurrency": _bounded_int(data.get("concurrency"), 4, 1, CRAWL_MAX_CONCURRENCY),
+        "delay": _bounded_int(data.get("delay_ms"), CRAWL_DELAY_MS, 0, 60000) / 1000.0,
+        "max_seconds": _bounded_seconds(data.get("max_seconds"), CRAWL_MAX_SECONDS, CRAWL_MAX_SECONDS),
+        "same_domain": data.get("same_domain", True) not in (False, "false", "0", 0),
+        "respect_robots": data.get("respect_robots", True) not in (False, "false", "0", 0),
+        "bloom": bool(data.get("bloom")),
+        "include": patterns.get("include"),
+        "exclude": patterns.get("exclude"),
+        "page_opts": page_opts,
+    }
+
+
+def crawl_in_scope(url: str, copts: dict, domains: set) -> bool:
+    if not url.startswith(("http://", "https://")):
+        return False
+    if urlparse(url).path.lower().endswith(CRAWL_SKIP_EXTENSIONS):
+        return False
+    if copts["same_domain"] and domain_key(url) not in domains:
+        return False
+    if copts["include"] and not copts["include"].search(url):
+        return False
+    if copts["exclude"] and copts["exclude"].search(url):
+        return False
+    return True
+
+
+def expand_sitemap(sitemap_url: str, page_opts: dict, limit: int) -> list[str]:
+    """Page URLs listed by a sitemap, following one level of sitemap index files."""
+    opts = dict(page_opts, is_sitemap=True, collect_links=False)
+    pending, urls = [sitemap_url], []
+    with background_fetches():
+        for level in range(2):
+            nested = []
+            for sm in pending:
+                payload = run_read_pipeline(sm, opts, time.time())
+                for u in payload.get("urls") or []:
+                    path = urlparse(u).path.lower()
+                    if path.endswith(".xml") and level == 0:
+                        nested.append(u)
+                    else:
+                        urls.append(u)
+                    if len(urls) >= limit:
+                        return urls
+            pending = nested
+    return urls
+
+
+def _crawl_page(url: str, not_before: float, page_opts: dict) -> dict:
+    wait = not_before - time.time()
+    if wait > 0:
+        time.sleep(wait)  # per-domain politeness slot reserved by the scheduler
+    with background_fetches():
+        return run_read_pipeline(url, page_opts, time.time())
+
+
+def crawl_events(copts: dict):
+    """Yield /crawl NDJSON events: start, page/skipped per URL, then summary."""
+    start_ts = time.time()
+    page_opts = copts["page_opts"]
+    seeds = [copts["seed"]] if copts["seed"] else []
+    if copts["sitemap"]:
+        seeds.extend(expand_sitemap(copts["sitemap"], page_opts, CRAWL_SITEMAP_MAX_URLS))
+    # ~200 outlinks per fetched page is generous; undersizing only drops URLs as false "seen"
+    bloom_capacity = max(copts["max_pages"] * 200, len(seeds) * 2) if copts["bloom"] else None
+    frontier = CrawlFrontier(bloom_capacity=bloom_capacity)
+    domains = {domain_key(u) for u in (copts["seed"], copts["sitemap"]) if u}
+    for u in seeds:
+        if u == copts["seed"] or crawl_in_scope(u, copts, domains):
+            frontier.add(u, 0)
+    yield {"type": "start", "seed": copts["seed"], "sitemap": copts["sitemap"], "seeds": len(frontier),
+           "max_pages": copts["max_pages"], "max_depth": copts["max_depth"], "concurrency": copts["concurrency"]}
+
+    in_flight = {}
+    next_slot = {}
+    counts = {"pages": 0, "pages_ok": 0, "pages_failed": 0, "skipped": 0}
+    stopped = "frontier_empty"
+    rate_limited = None
+    try:
+        while frontier or in_flight:
+            remaining = copts["max_seconds"] - (time.time() - start_ts)
+            if remaining <= 0:
+                stopped = "time_limit"
+                break
+            if rate_limited and not in_flight:
+                stopped = "rate_limited"
+                break
+            while frontier and not rate_limited and len(in_flight) < copts["concurrency"] \
+                    and counts["pages"] + len(in_flight) < copts["max_pages"]:
+                url, depth = frontier.pop()
+                delay = copts["delay"]
+                if copts["respect_robots"]:
+                    parsed = urlparse(url)
+                    robots = FETCH_MANAGER.get_robots(f"{parsed.scheme}://{parsed.netloc}")
+                    if not robots["parser"].can_fetch(ROBOTS_USER_AGENT, url):
+                        counts["skipped"] += 1
+                        yield {"type": "skipped", "url": url, "depth": depth, "reason": "ROBOTS"}
+                        continue
+                    delay = max(delay, robots["delay"] or 0)
+                # Each page is charged to the caller like a /read call as it is scheduled
+                allowed, reason, _ = RATE_LIMITER.check_batch([url], ip=copts["caller_ip"], new_request=False)
+                if not allowed:
+                    rate_limited = reason
+                    break
+                key = domain_key(url)
+                slot = max(time.time(), next_slot.get(key, 0.0))
+                next_slot[key] = slot + delay
+                in_flight[_CRAWL_EXECUTOR.submit(_crawl_page, url, slot, page_opts)] = (url, depth)
+            if not in_flight:
+                if counts["pages"] >= copts["max_pages"]:
+                    stopped = "max_pages"
+                    break
+                continue
+            done, _ = concurrent.futures.wait(in_flight, timeout=remaining,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                url, depth = in_flight.pop(fut)
+                try:
+                    payload = fut.result()
+                except Exception as e:
+                    payload = fail_payload(url, str(e) or "Unexpected error", reason="UNKNOWN", extra={"length": 0})
+                counts["pages"] += 1
+                ok = bool(payload.get("ok"))
+                counts["pages_ok" if ok else "pages_failed"] += 1
+                METRICS.inc("pagescraper_crawl_pages_total", ok=ok, reason=payload.get("reason") or "OK")
+                links = payload.get("links") or []
+                follow = ok and depth < copts["max_depth"] and "nofollow" not in (payload.get("robots") or "").lower()
+                new_links = 0
+                if follow:
+                    for link in links:
+                        if crawl_in_scope(link, copts, domains) and frontier.add(link, depth + 1):
+                            new_links += 1
+                out = clamp_read_payload(payload, url, page_opts["max_chars"])
+                out.pop("links", None)
+                out["ok"] = ok
+                yield dict(out, type="page", depth=depth, links_found=len(links), links_queued=new_links)
+            if counts["pages"] >= copts["max_pages"] and not in_flight:
+                stopped = "max_pages" if frontier else "frontier_empty"
+                break
+    finally:
+        for fut in in_flight:
+            fut.cancel()
+
+    summary = dict(counts, type="summary", stopped=stopped, discovered=frontier.discovered,
+                   frontier_left=len(frontier), elapsed_s=round(time.time() - start_ts, 3))
+    if rate_limited:
+        summary["rate_limited"] = rate_limited
+    logger.info(json.dumps(dict(summary, event="crawl", seed=copts["seed"], sitemap=copts["sitemap"])))
+    yield summary
+
+
+@app.route("/crawl", methods=["POST"])
+def crawl():
+    data = request_body()
+    try:
+        copts = parse_crawl_options(data)
+    except ValueError as e:
+        return soft_fail(data.get("url") or data.get("sitemap"), str(e), reason="INPUT", extra={"length": 0})
+    g.req_url = copts["seed"] or copts["sitemap"]
+    # The request itself (and the sitemap fetch) is charged now; pages as they are scheduled
+    allowed, reason, retry_after = RATE_LIMITER.check_batch([copts["sitemap"]] if copts["sitemap"] else [])
+    if not allowed:
+        return rate_limited_response(reason, retry_after)
+    copts["caller_ip"] = RATE_LIMITER.caller_ip()
+    note_outcome(True)
+
+    def _stream():
+        for event in crawl_events(copts):
+            yield json_dumps_bytes(event) + b"\n"
+
+    return Response(_stream(), mimetype="application/x-ndjson")
+
+# ────────────────────────────────────────────────────────────────────────────────
+# /changed: conditional GET + raw body hash + SimHash change detection
+# ────────────────────────────────────────────────────────────────────────────────
+FINGERPRINT_DB_PATH = os.environ.get("FINGERPRINT_DB_PATH", "fingerprints.sqlite3")
+SIMHASH_NEAR_DUPLICATE_BITS = int(os.environ.get("SIMHASH_NEAR_DUPLICATE_BITS", "3") or "3")
+SIMHASH_SHINGLE = 3
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+METRICS.describe("pagescraper_changed_total", "counter", "/changed results by status and how it was decided.")
+
+
+def hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def _to_sql_int(v: int | None) -> int | None:
+    """Unsigned 64-bit -> SQLite's signed INTEGER."""
+    return v - (1 << 64) if v is not None and v >= (1 << 63) else v
+
+
+def _from_sql_int(v: int | None) -> int | None:
+    return v + (1 << 64) if v is not None and v < 0 else v
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word 3-shingles; a small Hamming distance means near-identical text."""
+    words = WORD_RE.findall((text or "").lower())
+    if len(words) < SIMHASH_SHINGLE:
+        words = words or [""]
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SIMHASH_SHINGLE]) for i in range(len(words) - SIMHASH_SHINGLE + 1)]
+    weights = defaultdict(int)
+    for sh in shingles:
+        weights[hash64(sh.encode("utf-8"))] += 1
+    total = sum(weights.values())
+    items = list(weights.items())
+    out = 0
+    for bit in range(64):
+        mask = 1 << bit
+        if 2 * sum(w for h, w in items if h & mask) > total:
+            out |= mask
+    return out
+
+
+def hamming64(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class FingerprintStore:
+    """Per-URL fingerprints in SQLite, one ~60-byte row per URL keyed by a 64-bit URL hash.
+
+    The URL itself is not stored, which keeps millions of rows in a few hundred MB.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            url_hash INTEGER PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash INTEGER,
+            simhash INTEGER,
+            checked REAL,
+            changed REAL
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(self.SCHEMA)
+                    self._ready = True
+        return conn
+
+    @staticmethod
+    def key(url: str) -> int:
+        return _to_sql_int(hash64(normalize_url(url).encode("utf-8")))
+
+    def get(self, url: str) -> dict | None:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM fingerprints WHERE url_hash = ?", (self.key(url),)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        out = dict(row)
+        out["body_hash"] = _from_sql_int(out["body_hash"])
+        out["simhash"] = _from_sql_int(out["simhash"])
+        return out
+
+    def put(self, url: str, fp: dict):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (url_hash, etag, last_modified, body_hash, simhash, checked, changed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(url), fp.get("etag"), fp.get("last_modified"), _to_sql_int(fp.get("body_hash")),
+                 _to_sql_int(fp.get("simhash")), fp.get("checked"), fp.get("changed")))
+        finally:
+            conn.close()
+
+
+FINGERPRINTS = FingerprintStore(FINGERPRINT_DB_PATH)
+
+
+def conditional_headers(fp: dict | None) -> dict:
+    headers = {}
+    if fp and fp.get("etag"):
+        headers["If-None-Match"] = fp["etag"]
+    if fp and fp.get("last_modified"):
+        headers["If-Modified-Since"] = fp["last_modified"]
+    return headers
+
+
+def run_change_check(url: str, opts: dict, start_ts: float, near_bits: int) -> dict:
+    """Decide changed / unchanged / near_duplicate / new for url, extracting only when the bytes changed."""
+    prev = FINGERPRINTS.get(url)
+    timeouts = adaptive_timeouts(url, opts, opts["hard_limit"] - (time.time() - start_ts))
+    used_reader = False
+
+    def _do_fetch():
+        return FETCH_MANAGER.fetch(url, timeout=timeouts["fetch_timeout"], max_retries=timeouts["fetch_retries"],
+                                   extra_headers=conditional_headers(prev))
+
+    def _do_reader():
+        return FETCH_MANAGER.fetch_reader(url, timeout=timeouts["reader_timeout"],
+                                          max_retries=timeouts["reader_retries"])
+
+    try:
+        with stage_timer("fetch"):
+            resp = fetch_with_hard_timeout(_do_fetch, max(0.1, opts["hard_limit"] - (time.time() - start_ts)))
+        if resp is None or resp.status_code in (401, 403, 429, 451, 503):
+            remaining = opts["hard_limit"] - (time.time() - start_ts)
+            reader_resp = fetch_with_hard_timeout(_do_reader, remaining) if remaining > 1 else None
+            if reader_resp is not None and reader_resp.status_code == 200:
+                resp, used_reader = reader_resp, True
+    except TimeoutError:
+        return fail_payload(url, "Timeout fetching page", reason="TIMEOUT", extra={"length": 0})
+    except Exception as e:
+        return fail_payload(url, str(e) or "Network error - unable to fetch page", reason="NETWORK", extra={"length": 0})
+
+    if resp is None:
+        return fail_payload(url, "Network error - unable to fetch page", reason="NETWORK", extra={"length": 0})
+    if resp.status_code in (401, 403, 429, 451, 503):
+        return fail_payload(url, "Crawlers are blocked", reason="BLOCKED", http_status=resp.status_code,
+                            extra={"length": 0, "block_type": "access_denied"})
+    if resp.status_code not in (200, 304):
+        return fail_payload(url, f"Failed to load page (HTTP {resp.status_code})", reason="NETWORK",
+                            http_status=resp.status_code, extra={"length": 0})
+
+    # Same gates as /read: only HTML is fingerprinted, and a challenge or interstitial
+    # served with 200 goes to the reader; if that fails the check fails, and the stored
+    # fingerprint is left alone. Bytes matching the stored hash were not a block page.
+    html = None
+    if resp.status_code == 200 and not used_reader:
+        ctype = (resp.headers.get("Content-Type") or "").lower()
+        if "text/html" not in ctype and "application/xhtml+xml" not in ctype:
+            return fail_payload(url, "Unsupported MIME type", reason="UNSUPPORTED_MIME",
+                                http_status=resp.status_code, extra={"length": 0, "content_type": ctype})
+        if not (prev and prev.get("body_hash") == hash64(resp.content or b"")):
+            html = response_text(resp)
+            if detect_soft_block(html):
+                remaining = opts["hard_limit"] - (time.time() - start_ts)
+                reader_resp = None
+                if remaining > 2:
+                    try:
+                        reader_resp = fetch_with_hard_timeout(_do_reader, remaining - 1)
+                    except Exception:
+                        reader_resp = None
+                if reader_resp is None or reader_resp.status_code != 200:
+                    return fail_payload(url, "Crawlers are blocked", reason="BLOCKED", http_status=resp.status_code,
+                                        extra={"length": 0, "block_type": "soft_block"})
+                resp, used_reader, html = reader_resp, True, None
+
+    now = time.time()
+    fp = dict(prev or {}, checked=now)
+    result = {"url": url, "used_reader": used_reader, "extracted": False,
+              "previous_check": prev["checked"] if prev else None}
+    if not used_reader:
+        fp["etag"] = resp.headers.get("ETag") or fp.get("etag")
+        fp["last_modified"] = resp.headers.get("Last-Modified") or fp.get("last_modified")
+
+    if resp.status_code == 304 and prev:
+        status, via, distance = "unchanged", "not_modified", 0
+    else:
+        body_hash = hash64(resp.content or b"")
+        if prev and prev.get("body_hash") == body_hash:
+            status, via, distance = "unchanged", "body_hash", 0
+        else:
+            html = html if html is not None else response_text(resp)
+            if used_reader:
+                _, _, text = parse_reader_text(html)
+                title = None
+            else:
+                doc = run_cpu_bound(extract_html_document, html, url, {})
+                text = "\n".join(filter(None, [doc["main_text"], doc["flat_md"]]))
+                title = doc["meta"].get("title")
+            result["extracted"] = True
+            result["title"] = title
+            result["length"] = len(text or "")
+            fp["body_hash"] = body_hash
+            new_simhash = simhash(text)
+            if prev is None or prev.get("simhash") is None:
+                status, via, distance = "new", "simhash", None
+            else:
+                distance = hamming64(new_simhash, prev["simhash"])
+                via = "simhash"
+                if distance == 0:
+                    status = "unchanged"
+                elif distance <= near_bits:
+                    status = "near_duplicate"
+                else:
+                    status = "changed"
+            fp["simhash"] = new_simhash
+
+    if status in ("changed", "new"):
+        fp["changed"] = now
+    FINGERPRINTS.put(url, fp)
+    METRICS.inc("pagescraper_changed_total", status=status, via=via)
+    result.update({
+        "status": status,
+        "changed": status in ("changed", "new"),
+        "via": via,
+        "distance": distance,
+        "similarity": round(1 - distance / 64, 4) if distance is not None else None,
+        "last_changed": fp.get("changed"),
+        "ok": True,
+    })
+    return result
+
+
+@app.route("/changed", methods=["POST"])
+def changed():
+    data = request_body()
+    url = data.get("url")
+    g.req_url = url
+    start_ts = time.time()
+    if not url or not isinstance(url, str) or not url.startswith(("http://", "https://")):
+        return soft_fail(url, "Invalid or missing URL", reason="INPUT", extra={"length": 0})
+    opts = parse_read_options(data)
+    try:
+        near_bits = int(data.get("near_duplicate_bits", SIMHASH_NEAR_DUPLICATE_BITS))
+    except (TypeError, ValueError):
+        near_bits = SIMHASH_NEAR_DUPLICATE_BITS
+    payload = run_change_check(url, opts, start_ts, max(0, min(64, near_bits)))
+    if not payload.get("ok"):
+        note_outcome(False, payload.get("reason"), 0)
+        return jsonify(payload), 200
+    del payload["ok"]  # soft_ok() re-adds it last
+    return soft_ok(payload)
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Startup: preload before fork, per-worker warm-up, readiness (see gunicorn_preload.py)
+# ────────────────────────────────────────────────────────────────────────────────
+WARM_DOMAINS = [d.strip() for d in os.environ.get("WARM_DOMAINS", "").split(",") if d.strip()]
+WARM_TIMEOUT_SECONDS = float(os.environ.get("WARM_TIMEOUT_SECONDS", "10") or "10")
+
+_WARM_SAMPLE_HTML = """<!doctype html><html lang="en"><head><meta charset="utf-8">
+<title>Warm-up sample</title><meta name="description" content="Startup warm-up document.">
+<meta property="og:title" content="Warm-up sample"><link rel="canonical" href="https://example.com/warm">
+<script type="application/ld+json">{"@type": "Article", "headline": "Warm-up sample"}</script></head>
+<body><nav><a href="/">Home</a> <a href="/about">About</a></nav><main><article>
+<h1>Warm-up sample</h1><p>This paragraph exists so the extractors build their internal state before the
+first real request arrives. It is long enough for trafilatura to treat it as main content.</p>
+<h2>Details</h2><p>A second section with a <a href="https://example.com/other">link</a> and some more text
+to walk through the outline, sections and markdown code paths once.</p>
+<ul><li>First item</li><li>Second item</li></ul>
+<table><tr><th>Name</th><th>Value</th></tr><tr><td>alpha</td><td>1</td></tr><tr><td>beta</td><td>2</td></tr></table>
+</article></main><footer>Footer text</footer></body></html>"""
+
+READINESS = {
+    "pid": os.getpid(),
+    "started": time.time(),
+    "preloaded": False,     # warm_extractors() ran in the gunicorn master, before fork
+    "extractors": "cold",   # cold | warm
+    "extractors_s": None,
+    "domains": {},          # domain -> {"ok", "seconds", "addresses", "robots"}
+    "domains_pending": 0,
+}
+_READINESS_LOCK = threading.Lock()
+
+
+def warm_extractors():
+    """Run one throwaway extraction so lazily built parser/extractor state exists up front.
+
+    Called in the gunicorn master under preload, so every forked worker starts
+    with trafilatura, lxml, BeautifulSoup, charset_normalizer and ftfy already
+    initialised and shares those pages copy-on-write.
+    """
+    if READINESS["extractors"] == "warm":
+        return
+    t0 = time.perf_counter()
+    try:
+        text = robust_decode(_WARM_SAMPLE_HTML.encode("utf-8"))
+        extract_html_document(text, "https://example.com/warm", {}, want_clean_html=True, want_links=True)
+        parse_reader_text("Title: Warm-up\nMarkdown Content:\n# Warm-up\n\nSample paragraph.")
+    except Exception as e:
+        logger.info(json.dumps({"event": "warm_extractors_failed", "error": str(e)[:200]}))
+        return
+    READINESS["extractors"] = "warm"
+    READINESS["extractors_s"] = round(time.perf_counter() - t0, 3)
+
+
+def warm_domain(domain: str) -> dict:
+    """Resolve DNS, create the session and fetch robots.txt for one hot domain in this worker."""
+    origin = domain if "://" in domain else f"https://{domain}"
+    parsed = urlparse(origin)
+    t0 = time.perf_counter()
+    out = {"ok": False, "seconds": None, "addresses": 0, "robots": False}
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        out["addresses"] = len(DNS_CACHE.resolve(parsed.hostname, port)[0])
+        FETCH_MANAGER.get_session(domain_key(origin))
+        FETCH_MANAGER.domain_origins.setdefault(domain_key(origin), f"{parsed.scheme}://{parsed.netloc}")
+        entry = FETCH_MANAGER.get_robots(f"{parsed.scheme}://{parsed.netloc}")
+        out["robots"] = entry["parser"].mtime() > 0  # parse() stamps it; 404/errors leave it at 0
+        out["ok"] = True
+    except Exception as e:
+        out["error"] = str(e)[:200]
+    out["seconds"] = round(time.perf_counter() - t0, 3)
+    return out
+
+
+def _warm_domains_worker(domains: list[str]):
+    for domain in domains:
+        result = warm_domain(domain)
+        with _READINESS_LOCK:
+            READINESS["domains"][domain] = result
+            READINESS["domains_pending"] -= 1
+    logger.info(json.dumps({"event": "warm_domains_done", "pid": os.getpid(), "domains": len(domains),
+                            "ok": sum(1 for d in domains if READINESS["domains"].get(d, {}).get("ok"))}))
+
+
+def start_domain_warmup(domains: list[str] | None = None):
+    """Warm hot domains on a background thread; /ready reports not-ready until it is done."""
+    domains = WARM_DOMAINS if domains is None else domains
+    if not domains:
+        return
+    FETCH_MANAGER.get_reader_session()
+    with _READINESS_LOCK:
+        READINESS["domains_pending"] += len(domains)
+    threading.Thread(target=_warm_domains_worker, args=(domains,), daemon=True, name="warm-domains").start()
+
+
+def preload_before_fork():
+    """gunicorn master hook: initialise shared read-only state once, before workers fork."""
+    warm_extractors()
+    METRICS.reset()  # warm-up timings are not traffic
+    READINESS["preloaded"] = READINESS["extractors"] == "warm"
+
+
+def after_fork():
+    """gunicorn post_fork hook: rebuild per-process state the fork did not carry over."""
+    restart_log_listener()
+    READINESS["pid"] = os.getpid()
+    READINESS["started"] = time.time()
+    start_domain_warmup()
+    JOB_QUEUE.ensure_started()
+
+
+
+@app.route("/ready")
+def ready():
+    # Without the preload hooks the first probe pays the warm-up, not the first /read
+    warm_extractors()
+    with _READINESS_LOCK:
+        domains = {k: dict(v) for k, v in READINESS["domains"].items()}
+        pending = READINESS["domains_pending"]
+    age = time.time() - READINESS["started"]
+    is_ready = READINESS["extractors"] == "warm" and (pending <= 0 or age > WARM_TIMEOUT_SECONDS)
+    body = {
+        "ready": is_ready,
+        "pid": READINESS["pid"],
+        "uptime_s": round(age, 3),
+        "preloaded": READINESS["preloaded"],
+        "extractors": READINESS["extractors"],
+        "extractors_s": READINESS["extractors_s"],
+        "domains": domains,
+        "domains_pending": pending,
+    }
+    return jsonify(body), (200 if is_ready else 503)
+
 
 if __name__ == "__main__":
     port_str = os.environ.get("PORT", "5000").strip()
     port = int(port_str) if port_str else 5000
+    JOB_QUEUE.ensure_started()  # serving: drain persisted jobs without waiting for a /jobs call
     app.run(host="0.0.0.0", port=port)
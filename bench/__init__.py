@@ -0,0 +1 @@
+"""Offline benchmark suite: fixture corpus, stub origin, micro and end-to-end benchmarks."""
@@ -0,0 +1,36 @@
+"""Small statistics helpers shared by the benchmark and load-test tools."""
+import math
+import os
+import sys
+
+
+def percentile(values, pct: float) -> float | None:
+    """Nearest-rank percentile (pct in 0..100); None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize_ms(durations_s) -> dict:
+    """Seconds in, millisecond summary out."""
+    ms = [d * 1000.0 for d in durations_s]
+    if not ms:
+        return {"n": 0}
+    return {
+        "n": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def import_app():
+    """Import the Flask app module from the repository root, wherever the tool is run from."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    import app
+    return app
@@ -0,0 +1,298 @@
+"""Versioned HTML fixture corpus for the benchmark suite.
+
+Fixtures are generated deterministically (fixed seeds) so every run and every
+machine benchmarks byte-identical input. Bump CORPUS_VERSION whenever a
+generator changes — reports from different corpus versions are not compared.
+
+Captured real-world pages can be dropped into bench/corpus/<name>.html; they
+are picked up alongside the generated fixtures under the name "file:<name>".
+"""
+import json
+import os
+import random
+
+CORPUS_VERSION = 2
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+WORDS = (
+    "performance latency throughput origin server request response page content "
+    "reader extraction outline section table header paragraph markdown worker thread "
+    "cache budget timeout network domain crawler sitemap schema article product price "
+    "review customer shipping documentation install configure example function return"
+).split()
+
+
+def _sentence(rng: random.Random, n_min=8, n_max=22) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(n_min, n_max))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, sentences=4) -> str:
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def _chrome(rng: random.Random) -> tuple[str, str]:
+    nav = "<nav class='site-nav'><ul>" + "".join(
+        f"<li><a href='/section/{i}'>{rng.choice(WORDS).title()}</a></li>" for i in range(12)
+    ) + "</ul></nav>"
+    footer = (
+        "<footer class='footer'><p>Privacy policy · Terms of service · Cookie settings</p>"
+        "<div class='newsletter'><p>Subscribe to our newsletter</p><form><input name='email'></form></div>"
+        "</footer>"
+    )
+    return nav, footer
+
+
+def _head(title: str, description: str, ld_json: dict | None = None, extra: str = "") -> str:
+    ld = ""
+    if ld_json is not None:
+        ld = f"<script type='application/ld+json'>{json.dumps(ld_json)}</script>"
+    return (
+        "<head><meta charset='utf-8'>"
+        f"<title>{title}</title>"
+        f"<meta name='description' content='{description}'>"
+        "<link rel='canonical' href='/canonical'>"
+        f"<meta property='og:title' content='{title}'>"
+        "<style>body{font-family:sans-serif}.x{color:red}</style>"
+        "<script>window.dataLayer=[];function track(){return 1}</script>"
+        f"{ld}{extra}</head>"
+    )
+
+
+def blog_post(seed=1) -> str:
+    rng = random.Random(seed)
+    nav, footer = _chrome(rng)
+    body = [f"<h1>Blog post about {rng.choice(WORDS)}</h1>"]
+    for s in range(12):
+        body.append(f"<h2>Section {s}: {_sentence(rng, 3, 6)}</h2>")
+        for _ in range(3):
+            body.append(
+                f"<p>{_paragraph(rng)} <a href='https://example.com/{s}'>link</a> "
+                f"<strong>{rng.choice(WORDS)}</strong> <em>{rng.choice(WORDS)}</em></p>"
+            )
+        if s % 3 == 0:
+            body.append(f"<blockquote><p>{_sentence(rng)}</p></blockquote>")
+        if s % 4 == 1:
+            body.append(f"<img src='https://cdn.example.com/{s}.png' alt='figure {s}'>")
+    aside = "<aside class='sidebar'>" + "".join(f"<p>{_sentence(rng)}</p>" for _ in range(8)) + "</aside>"
+    comments = "<section class='comments'>" + "".join(
+        f"<div class='comment'><p>{_sentence(rng)}</p></div>" for _ in range(30)
+    ) + "</section>"
+    ld = {"@context": "https://schema.org", "@type": "BlogPosting", "headline": "Blog post",
+          "author": {"@type": "Person", "name": "Author"}}
+    return (
+        "<!DOCTYPE html><html lang='en'>" + _head("Blog post", "A long blog post", ld)
+        + f"<body><header class='header'>{nav}</header><main><article>{''.join(body)}</article></main>"
+        + f"{aside}{comments}{footer}</body></html>"
+    )
+
+
+def docs_page(seed=2) -> str:
+    rng = random.Random(seed)
+    nav, footer = _chrome(rng)
+    body = ["<h1>API reference</h1>"]
+    for s in range(25):
+        body.append(f"<h2 id='s{s}'>{rng.choice(WORDS)}()</h2><p>{_paragraph(rng, 2)}</p>")
+        body.append(f"<pre><code>def {rng.choice(WORDS)}(x):\n    return x * {s}\n</code></pre>")
+        body.append("<h3>Parameters</h3><ul>" + "".join(
+            f"<li><code>{rng.choice(WORDS)}</code> — {_sentence(rng, 4, 10)}"
+            f"<ul><li>{_sentence(rng, 3, 6)}</li></ul></li>" for _ in range(4)
+        ) + "</ul>")
+        body.append("<ol>" + "".join(f"<li>{_sentence(rng, 4, 8)}</li>" for _ in range(3)) + "</ol>")
+        if s % 5 == 0:
+            body.append("<table><tr><th>Name</th><th>Type</th><th>Default</th></tr>" + "".join(
+                f"<tr><td>{rng.choice(WORDS)}</td><td>str</td><td>{i}</td></tr>" for i in range(6)
+            ) + "</table>")
+    toc = "<div class='toc sidebar'>" + "".join(f"<a href='#s{i}'>s{i}</a>" for i in range(25)) + "</div>"
+    return (
+        "<!DOCTYPE html><html lang='en'>" + _head("API reference", "Docs")
+        + f"<body>{nav}{toc}<div class='content'>{''.join(body)}</div>{footer}</body></html>"
+    )
+
+
+def ecommerce_product(seed=3) -> str:
+    rng = random.Random(seed)
+    nav, footer = _chrome(rng)
+    reviews = [{"@type": "Review", "reviewBody": _paragraph(rng, 2),
+                "reviewRating": {"@type": "Rating", "ratingValue": rng.randint(1, 5)}} for _ in range(60)]
+    ld = {"@context": "https://schema.org", "@type": "Product", "name": "Widget",
+          "offers": {"@type": "Offer", "price": "19.99", "priceCurrency": "USD"}, "review": reviews}
+    scripts = "".join(f"<script>var x{i} = {json.dumps(_paragraph(rng, 3))};</script>" for i in range(40))
+    grid = "<div class='related'>" + "".join(
+        f"<div class='card'><a href='/p/{i}'><img src='https://cdn.example.com/p{i}.jpg' alt='p{i}'>"
+        f"<span>{rng.choice(WORDS)}</span><span class='price'>${rng.randint(5, 200)}.99</span></a></div>"
+        for i in range(80)
+    ) + "</div>"
+    specs = "<table class='specs'><caption>Specifications</caption>" + "".join(
+        f"<tr><th>{rng.choice(WORDS)}</th><td>{_sentence(rng, 2, 5)}</td></tr>" for _ in range(30)
+    ) + "</table>"
+    review_html = "".join(
+        f"<div class='review'><h3>{_sentence(rng, 2, 5)}</h3><p>{r['reviewBody']}</p></div>" for r in reviews
+    )
+    body = (
+        f"<h1>Widget</h1><p class='price'>$19.99</p><p>{_paragraph(rng, 6)}</p>{specs}"
+        f"<h2>Reviews</h2>{review_html}"
+    )
+    return (
+        "<!DOCTYPE html><html lang='en'>" + _head("Widget", "Buy the widget", ld, scripts)
+        + f"<body>{nav}<div id='product'>{body}</div>{grid}"
+        + "<div class='cookie-consent modal'><p>We use cookies</p></div>"
+        + f"{footer}</body></html>"
+    )
+
+
+def huge_table(seed=4, rows=5000, cols=8) -> str:
+    rng = random.Random(seed)
+    head = "<tr>" + "".join(f"<th>Column {c}</th>" for c in range(cols)) + "</tr>"
+    body_rows = "".join(
+        "<tr>" + "".join(
+            f"<td>{rng.randint(0, 99999)}</td>" if c else f"<td><a href='/item/{r}'>item {r}</a></td>"
+            for c in range(cols)
+        ) + "</tr>"
+        for r in range(rows)
+    )
+    return (
+        "<!DOCTYPE html><html lang='en'>" + _head("Pricing", "Huge pricing table")
+        + f"<body><main><h1>Pricing</h1><p>{_paragraph(rng, 2)}</p>"
+        + f"<table><caption>Price list</caption><thead>{head}</thead><tbody>{body_rows}</tbody></table>"
+        + "</main></body></html>"
+    )
+
+
+def wide_table(seed=9, rows=2000, cols=80) -> str:
+    """Spreadsheet export: more columns than TABLE_MAX_COLS, formatted cells, attributes everywhere."""
+    rng = random.Random(seed)
+    head = "<tr>" + "".join(f"<th class='col' data-col='{c}'>Metric {c}</th>" for c in range(cols)) + "</tr>"
+
+    def cell(r, c):
+        if c == 0:
+            return f"<td class='key'><a href='/row/{r}' title='row {r}'><strong>row {r}</strong></a></td>"
+        if c % 7 == 0:
+            return f"<td style='color:red'><em>{rng.choice(WORDS)}</em> &amp; {rng.choice(WORDS)}</td>"
+        return f"<td class='num'>{rng.randint(0, 9999)}.{rng.randint(0, 99):02d}</td>"
+
+    body_rows = "".join("<tr>" + "".join(cell(r, c) for c in range(cols)) + "</tr>" for r in range(rows))
+    return (
+        "<!DOCTYPE html><html lang='en'>" + _head("Metrics export", "Wide metrics table")
+        + f"<body><main><h1>Metrics export</h1><p>{_paragraph(rng, 2)}</p>"
+        + f"<table class='grid'><caption>Daily metrics</caption><thead>{head}</thead><tbody>{body_rows}</tbody></table>"
+        + "</main></body></html>"
+    )
+
+
+def many_tables(seed=10, tables=60, rows=40) -> str:
+    """Reference page with more tables than TABLE_MAX_TABLES, some without a <th> header row."""
+    rng = random.Random(seed)
+    parts = []
+    for t in range(tables):
+        head = "" if t % 3 == 0 else "<tr><th>Name</th><th>Value</th><th>Notes</th></tr>"
+        body_rows = "".join(
+            f"<tr><td>{rng.choice(WORDS)} {r}</td><td>{rng.randint(0, 999)}</td><td>{_sentence(rng, 3, 8)}</td></tr>"
+            for r in range(rows)
+        )
+        parts.append(f"<h2>Table {t}</h2><table><caption>Reference {t}</caption>{head}{body_rows}</table>")
+    return (
+        "<!DOCTYPE html><html lang='en'>" + _head("Reference tables", "Many small tables")
+        + f"<body><main><h1>Reference tables</h1><p>{_paragraph(rng, 2)}</p>{''.join(parts)}</main></body></html>"
+    )
+
+
+def deep_nesting(seed=5, depth=400) -> str:
+    rng = random.Random(seed)
+    divs = "".join(f"<div class='wrap{i}'>" for i in range(depth))
+    close_divs = "</div>" * depth
+    spans = "".join("<span>" for _ in range(depth // 2)) + _sentence(rng) + "</span>" * (depth // 2)
+    lists = ""
+    for i in range(depth // 4):
+        lists += f"<ul><li>{_sentence(rng, 3, 6)}"
+    lists += "</li></ul>" * (depth // 4)
+    quotes = "<blockquote>" * 50 + f"<p>{_sentence(rng)}</p>" + "</blockquote>" * 50
+    return (
+        "<!DOCTYPE html><html lang='en'>" + _head("Deep", "Pathological nesting")
+        + f"<body>{divs}<h1>Deep</h1><p>{spans}</p>{lists}{quotes}{close_divs}</body></html>"
+    )
+
+
+def many_blocks(seed=6, blocks=10000) -> str:
+    rng = random.Random(seed)
+    out = ["<h1>Many blocks</h1>"]
+    for i in range(blocks):
+        if i % 20 == 0:
+            out.append(f"<h2>Part {i // 20}</h2>")
+        out.append(f"<p>{_sentence(rng)}</p>")
+    return (
+        "<!DOCTYPE html><html lang='en'>" + _head("Many blocks", "10k blocks")
+        + f"<body><article>{''.join(out)}</article></body></html>"
+    )
+
+
+def mojibake(seed=7) -> str:
+    """UTF-8 text that was decoded as cp1252 and re-encoded (classic mojibake)."""
+    rng = random.Random(seed)
+    paras = "".join(
+        f"<p>{_sentence(rng)} Café — “quoted” naïve résumé €{i}</p>" for i in range(40)
+    )
+    clean = (
+        "<!DOCTYPE html><html lang='fr'>" + _head("Café résumé", "Mojibake")
+        + f"<body><main><h1>Café résumé</h1>{paras}</main></body></html>"
+    )
+    return clean.encode("utf-8").decode("cp1252", errors="replace")
+
+
+def block_page(seed=8) -> str:
+    return (
+        "<!DOCTYPE html><html><head><title>Just a moment...</title></head>"
+        "<body><div id='cf-browser-verification' class='challenge-running'>"
+        "<p>Checking your browser before accessing the site.</p>"
+        "<p>Please enable JavaScript and cookies to continue.</p></div></body></html>"
+    )
+
+
+def sitemap_xml(seed=9, n=5000) -> str:
+    locs = "".join(f"<url><loc>https://example.com/page/{i}</loc></url>" for i in range(n))
+    return f"<?xml version='1.0' encoding='UTF-8'?><urlset>{locs}</urlset>"
+
+
+GENERATORS = {
+    "blog_post": blog_post,
+    "docs_page": docs_page,
+    "ecommerce_product": ecommerce_product,
+    "huge_table": huge_table,
+    "wide_table": wide_table,
+    "many_tables": many_tables,
+    "deep_nesting": deep_nesting,
+    "many_blocks": many_blocks,
+    "mojibake": mojibake,
+    "block_page": block_page,
+}
+
+# Fixtures the stub origin serves but which are not HTML extraction inputs
+EXTRA_DOCUMENTS = {
+    "sitemap.xml": (sitemap_xml, "application/xml"),
+}
+
+_CACHE = {}
+
+
+def load_corpus(names=None) -> dict[str, str]:
+    """name -> HTML. Generated fixtures plus any bench/corpus/*.html files."""
+    if not _CACHE:
+        for name, gen in GENERATORS.items():
+            _CACHE[name] = gen()
+        if os.path.isdir(CORPUS_DIR):
+            for fn in sorted(os.listdir(CORPUS_DIR)):
+                if fn.endswith(".html"):
+                    with open(os.path.join(CORPUS_DIR, fn), encoding="utf-8", errors="replace") as f:
+                        _CACHE[f"file:{fn[:-5]}"] = f.read()
+    if not names:
+        return dict(_CACHE)
+    return {n: _CACHE[n] for n in names if n in _CACHE}
+
+
+def reader_text(name: str, html: str) -> str:
+    """What the r.jina.ai reader would return for a fixture: a small header + Markdown-ish text."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    title = soup.title.string if soup.title and soup.title.string else name
+    text = soup.get_text("\n", strip=True)
+    return f"Title: {title}\nURL Source: https://example.com/{name}\n\nMarkdown Content:\n{text}\n"
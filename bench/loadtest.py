@@ -0,0 +1,397 @@
+"""Load-test harness that replays the production traffic mix against the stub origin.
+
+    python -m bench.loadtest --log prod.log --rpm 300 --duration 120 --concurrency 32
+    python -m bench.loadtest --log prod.log --gunicorn-workers 2 --gunicorn-threads 2
+    python -m bench.loadtest --sample read_bodies.jsonl --target http://127.0.0.1:5000
+
+Traffic model
+  --log     structured request log lines written by _log_request (one JSON object per
+            line; non-JSON lines are skipped). Only POST /read entries are used. They give
+            the domain mix, caller IPs, page sizes (content_length), latencies (elapsed_s)
+            and outcome mix (TIMEOUT, rate limits).
+  --sample  JSONL of /read request bodies; options (fast_mode, max_chars, return_html…)
+            are replayed as-is, with the URL rewritten to the stub origin.
+  Without either, a uniform mix over the corpus is used.
+
+Each recorded domain is mapped to its own 127.0.x.y loopback alias, so FetchManager
+sessions and AbuseDetector see as many distinct domains as production did. Pages are
+mapped to fixtures of matching size rank. Origin latency is replayed from the recorded
+per-domain elapsed_s, scaled by --latency-scale.
+
+Requests are scheduled open-loop at --rpm (Poisson arrivals with --poisson). Latency is
+measured from the scheduled send time, so client-side queueing counts against the
+server. The report has a timeline (per --interval) of throughput, p50/p99, timeout and
+429 rates and worker RSS, plus a summary. It is written to --report.
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from bench.common import import_app, percentile, summarize_ms
+from bench.corpus import load_corpus
+from bench.run import AppServer
+from bench.stub_origin import StubOrigin
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Traffic model
+# ────────────────────────────────────────────────────────────────────────────────
+def load_log_entries(path: str) -> list[dict]:
+    entries = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line.startswith("{"):
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("path") == "/read" and entry.get("method", "POST") == "POST" and entry.get("target_url"):
+                entries.append(entry)
+    return entries
+
+
+def load_request_sample(path: str) -> list[dict]:
+    bodies = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                body = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(body, dict) and body.get("url"):
+                bodies.append(body)
+    return bodies
+
+
+def loopback_alias(index: int) -> str:
+    return f"127.0.{index // 250}.{index % 250 + 2}"
+
+
+class TrafficModel:
+    """Draws synthetic /read requests whose domain, size, latency and caller mix follow the recording."""
+
+    def __init__(self, entries: list[dict], bodies: list[dict], fixtures_by_size: list[str],
+                 latency_scale=0.7, seed=0):
+        self.rng = random.Random(seed)
+        self.fixtures_by_size = fixtures_by_size
+        self.latency_scale = latency_scale
+        self.bodies = bodies
+
+        if not entries:
+            # No recording: uniform over the corpus and a handful of domains/clients
+            entries = [{"target_url": f"https://site{i % 7}.example/{f}", "caller_ip": f"10.0.0.{i % 25}",
+                        "elapsed_s": 0.3, "content_length": 0, "reason": None}
+                       for i, f in enumerate(fixtures_by_size * 10)]
+        self.entries = entries
+
+        domains = sorted({(urlparse(e["target_url"]).hostname or "") for e in entries})
+        self.domain_alias = {d: loopback_alias(i) for i, d in enumerate(domains)}
+        sizes = sorted(int(e.get("content_length") or 0) for e in entries)
+        self._size_ranks = sizes
+        self.latency_by_domain = {}
+        for e in entries:
+            d = urlparse(e["target_url"]).hostname or ""
+            self.latency_by_domain.setdefault(d, []).append(float(e.get("elapsed_s") or 0))
+
+    def _fixture_for_size(self, content_length: int) -> str:
+        if not self._size_ranks:
+            return self.rng.choice(self.fixtures_by_size)
+        below = sum(1 for s in self._size_ranks if s < content_length)
+        q = below / len(self._size_ranks)
+        idx = min(int(q * len(self.fixtures_by_size)), len(self.fixtures_by_size) - 1)
+        return self.fixtures_by_size[idx]
+
+    def summary(self) -> dict:
+        return {
+            "recorded_requests": len(self.entries),
+            "domains": len(self.domain_alias),
+            "callers": len({e.get("caller_ip") for e in self.entries}),
+            "request_bodies": len(self.bodies),
+        }
+
+    def draw(self, origin: StubOrigin, seq: int, hard_limit_s: float) -> dict:
+        entry = self.rng.choice(self.entries)
+        domain = urlparse(entry["target_url"]).hostname or ""
+        fixture = self._fixture_for_size(int(entry.get("content_length") or 0))
+        reason = entry.get("reason")
+        params = {"n": seq}
+        if entry.get("rate_limited"):
+            pass  # replayed through the real AbuseDetector via the recorded caller IP
+        elif reason == "TIMEOUT":
+            params["latency_ms"] = int((hard_limit_s + 2) * 1000)
+        elif reason == "BLOCKED":
+            params["status"] = 403
+        else:
+            recorded = self.rng.choice(self.latency_by_domain.get(domain) or [0.0])
+            params["latency_ms"] = int(recorded * self.latency_scale * 1000)
+        body = dict(self.rng.choice(self.bodies)) if self.bodies else {}
+        body["url"] = origin.url(fixture, host=self.domain_alias.get(domain), **params)
+        return {
+            "body": body,
+            "caller_ip": entry.get("caller_ip") or "10.0.0.1",
+            "domain": domain,
+            "fixture": fixture,
+        }
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Process memory (Linux /proc; no psutil dependency)
+# ────────────────────────────────────────────────────────────────────────────────
+def rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return None
+
+
+def child_pids(pid: int) -> list[int]:
+    children = []
+    try:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                if int(fields[1]) == pid:
+                    children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    except OSError:
+        pass
+    return children
+
+
+def worker_rss(pids_fn) -> dict:
+    return {str(pid): round(v, 1) for pid in pids_fn() if (v := rss_mb(pid)) is not None}
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Target: in-process werkzeug server, external URL, or a gunicorn we spawn
+# ────────────────────────────────────────────────────────────────────────────────
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_gunicorn(workers: int, threads: int, origin: StubOrigin, extra_env=None, config=None, wait=True):
+    """Start gunicorn on a free port; `config` is a -c file (e.g. gunicorn_preload.py).
+
+    With wait=False it returns right after spawning, for startup-time measurements.
+    """
+    port = free_port()
+    env = dict(os.environ)
+    env["READER_BASE_URL"] = origin.reader_base_url
+    env.update(extra_env or {})
+    cmd = [sys.executable, "-m", "gunicorn"] + (["-c", config] if config else []) + [
+        "app:app", "--bind", f"127.0.0.1:{port}", "--timeout", "30",
+        "--workers", str(workers), "--threads", str(threads)]
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    if not wait:
+        return proc, url
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(url + "/", timeout=1)
+            return proc, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("gunicorn did not come up within 30s")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Driver
+# ────────────────────────────────────────────────────────────────────────────────
+def run_load(target_url: str, model: TrafficModel, origin: StubOrigin, rpm: float, duration_s: float,
+             concurrency: int, interval_s: float, pids_fn, hard_limit_s: float, poisson=False,
+             request_timeout=60.0) -> dict:
+    rng = random.Random(1)
+    results = []
+    results_lock = threading.Lock()
+    memory = []
+    stop = threading.Event()
+    local = threading.local()
+    started = time.perf_counter()
+
+    def sample_memory():
+        while not stop.is_set():
+            memory.append({"t": round(time.perf_counter() - started, 1), "rss_mb": worker_rss(pids_fn)})
+            stop.wait(interval_s)
+
+    def send(req, scheduled):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        status, ok, reason = None, False, None
+        try:
+            r = local.session.post(f"{target_url}/read", json=req["body"], timeout=request_timeout,
+                                   headers={"X-Forwarded-For": req["caller_ip"]})
+            status = r.status_code
+            try:
+                data = r.json()
+            except ValueError:
+                data = {}
+            ok, reason = bool(data.get("ok")), data.get("reason")
+        except requests.RequestException as e:
+            reason = f"CLIENT:{type(e).__name__}"
+        done = time.perf_counter()
+        with results_lock:
+            results.append({"t": done - started, "latency": done - scheduled, "status": status,
+                            "ok": ok, "reason": reason, "domain": req["domain"], "fixture": req["fixture"]})
+
+    mem_thread = threading.Thread(target=sample_memory, daemon=True)
+    mem_thread.start()
+    interval = 60.0 / rpm
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+    seq = 0
+    next_at = started
+    while next_at - started < duration_s:
+        now = time.perf_counter()
+        if next_at > now:
+            time.sleep(next_at - now)
+        pool.submit(send, model.draw(origin, seq, hard_limit_s), next_at)
+        seq += 1
+        next_at += rng.expovariate(1.0 / interval) if poisson else interval
+    pool.shutdown(wait=True)
+    stop.set()
+    mem_thread.join()
+
+    return build_report(results, memory, seq, time.perf_counter() - started, interval_s)
+
+
+def _rates(sample: list[dict]) -> dict:
+    n = max(1, len(sample))
+    return {
+        "timeout_rate": round(sum(1 for r in sample if r["reason"] == "TIMEOUT") / n, 4),
+        "rate_limited_rate": round(sum(1 for r in sample if r["status"] == 429) / n, 4),
+        "ok_rate": round(sum(1 for r in sample if r["ok"]) / n, 4),
+    }
+
+
+def build_report(results: list[dict], memory: list[dict], sent: int, wall: float, interval_s: float) -> dict:
+    timeline = []
+    if results:
+        buckets = int(max(r["t"] for r in results) // interval_s) + 1
+        for b in range(buckets):
+            sample = [r for r in results if b * interval_s <= r["t"] < (b + 1) * interval_s]
+            row = {"t": round(b * interval_s, 1), "completed": len(sample),
+                   "throughput_rps": round(len(sample) / interval_s, 2)}
+            row.update({k: v for k, v in summarize_ms([r["latency"] for r in sample]).items()
+                        if k in ("p50_ms", "p99_ms")})
+            row.update(_rates(sample))
+            timeline.append(row)
+
+    reasons = {}
+    for r in results:
+        key = "OK" if r["ok"] else (r["reason"] or f"HTTP_{r['status']}")
+        reasons[key] = reasons.get(key, 0) + 1
+    peak = {}
+    for m in memory:
+        for pid, v in m["rss_mb"].items():
+            peak[pid] = max(peak.get(pid, 0), v)
+
+    summary = summarize_ms([r["latency"] for r in results])
+    summary.update(_rates(results))
+    summary.update({
+        "sent": sent,
+        "completed": len(results),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(results) / wall, 2) if wall else None,
+        "p999_ms": round(percentile([r["latency"] * 1000 for r in results], 99.9) or 0, 1),
+        "reasons": reasons,
+        "peak_rss_mb": peak,
+    })
+    return {"summary": summary, "timeline": timeline, "memory": memory}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--log", default="", help="structured request log to replay")
+    ap.add_argument("--sample", default="", help="JSONL of /read request bodies")
+    ap.add_argument("--rpm", type=float, default=120.0, help="offered load, requests per minute")
+    ap.add_argument("--duration", type=float, default=60.0, help="seconds of load")
+    ap.add_argument("--concurrency", type=int, default=16, help="max client requests in flight")
+    ap.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of a fixed rate")
+    ap.add_argument("--interval", type=float, default=5.0, help="timeline bucket / memory sample seconds")
+    ap.add_argument("--latency-scale", type=float, default=0.7,
+                    help="fraction of recorded elapsed_s replayed as origin latency")
+    ap.add_argument("--hard-limit", type=float, default=8.0, help="server hard limit, for simulated timeouts")
+    ap.add_argument("--target", default="", help="base URL of an already running app")
+    ap.add_argument("--gunicorn-workers", type=int, default=0, help="spawn gunicorn with this many workers")
+    ap.add_argument("--gunicorn-threads", type=int, default=2)
+    ap.add_argument("--report", default="loadtest_report.json")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    corpus = load_corpus()
+    fixtures_by_size = [name for name, _ in sorted(corpus.items(), key=lambda kv: len(kv[1]))
+                        if name != "block_page"]
+    model = TrafficModel(load_log_entries(args.log) if args.log else [],
+                         load_request_sample(args.sample) if args.sample else [],
+                         fixtures_by_size, latency_scale=args.latency_scale, seed=args.seed)
+    print(f"traffic model: {model.summary()}", file=sys.stderr)
+
+    origin = StubOrigin(bind_host="").start()
+    proc = server = None
+    try:
+        if args.target:
+            target, pids_fn = args.target.rstrip("/"), (lambda: [])
+        elif args.gunicorn_workers:
+            proc, target = spawn_gunicorn(args.gunicorn_workers, args.gunicorn_threads, origin)
+            pids_fn = lambda: child_pids(proc.pid)
+        else:
+            app = import_app()
+            logging.getLogger("werkzeug").setLevel(logging.ERROR)
+            app.logger.setLevel(logging.WARNING)
+            app.READER_BASE_URL = origin.reader_base_url
+            server = AppServer(app).start()
+            target, pids_fn = server.url, (lambda: [os.getpid()])
+
+        report = run_load(target, model, origin, args.rpm, args.duration, args.concurrency, args.interval,
+                          pids_fn, args.hard_limit, poisson=args.poisson)
+        report["config"] = {k: v for k, v in vars(args).items()}
+        report["traffic_model"] = model.summary()
+    finally:
+        if server:
+            server.stop()
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=10)
+        origin.stop()
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    s = report["summary"]
+    print(f"{s['completed']}/{s['sent']} done, {s['throughput_rps']} req/s, p50={s.get('p50_ms')}ms "
+          f"p99={s.get('p99_ms')}ms timeout={s['timeout_rate']} 429={s['rate_limited_rate']} "
+          f"peak_rss={s['peak_rss_mb']}", file=sys.stderr)
+    print(f"report written to {args.report}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
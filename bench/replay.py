@@ -0,0 +1,129 @@
+"""Re-extract archived traffic offline from WARC files written with WARC_MODE=record.
+
+    WARC_MODE=record WARC_DIR=warcs gunicorn app:app        # capture a day of traffic
+    python -m bench.replay --warc-dir warcs --workers 8 --out new.jsonl
+    python -m bench.replay --warc-dir warcs --out new.jsonl --baseline old.jsonl
+
+Every archived page URL (reader records are replayed as the reader fallback, not as
+pages) is run through run_read_pipeline with WARC_MODE=replay, so nothing touches the
+network and every version of the extractor sees byte-identical input. Work is spread
+over --workers processes.
+
+Each output line has the URL, ok/reason, extraction time and a digest of the
+extracted output (flat_outline, tables, meta). With --baseline, the report counts URLs
+whose output changed, ok->fail regressions and fixed failures, and compares p50/p99
+extraction time. Exit status is 1 when any URL regressed from ok to failed.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from bench.common import import_app, summarize_ms
+
+_APP = None
+_READ_BODY = {}
+
+
+def _init_worker(warc_dir: str, read_body: dict):
+    global _APP, _READ_BODY
+    os.environ["WARC_MODE"] = "replay"
+    os.environ["WARC_DIR"] = warc_dir
+    os.environ.setdefault("JOB_WORKERS", "0")
+    os.environ.setdefault("ADAPTIVE_TIMEOUTS", "0")  # replay latency says nothing about the origin
+    _APP = import_app()
+    _APP.logger.setLevel("WARNING")
+    _READ_BODY = read_body
+
+
+def output_digest(payload: dict) -> str:
+    """Stable digest of what a caller would see, ignoring timing-dependent fields."""
+    keep = {k: payload.get(k) for k in ("title", "meta_description", "canonical", "lang", "h1",
+                                        "flat_outline", "tables", "schema_markup", "reason")}
+    return hashlib.sha1(json.dumps(keep, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def replay_one(url: str) -> dict:
+    opts = _APP.parse_read_options(dict(_READ_BODY, url=url))
+    t0 = time.perf_counter()
+    payload = _APP.run_read_pipeline(url, opts, time.time())
+    elapsed = time.perf_counter() - t0
+    return {
+        "url": url,
+        "ok": bool(payload.get("ok")),
+        "reason": payload.get("reason"),
+        "length": payload.get("length", 0),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "digest": output_digest(payload),
+    }
+
+
+def archived_page_urls(warc_dir: str) -> list[str]:
+    _init_worker(warc_dir, {})
+    reader_prefix = _APP.normalize_url(_APP.READER_BASE_URL).rstrip("/")
+    return sorted(u for u in _APP.WARC_ARCHIVE.load_index() if not u.startswith(reader_prefix))
+
+
+def compare(rows: list[dict], baseline: list[dict]) -> dict:
+    base = {r["url"]: r for r in baseline}
+    common = [r for r in rows if r["url"] in base]
+    changed = [r["url"] for r in common if r["digest"] != base[r["url"]]["digest"]]
+    regressed = [r["url"] for r in common if base[r["url"]]["ok"] and not r["ok"]]
+    fixed = [r["url"] for r in common if not base[r["url"]]["ok"] and r["ok"]]
+    return {
+        "compared": len(common),
+        "changed": len(changed),
+        "regressed": regressed,
+        "fixed": fixed,
+        "changed_sample": changed[:20],
+        "timing": summarize_ms([r["elapsed_ms"] / 1000 for r in common]),
+        "baseline_timing": summarize_ms([base[r["url"]]["elapsed_ms"] / 1000 for r in common]),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--warc-dir", default=os.environ.get("WARC_DIR", "warcs"))
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--out", default="replay.jsonl")
+    ap.add_argument("--baseline", help="an earlier --out file to compare against")
+    ap.add_argument("--read-body", default="{}", help='JSON /read options applied to every URL, e.g. \'{"fast_mode": false}\'')
+    ap.add_argument("--limit", type=int, default=0)
+    args = ap.parse_args()
+
+    read_body = json.loads(args.read_body)
+    urls = archived_page_urls(args.warc_dir)
+    if args.limit:
+        urls = urls[:args.limit]
+    if not urls:
+        print(f"no archived pages under {args.warc_dir}", file=sys.stderr)
+        sys.exit(2)
+
+    t0 = time.time()
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(args.warc_dir, read_body)) as pool:
+        rows = list(pool.imap(replay_one, urls, chunksize=4))
+    wall = time.time() - t0
+    with open(args.out, "w", encoding="utf-8") as fh:
+        for row in rows:
+            fh.write(json.dumps(row) + "\n")
+
+    report = {
+        "pages": len(rows),
+        "ok": sum(r["ok"] for r in rows),
+        "wall_s": round(wall, 2),
+        "pages_per_s": round(len(rows) / wall, 1) if wall else None,
+        "timing": summarize_ms([r["elapsed_ms"] / 1000 for r in rows]),
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            report["compare"] = compare(rows, [json.loads(line) for line in fh if line.strip()])
+    print(json.dumps(report, indent=2))
+    if report.get("compare", {}).get("regressed"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""Benchmark runner: per-stage micro-benchmarks + end-to-end /read throughput.
+
+    python -m bench.run                         # full run, writes bench_report.json
+    python -m bench.run --quick                 # fewer iterations (CI smoke)
+    python -m bench.run --baseline old.json     # exit 1 if any metric regressed > --threshold
+    python -m bench.run --memory --skip-e2e     # add tracemalloc peak memory per fixture
+    python -m bench.run --startup --skip-micro  # add time-to-first-fast-request, plain vs preload
+
+Micro-benchmarks call the app's pipeline functions directly on each fixture.
+The end-to-end run serves the app on a local port, points it at the stub
+origin (and stub reader), and drives /read concurrently over HTTP.
+"""
+import argparse
+import concurrent.futures
+import gc
+import json
+import logging
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+import requests
+from werkzeug.serving import make_server
+
+from bench.common import import_app, percentile, summarize_ms
+from bench.corpus import CORPUS_VERSION, load_corpus
+from bench.stub_origin import StubOrigin
+
+REPORT_VERSION = 1
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Micro-benchmarks
+# ────────────────────────────────────────────────────────────────────────────────
+def prepare_fixture(app, html: str) -> dict:
+    """Precompute each stage's input so every stage is timed in isolation."""
+    state = {"html": html, "bytes": html.encode("utf-8"), "soup": app.make_soup(html)}
+    body = app.slice_body_html(html)
+    state["body"] = body if body is not None else str(app.clean_dom_full(html))
+    state["focused"] = app.focus_body_html(state["body"])
+    try:
+        sections, flat_md = app.extract_outline_from_focused_body(state["focused"])
+    except RecursionError:
+        sections, flat_md = [], ""
+    try:
+        tables = app.extract_tables_from_focused_body(state["focused"])
+    except RecursionError:
+        tables = []
+    state["payload"] = {
+        "ok": True,
+        "flat_outline": flat_md,
+        "tables": tables,
+        "schema_markup": [b["raw"] for b in
+                          app.extract_structured_data(state["soup"], "http://bench.local/")["schema_blocks"]],
+        "outline_sections": sections[:200],
+    }
+    state["encoded"] = app.json_dumps_bytes(state["payload"])
+    return state
+
+
+def stage_table(app):
+    """(name, fn(state)) for every stage worth tracking."""
+    return [
+        ("decode", lambda st: app.robust_decode(st["bytes"])),
+        ("slice_body", lambda st: app.slice_body_html(st["html"])),
+        ("schema", lambda st: app.extract_structured_data(st["soup"], "http://bench.local/", want_objects=True)),
+        ("parse_full", lambda st: app.clean_dom_full(st["html"])),
+        ("focus", lambda st: app.focus_body_html(st["body"])),
+        ("extract_main_text", lambda st: app.extract_main_text(st["focused"], full_html=st["html"])),
+        ("outline", lambda st: app.extract_outline_from_focused_body(st["focused"])),
+        ("tables", lambda st: app.extract_tables_from_focused_body(st["focused"])),
+        ("tables_structured", lambda st: app.extract_tables_from_focused_body(st["focused"], structured=True)),
+        ("clean_html", lambda st: app.strip_html_from_focused_body(st["focused"])),
+        # json_encode is the stdlib baseline; json_encode_fast is what the app now serves with
+        ("json_encode", lambda st: json.dumps(st["payload"], sort_keys=True)),
+        ("json_encode_fast", lambda st: app.json_dumps_bytes(st["payload"])),
+        ("compress_gzip", lambda st: app.compress_bytes(st["encoded"], "gzip")),
+        ("compress_br", lambda st: app.compress_bytes(st["encoded"], "br")),
+    ]
+
+
+def wire_bytes(app, state: dict) -> dict:
+    """Response size for the fixture's payload under each content encoding."""
+    sizes = {"identity": len(state["encoded"]), "gzip": len(app.compress_bytes(state["encoded"], "gzip"))}
+    if app.brotli is not None:
+        sizes["br"] = len(app.compress_bytes(state["encoded"], "br"))
+    return sizes
+
+
+def measure(fn, min_time: float, min_iter: int, max_iter: int) -> dict:
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < max_iter:
+        t0 = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - t0)
+        if len(durations) >= min_iter and time.perf_counter() - started >= min_time:
+            break
+    return summarize_ms(durations)
+
+
+def run_micro(app, corpus: dict, stages=None, quick=False) -> dict:
+    min_time, min_iter, max_iter = (0.05, 1, 3) if quick else (0.5, 3, 50)
+    results = {}
+    for name, html in corpus.items():
+        state = prepare_fixture(app, html)
+        row = {"bytes": len(state["bytes"]), "wire_bytes": wire_bytes(app, state)}
+        for stage, fn in stage_table(app):
+            if stages and stage not in stages:
+                continue
+            try:
+                row[stage] = measure(lambda: fn(state), min_time, min_iter, max_iter)
+            except RecursionError:
+                row[stage] = {"error": "RecursionError"}
+            except Exception as e:
+                row[stage] = {"error": f"{type(e).__name__}: {e}"[:200]}
+        results[name] = row
+        print(f"  micro {name:<22} " + " ".join(
+            f"{k}={v['p50_ms']:.1f}" for k, v in row.items() if isinstance(v, dict) and "p50_ms" in v
+        ), file=sys.stderr)
+    return results
+
+
+def run_memory(app, corpus: dict) -> dict:
+    """Peak traced memory of one full document pass (decode, schema, extraction) per fixture.
+
+    tracemalloc sees Python allocations (the BeautifulSoup trees and the strings
+    copied between stages) but not libxml2's own buffers, so treat the numbers as a
+    lower bound on a request's peak and compare them run to run.
+    """
+    results = {}
+    for name, html in corpus.items():
+        raw = html.encode("utf-8")
+        row = {"bytes": len(raw)}
+        gc.collect()
+        tracemalloc.start()
+        try:
+            text = app.robust_decode(raw)
+            trace = {}
+            app.extract_html_document(text, "http://bench.local/", trace, want_clean_html=True)
+            del text
+            peak = tracemalloc.get_traced_memory()[1]
+            row.update({"peak_kb": round(peak / 1024, 1), "peak_x_input": round(peak / len(raw), 1),
+                        "degraded": trace.get("degraded", [])})
+        except RecursionError:
+            row["error"] = "RecursionError"
+        finally:
+            tracemalloc.stop()
+        results[name] = row
+        print(f"  memory {name:<21} " + (f"peak={row['peak_kb']:.0f}KB ({row['peak_x_input']}x input)"
+                                         if "peak_kb" in row else row.get("error", "")), file=sys.stderr)
+    return results
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# End-to-end
+# ────────────────────────────────────────────────────────────────────────────────
+class AppServer:
+    """The Flask app on an ephemeral local port (threaded werkzeug server)."""
+
+    def __init__(self, app):
+        self.server = make_server("127.0.0.1", 0, app.app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def configure_app_for_origin(app, origin: StubOrigin):
+    """Reader → stub reader; lift the global RPM valve so the benchmark is not rate limited."""
+    app.READER_BASE_URL = origin.reader_base_url
+    app.RATE_LIMITER.global_rpm_hard = 10 ** 9
+    app.RATE_LIMITER.extreme_rpm = 10 ** 9
+
+
+def post_read(session: requests.Session, server_url: str, body: dict, client_ip: str, timeout=60) -> dict:
+    t0 = time.perf_counter()
+    try:
+        r = session.post(f"{server_url}/read", json=body, timeout=timeout,
+                         headers={"X-Forwarded-For": client_ip})
+        elapsed = time.perf_counter() - t0
+        data = r.json() if r.headers.get("Content-Type", "").startswith("application/json") else {}
+        return {"elapsed": elapsed, "status": r.status_code, "ok": data.get("ok"),
+                "reason": data.get("reason"), "bytes": len(r.content)}
+    except Exception as e:
+        return {"elapsed": time.perf_counter() - t0, "status": None, "ok": False,
+                "reason": f"CLIENT:{type(e).__name__}", "bytes": 0}
+
+
+def run_e2e(app, origin: StubOrigin, fixtures, n_requests=200, concurrency=8, fast_mode=True,
+            latency_ms=0) -> dict:
+    server = AppServer(app).start()
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        fixture = fixtures[i % len(fixtures)]
+        params = {"n": i}
+        if latency_ms:
+            params["latency_ms"] = latency_ms
+        body = {"url": origin.url(fixture, **params), "fast_mode": fast_mode, "max_chars": 5000}
+        # One synthetic client per request keeps AbuseDetector's per-IP signals out of the numbers
+        res = post_read(local.session, server.url, body, client_ip=f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}")
+        res["fixture"] = fixture
+        return res
+
+    try:
+        started = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(n_requests)))
+        wall = time.perf_counter() - started
+    finally:
+        server.stop()
+
+    by_fixture = {}
+    for f in fixtures:
+        sample = [r["elapsed"] for r in results if r["fixture"] == f]
+        by_fixture[f] = summarize_ms(sample)
+    reasons = {}
+    for r in results:
+        key = "OK" if r["ok"] else (r["reason"] or f"HTTP_{r['status']}")
+        reasons[key] = reasons.get(key, 0) + 1
+    summary = summarize_ms([r["elapsed"] for r in results])
+    summary.update({
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "fast_mode": fast_mode,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(n_requests / wall, 2) if wall else None,
+        "ok_rate": round(sum(1 for r in results if r["ok"]) / max(1, n_requests), 4),
+        "response_bytes_p50": percentile([r["bytes"] for r in results], 50),
+        "reasons": reasons,
+        "by_fixture": by_fixture,
+    })
+    return summary
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Worker startup: time-to-first-fast-request for a freshly spawned gunicorn
+# ────────────────────────────────────────────────────────────────────────────────
+STARTUP_MODES = {"plain": None, "preload": "gunicorn_preload.py"}
+
+
+def run_startup(origin: StubOrigin, fixture="blog_post", workers=2, threads=2, cold_requests=12,
+                warm_requests=20, fast_factor=1.5) -> dict:
+    """Spawn gunicorn per startup mode and send /read back to back from the moment of spawn.
+
+    A request is "fast" when it is within fast_factor of the steady-state p50
+    measured afterwards. first_fast_s is when the first fast answer arrived;
+    all_fast_s is when every later cold-phase answer was fast too (all workers warm).
+    """
+    from bench.loadtest import spawn_gunicorn
+
+    out = {}
+    for mode, config in STARTUP_MODES.items():
+        t0 = time.perf_counter()
+        proc, url = spawn_gunicorn(workers, threads, origin, config=config, wait=False,
+                                   extra_env={"WARM_DOMAINS": origin.base_url})
+        session = requests.Session()
+        try:
+            def one(i):
+                body = {"url": origin.url(fixture, n=i, mode=mode), "fast_mode": True, "max_chars": 5000}
+                return post_read(session, url, body, client_ip=f"10.99.{i // 256 % 256}.{i % 256}", timeout=30)
+
+            cold, i, deadline = [], 0, t0 + 60
+            while len(cold) < cold_requests and time.perf_counter() < deadline:
+                res = one(i)
+                i += 1
+                if res["status"] is None:  # not listening yet
+                    time.sleep(0.01)
+                    continue
+                res["at_s"] = time.perf_counter() - t0
+                cold.append(res)
+            warm = [one(i + k)["elapsed"] for k in range(warm_requests)]
+            try:
+                ready = session.get(f"{url}/ready", timeout=5).json()
+            except (requests.RequestException, ValueError):
+                ready = {}
+        finally:
+            session.close()  # gthread workers wait out open keep-alive connections on shutdown
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+        steady = percentile(warm, 50)
+        fast = [bool(r["ok"]) and r["elapsed"] <= steady * fast_factor for r in cold]
+        first_fast = next((r["at_s"] for r, f in zip(cold, fast) if f), None)
+        all_fast = None
+        for idx in range(len(cold)):
+            if all(fast[idx:]):
+                all_fast = cold[idx]["at_s"]
+                break
+        out[mode] = {
+            "first_response_s": round(cold[0]["at_s"], 3) if cold else None,
+            "first_fast_s": round(first_fast, 3) if first_fast is not None else None,
+            "all_fast_s": round(all_fast, 3) if all_fast is not None else None,
+            "cold_latencies_ms": [round(r["elapsed"] * 1000, 1) for r in cold],
+            "steady_p50_ms": round(steady * 1000, 2),
+            "ready": {k: ready.get(k) for k in ("ready", "preloaded", "extractors", "extractors_s", "domains_pending")},
+        }
+    return out
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Report + regression gate
+# ────────────────────────────────────────────────────────────────────────────────
+# (path in report, higher_is_worse)
+E2E_GATES = [("p50_ms", True), ("p99_ms", True), ("throughput_rps", False)]
+
+
+def compare(report: dict, baseline: dict, threshold: float, min_ms: float) -> list[str]:
+    """Human-readable regressions of `report` relative to `baseline`."""
+    if baseline.get("corpus_version") != report.get("corpus_version"):
+        print("baseline corpus_version differs; skipping comparison", file=sys.stderr)
+        return []
+    regressions = []
+    for fixture, stages in report.get("micro", {}).items():
+        base_stages = baseline.get("micro", {}).get(fixture, {})
+        for stage, cur in stages.items():
+            base = base_stages.get(stage)
+            if not isinstance(cur, dict) or not isinstance(base, dict) or stage == "wire_bytes":
+                continue
+            if "p50_ms" not in cur or "p50_ms" not in base or base["p50_ms"] < min_ms:
+                continue
+            ratio = cur["p50_ms"] / base["p50_ms"]
+            if ratio > 1 + threshold:
+                regressions.append(f"micro {fixture}/{stage}: p50 {base['p50_ms']:.2f}ms -> {cur['p50_ms']:.2f}ms (x{ratio:.2f})")
+    for fixture, cur in (report.get("memory") or {}).items():
+        base = (baseline.get("memory") or {}).get(fixture) or {}
+        if cur.get("peak_kb") and base.get("peak_kb"):
+            ratio = cur["peak_kb"] / base["peak_kb"]
+            if ratio > 1 + threshold:
+                regressions.append(f"memory {fixture}: peak {base['peak_kb']:.0f}KB -> {cur['peak_kb']:.0f}KB (x{ratio:.2f})")
+    for mode, cur in (report.get("startup") or {}).items():
+        base = (baseline.get("startup") or {}).get(mode) or {}
+        if cur.get("first_fast_s") and base.get("first_fast_s"):
+            ratio = cur["first_fast_s"] / base["first_fast_s"]
+            if ratio > 1 + threshold:
+                regressions.append(f"startup {mode}: first fast request {base['first_fast_s']}s -> "
+                                   f"{cur['first_fast_s']}s (x{ratio:.2f})")
+    cur_e2e, base_e2e = report.get("e2e") or {}, baseline.get("e2e") or {}
+    for key, higher_is_worse in E2E_GATES:
+        cur, base = cur_e2e.get(key), base_e2e.get(key)
+        if not cur or not base:
+            continue
+        ratio = cur / base if higher_is_worse else base / cur
+        if ratio > 1 + threshold:
+            regressions.append(f"e2e {key}: {base} -> {cur} (x{ratio:.2f} worse)")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true", help="few iterations; for smoke runs")
+    ap.add_argument("--fixtures", default="", help="comma-separated fixture names (default: all)")
+    ap.add_argument("--stages", default="", help="comma-separated micro stages (default: all)")
+    ap.add_argument("--skip-micro", action="store_true")
+    ap.add_argument("--skip-e2e", action="store_true")
+    ap.add_argument("--memory", action="store_true", help="also record tracemalloc peak memory per fixture")
+    ap.add_argument("--startup", action="store_true",
+                    help="also time first fast /read from a fresh gunicorn, plain vs preload")
+    ap.add_argument("--e2e-requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--origin-latency-ms", type=int, default=0)
+    ap.add_argument("--report", default="bench_report.json")
+    ap.add_argument("--baseline", default="", help="previous report to compare against")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio (0.25 = 25%%)")
+    ap.add_argument("--min-ms", type=float, default=1.0, help="ignore micro stages faster than this in the baseline")
+    ap.add_argument("--verbose", action="store_true", help="keep the app's per-request log lines")
+    args = ap.parse_args(argv)
+
+    app = import_app()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    if not args.verbose:
+        app.logger.setLevel(logging.WARNING)
+    corpus = load_corpus([f for f in args.fixtures.split(",") if f] or None)
+    stages = {s for s in args.stages.split(",") if s}
+    report = {
+        "report_version": REPORT_VERSION,
+        "corpus_version": CORPUS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+    }
+
+    if not args.skip_micro:
+        report["micro"] = run_micro(app, corpus, stages, quick=args.quick)
+
+    if args.memory:
+        report["memory"] = run_memory(app, corpus)
+
+    if args.startup:
+        origin = StubOrigin(latency_ms=args.origin_latency_ms).start()
+        try:
+            report["startup"] = run_startup(origin)
+            for mode, res in report["startup"].items():
+                print(f"  startup {mode}: first response {res['first_response_s']}s, first fast "
+                      f"{res['first_fast_s']}s, all fast {res['all_fast_s']}s", file=sys.stderr)
+        finally:
+            origin.stop()
+
+    if not args.skip_e2e:
+        origin = StubOrigin(latency_ms=args.origin_latency_ms).start()
+        try:
+            configure_app_for_origin(app, origin)
+            n = min(args.e2e_requests, 40) if args.quick else args.e2e_requests
+            e2e_fixtures = [f for f in corpus if not f.startswith("file:")]
+            report["e2e"] = run_e2e(app, origin, e2e_fixtures, n_requests=n, concurrency=args.concurrency)
+            print(f"  e2e {report['e2e']['throughput_rps']} req/s p50={report['e2e']['p50_ms']}ms "
+                  f"p99={report['e2e']['p99_ms']}ms ok_rate={report['e2e']['ok_rate']}", file=sys.stderr)
+        finally:
+            origin.stop()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_ms)
+        report["regressions"] = regressions
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"report written to {args.report}", file=sys.stderr)
+
+    if regressions:
+        print("REGRESSIONS:", file=sys.stderr)
+        for line in regressions:
+            print("  " + line, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Local stub origin (and r.jina.ai reader stub) serving the benchmark corpus.
+
+Routes:
+  /p/<fixture>          fixture HTML
+  /sitemap.xml          large XML sitemap
+  /robots.txt           permissive robots with Crawl-delay: 0
+  /reader/<url>         reader stub; answers for the fixture named by <url>'s last path segment
+
+Per-request knobs (query string on the page URL):
+  latency_ms=<int>      sleep before answering (added to the server-wide default)
+  status=<int>          HTTP status to answer with
+  encoding=gzip|br|deflate|identity
+                        force a Content-Encoding (default: negotiate from Accept-Encoding)
+  block=1               serve the Cloudflare-style challenge page instead
+
+Run standalone:  python -m bench.stub_origin --port 8765 --latency-ms 150
+Point the app's reader at it with READER_BASE_URL=http://127.0.0.1:8765/reader/
+"""
+import argparse
+import gzip
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from bench.corpus import EXTRA_DOCUMENTS, block_page, load_corpus, reader_text
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is in requirements.txt
+    brotli = None
+
+
+def _encode(body: bytes, encoding: str) -> tuple[bytes, str | None]:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6), "gzip"
+    if encoding == "deflate":
+        return zlib.compress(body), "deflate"
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=5), "br"  # q11 default would dominate the stub's CPU
+    return body, None
+
+
+def _negotiate(accept_encoding: str) -> str:
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return "identity"
+
+
+class StubOrigin:
+    """Threaded HTTP server over the corpus; start() returns self, base_url is ready to use."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0, latency_sampler=None, bind_host=None):
+        self.host = host
+        self.bind_host = host if bind_host is None else bind_host  # "" to accept on every 127.x alias
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.latency_sampler = latency_sampler  # optional callable(path) -> ms, for replayed distributions
+        self.corpus = load_corpus()
+        self.hits = {}
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def reader_base_url(self) -> str:
+        return f"{self.base_url}/reader/"
+
+    def url(self, fixture: str, host: str | None = None, **params) -> str:
+        """Fixture URL; `host` (e.g. a 127.0.0.x alias) lets one origin stand in for many domains."""
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        base = f"http://{host}:{self.port}" if host else self.base_url
+        return f"{base}/p/{fixture}" + (f"?{query}" if query else "")
+
+    def start(self):
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client dropped the connection (e.g. the app's download byte cap)
+
+            def do_GET(self):
+                origin._handle(self)
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 1024  # load tests open hundreds of connections at once
+
+        self._server = Server((self.bind_host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _record(self, key: str, nbytes: int):
+        with self._lock:
+            self.hits[key] = self.hits.get(key, 0) + 1
+            self.bytes_sent += nbytes
+
+    def _handle(self, h: BaseHTTPRequestHandler):
+        parsed = urlparse(h.path)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        path = unquote(parsed.path)
+
+        delay = self.latency_ms + int(params.get("latency_ms", 0) or 0)
+        if self.jitter_ms:
+            delay += random.randint(0, self.jitter_ms)
+        if self.latency_sampler is not None:
+            delay += self.latency_sampler(path)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+        status = int(params.get("status", 200) or 200)
+        ctype = "text/html; charset=utf-8"
+        if path == "/robots.txt":
+            body, ctype = "User-agent: *\nCrawl-delay: 0\n", "text/plain"
+        elif path.startswith("/reader/"):
+            target = path[len("/reader/"):]
+            name = urlparse(target).path.rstrip("/").rsplit("/", 1)[-1]
+            html = self.corpus.get(name)
+            if html is None:
+                status, body, ctype = 404, "not found", "text/plain"
+            else:
+                body, ctype = reader_text(name, html), "text/plain; charset=utf-8"
+        elif path.lstrip("/") in EXTRA_DOCUMENTS:
+            gen, ctype = EXTRA_DOCUMENTS[path.lstrip("/")]
+            body = gen()
+        elif path.startswith("/p/"):
+            name = path[len("/p/"):]
+            html = self.corpus.get(name)
+            if params.get("block") in ("1", "true"):
+                html = block_page()
+            if html is None:
+                status, body, ctype = 404, "<html><body>not found</body></html>", "text/html"
+            else:
+                body = html
+        else:
+            status, body, ctype = 404, "not found", "text/plain"
+
+        raw = body.encode("utf-8")
+        encoding = params.get("encoding") or _negotiate(h.headers.get("Accept-Encoding", ""))
+        payload, content_encoding = _encode(raw, encoding)
+        try:
+            h.send_response(status)
+            h.send_header("Content-Type", ctype)
+            h.send_header("Content-Length", str(len(payload)))
+            if content_encoding:
+                h.send_header("Content-Encoding", content_encoding)
+            h.end_headers()
+            h.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            return  # client gave up (e.g. the app's fetch timeout fired first)
+        self._record(path, len(payload))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=int, default=0)
+    ap.add_argument("--jitter-ms", type=int, default=0)
+    args = ap.parse_args()
+    origin = StubOrigin(args.host, args.port, args.latency_ms, args.jitter_ms).start()
+    print(f"stub origin on {origin.base_url} (reader: {origin.reader_base_url})")
+    print("fixtures:", ", ".join(sorted(origin.corpus)))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        origin.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""gunicorn config for the async serving mode.
+
+    gunicorn -c gunicorn_async.py app:app
+
+Each worker is a single gevent event loop: origin fetches, reader calls and
+robots lookups park a greenlet instead of holding an OS thread, so one process
+can hold hundreds of slow-origin /read requests. CPU-heavy extraction runs on
+a small native thread pool (ASYNC_CPU_THREADS) so parsing one page does not
+stall every other request's network I/O. The /read JSON contract and
+AbuseDetector behaviour are unchanged — it is the same Flask app.
+"""
+from gevent import monkey
+
+# Patch before anything imports socket/ssl/threading (including the app under --preload)
+monkey.patch_all()
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = "gevent"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_connections = int(os.environ.get("ASYNC_WORKER_CONNECTIONS", "500"))
+timeout = 30
+
+
+def post_worker_init(worker):
+    # The app is loaded in each worker here (no preload): start its job workers
+    import app
+    app.JOB_QUEUE.ensure_started()
@@ -0,0 +1,37 @@
+"""gunicorn config for the preloaded (fast worker startup) serving mode.
+
+    gunicorn -c gunicorn_preload.py app:app
+
+The master imports app.py once (trafilatura, cloudscraper, BeautifulSoup/lxml,
+charset_normalizer, ftfy) and runs one throwaway extraction so their lazily
+built state exists before fork; workers then share those pages copy-on-write
+instead of each paying the import + first-request cost. Each worker restarts
+the log listener thread (threads do not survive fork) and warms sessions, DNS
+and robots.txt for WARM_DOMAINS in the background. GET /ready answers 503
+until that worker is warm.
+
+Nothing opens a socket or submits to a thread pool in the master, so no
+connection or executor state is shared across workers.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "2"))
+timeout = 30
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker is forked
+    import app
+    app.preload_before_fork()
+    # Keep the preloaded objects out of the cyclic GC: collections in workers would
+    # otherwise touch their headers and un-share the copy-on-write pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import app
+    app.after_fork()
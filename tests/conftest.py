@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Keep the module-level stores out of the working directory; tests swap in their own.
+_DB_DIR = tempfile.mkdtemp(prefix="pagescraper-tests-")
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(_DB_DIR, "jobs.sqlite3"))
+os.environ.setdefault("FINGERPRINT_DB_PATH", os.path.join(_DB_DIR, "fingerprints.sqlite3"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+import pytest
+
+import app
+
+
+@pytest.fixture(autouse=True)
+def admission_on(monkeypatch):
+    monkeypatch.setattr(app, "ADMISSION_CONTROL", True)
+
+
+def busy(slots: int = 2, fetch: float | None = 4.0, extract: float = 1.0, max_in_flight: int = 0):
+    ctl = app.AdmissionController(slots, max_in_flight)
+    if fetch is not None:
+        ctl.observe("fetch", fetch)
+        ctl.observe("extract", extract)
+    return ctl
+
+
+def test_admits_without_a_fetch_estimate():
+    ctl = busy(fetch=None)
+    ctl.in_flight = 100
+    assert ctl.try_admit(1.0) == (True, None, 0)
+
+
+def test_admits_while_a_fetch_slot_is_free():
+    ctl = busy()
+    ctl.in_flight = 1
+    admitted, estimate, _ = ctl.try_admit(1.0)
+    assert admitted
+    assert estimate == 5.0
+    assert ctl.in_flight == 2
+
+
+def test_sheds_when_queued_past_the_hard_limit():
+    ctl = busy()
+    ctl.in_flight = 4
+    admitted, estimate, retry_after = ctl.try_admit(10.0)
+    assert not admitted
+    assert estimate == 3 * 4.0 + 1.0
+    assert retry_after == 8
+    assert ctl.in_flight == 4
+    assert ctl.stats == {"admitted": 0, "shed": 1}
+
+
+def test_admits_when_queued_within_the_hard_limit():
+    ctl = busy()
+    ctl.in_flight = 4
+    assert ctl.try_admit(13.0)[0]
+    assert ctl.stats["admitted"] == 1
+
+
+def test_busy_fetch_slots_count_as_load():
+    ctl = busy()
+    ctl.fetch_started()
+    ctl.fetch_started()
+    assert not ctl.try_admit(4.5)[0]
+    ctl.fetch_finished()
+    assert ctl.try_admit(4.5)[0]
+
+
+def test_max_in_flight_caps_admissions():
+    ctl = busy(slots=100, fetch=None, max_in_flight=2)
+    assert ctl.try_admit(1.0)[0]
+    assert ctl.try_admit(1.0)[0]
+    assert ctl.try_admit(1.0) == (False, None, 1)
+    ctl.release()
+    assert ctl.try_admit(1.0)[0]
+
+
+def test_disabled_admits_everything(monkeypatch):
+    monkeypatch.setattr(app, "ADMISSION_CONTROL", False)
+    ctl = busy(max_in_flight=1)
+    ctl.in_flight = 50
+    assert ctl.try_admit(0.1)[0]
+    assert ctl.in_flight == 51
+
+
+def test_release_and_fetch_finished_never_go_negative():
+    ctl = busy()
+    ctl.release()
+    ctl.fetch_finished()
+    assert (ctl.in_flight, ctl.fetch_busy) == (0, 0)
+
+
+def test_estimate_follows_the_fetch_ewma():
+    ctl = busy(fetch=2.0, extract=0.0)
+    ctl.observe("fetch", 12.0)
+    assert ctl.ewma["fetch"] == pytest.approx(2.0 + app.ADMISSION_EWMA_ALPHA * 10.0)
@@ -0,0 +1,125 @@
+import random
+import time
+
+import pytest
+
+import app
+
+URL = "https://example.com/article"
+
+
+def article(words: list[str]) -> bytes:
+    paragraphs = "".join(f"<p>{' '.join(words[i:i + 40])}.</p>" for i in range(0, len(words), 40))
+    return (f"<html><head><title>Article</title></head><body><main><article><h1>Article</h1>"
+            f"{paragraphs}</article></main></body></html>").encode("utf-8")
+
+
+def words(seed: int, n: int = 400) -> list[str]:
+    rng = random.Random(seed)
+    vocab = [f"word{i}" for i in range(2000)]
+    return [rng.choice(vocab) for _ in range(n)]
+
+
+def edit(base: list[str], n: int = 5) -> list[str]:
+    """base with n words in the middle replaced: a small edit to a long page."""
+    mid = len(base) // 2
+    return base[:mid] + [f"edited{i}" for i in range(n)] + base[mid + n:]
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: bytes = b"", headers: dict | None = None):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode("utf-8")
+        self.headers = {"Content-Type": "text/html; charset=utf-8", **(headers or {})}
+
+
+@pytest.fixture
+def origin(tmp_path, monkeypatch):
+    """The next response /changed's fetch sees, and the conditional headers it was sent."""
+    monkeypatch.setattr(app, "FINGERPRINTS", app.FingerprintStore(str(tmp_path / "fingerprints.sqlite3")))
+    state = {"response": None, "sent": None}
+
+    def fetch(url, timeout=None, max_retries=None, extra_headers=None):
+        state["sent"] = dict(extra_headers or {})
+        return state["response"]
+
+    monkeypatch.setattr(app.FETCH_MANAGER, "fetch", fetch)
+    return state
+
+
+def check(origin, response, near_bits=app.SIMHASH_NEAR_DUPLICATE_BITS):
+    origin["response"] = response
+    return app.run_change_check(URL, app.parse_read_options({}), time.time(), near_bits)
+
+
+def test_simhash_distance():
+    base = words(1)
+    text = " ".join(base)
+    assert app.hamming64(app.simhash(text), app.simhash(text)) == 0
+    edited = " ".join(edit(base))
+    near = app.hamming64(app.simhash(text), app.simhash(edited))
+    far = app.hamming64(app.simhash(text), app.simhash(" ".join(words(2))))
+    assert 0 < near < far
+    assert far > 16
+
+
+def test_hamming64():
+    assert app.hamming64(0, 0) == 0
+    assert app.hamming64(0b1011, 0b0001) == 2
+    assert app.hamming64(0, (1 << 64) - 1) == 64
+
+
+def test_first_check_is_new(origin):
+    result = check(origin, FakeResponse(200, article(words(1))))
+    assert result["ok"] and result["status"] == "new" and result["changed"]
+    assert result["extracted"] and result["distance"] is None
+
+
+def test_same_bytes_are_unchanged_without_extraction(origin):
+    body = article(words(1))
+    check(origin, FakeResponse(200, body))
+    result = check(origin, FakeResponse(200, body))
+    assert (result["status"], result["via"], result["distance"]) == ("unchanged", "body_hash", 0)
+    assert not result["extracted"]
+
+
+def test_not_modified_sends_validators(origin):
+    check(origin, FakeResponse(200, article(words(1)), {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}))
+    result = check(origin, FakeResponse(304))
+    assert origin["sent"] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert (result["status"], result["via"]) == ("unchanged", "not_modified")
+
+
+def test_near_duplicate_threshold_is_inclusive(origin):
+    base = words(1)
+    check(origin, FakeResponse(200, article(base)))
+    baseline = app.FINGERPRINTS.get(URL)
+    edited = edit(base)
+
+    result = check(origin, FakeResponse(200, article(edited)), near_bits=64)
+    distance = result["distance"]
+    assert distance > 0
+    assert result["status"] == "near_duplicate" and not result["changed"]
+    assert result["similarity"] == round(1 - distance / 64, 4)
+
+    app.FINGERPRINTS.put(URL, baseline)
+    assert check(origin, FakeResponse(200, article(edited)), near_bits=distance)["status"] == "near_duplicate"
+    app.FINGERPRINTS.put(URL, baseline)
+    result = check(origin, FakeResponse(200, article(edited)), near_bits=distance - 1)
+    assert result["status"] == "changed" and result["changed"]
+
+
+def test_rewritten_page_is_changed(origin):
+    check(origin, FakeResponse(200, article(words(1))))
+    result = check(origin, FakeResponse(200, article(words(2))))
+    assert result["status"] == "changed"
+    assert result["distance"] > app.SIMHASH_NEAR_DUPLICATE_BITS
+
+
+def test_failed_check_keeps_the_fingerprint(origin):
+    check(origin, FakeResponse(200, article(words(1))))
+    baseline = app.FINGERPRINTS.get(URL)
+    result = check(origin, FakeResponse(500, b"oops"))
+    assert not result["ok"] and result["reason"] == "NETWORK"
+    assert app.FINGERPRINTS.get(URL) == baseline
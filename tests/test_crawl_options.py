@@ -0,0 +1,74 @@
+import pytest
+
+import app
+
+SEED = "https://example.com/"
+
+
+def test_defaults():
+    copts = app.parse_crawl_options({"url": SEED})
+    assert copts["seed"] == SEED
+    assert copts["sitemap"] is None
+    assert copts["max_pages"] == 50
+    assert copts["max_depth"] == 2
+    assert copts["concurrency"] == 4
+    assert copts["delay"] == app.CRAWL_DELAY_MS / 1000.0
+    assert copts["max_seconds"] == app.CRAWL_MAX_SECONDS
+    assert copts["same_domain"] and copts["respect_robots"]
+    assert copts["page_opts"]["collect_links"] is True
+
+
+def test_limits_are_capped():
+    copts = app.parse_crawl_options({
+        "url": SEED, "max_pages": 10 ** 9, "max_depth": 10 ** 9, "concurrency": 10 ** 9,
+        "delay_ms": 10 ** 9, "max_seconds": 10 ** 9,
+    })
+    assert copts["max_pages"] == app.CRAWL_MAX_PAGES
+    assert copts["max_depth"] == app.CRAWL_MAX_DEPTH
+    assert copts["concurrency"] == app.CRAWL_MAX_CONCURRENCY
+    assert copts["delay"] == 60.0
+    assert copts["max_seconds"] == app.CRAWL_MAX_SECONDS
+
+
+def test_limits_have_a_floor():
+    copts = app.parse_crawl_options({"url": SEED, "max_pages": -5, "max_depth": -1, "concurrency": 0,
+                                     "delay_ms": -100})
+    assert copts["max_pages"] == 1
+    assert copts["max_depth"] == 0
+    assert copts["concurrency"] == 1
+    assert copts["delay"] == 0.0
+
+
+@pytest.mark.parametrize("value", [None, ""])
+def test_max_seconds_missing_means_default(value):
+    assert app.parse_crawl_options({"url": SEED, "max_seconds": value})["max_seconds"] == app.CRAWL_MAX_SECONDS
+
+
+@pytest.mark.parametrize("value", [30, 2.5, "45"])
+def test_max_seconds_accepts_positive_numbers(value):
+    assert app.parse_crawl_options({"url": SEED, "max_seconds": value})["max_seconds"] == float(value)
+
+
+@pytest.mark.parametrize("value", [0, -1, "nan", "inf", float("nan"), float("inf"), [], [5], {"a": 1}, True, "soon"])
+def test_max_seconds_rejects_unbounded_or_non_numbers(value):
+    with pytest.raises(ValueError, match="max_seconds"):
+        app.parse_crawl_options({"url": SEED, "max_seconds": value})
+
+
+@pytest.mark.parametrize("body", [{}, {"url": "ftp://example.com/"}, {"url": ["https://example.com/"]},
+                                  {"sitemap": "example.com/sitemap.xml"}])
+def test_needs_an_http_url(body):
+    with pytest.raises(ValueError, match="URL"):
+        app.parse_crawl_options(body)
+
+
+def test_invalid_pattern_is_rejected():
+    with pytest.raises(ValueError, match="include"):
+        app.parse_crawl_options({"url": SEED, "include": "("})
+
+
+def test_is_sitemap_turns_the_url_into_the_sitemap():
+    copts = app.parse_crawl_options({"url": "https://example.com/sitemap.xml", "is_sitemap": True})
+    assert copts["seed"] is None
+    assert copts["sitemap"] == "https://example.com/sitemap.xml"
+    assert copts["page_opts"]["is_sitemap"] is False
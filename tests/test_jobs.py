@@ -0,0 +1,105 @@
+import concurrent.futures
+import json
+import threading
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def store(tmp_path):
+    return app.JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def expire_lease(store, job_id):
+    conn = store._connect()
+    try:
+        conn.execute("UPDATE jobs SET started = ? WHERE id = ?", (time.time() - app.JOB_LEASE_SECONDS - 1, job_id))
+    finally:
+        conn.close()
+
+
+def test_import_starts_no_workers():
+    names = {t.name for t in threading.enumerate()}
+    assert not any(name.startswith(("job-worker-", "job-sweeper")) for name in names)
+    assert app.JOB_QUEUE.started_pid is None
+
+
+def test_claim_takes_highest_priority_then_oldest(store):
+    (low,) = store.enqueue([{"url": "https://a.test/1"}], [0])
+    (high,) = store.enqueue([{"url": "https://a.test/2"}], [5])
+    time.sleep(0.01)
+    (high_later,) = store.enqueue([{"url": "https://a.test/3"}], [5])
+    assert [store.claim()["id"] for _ in range(3)] == [high, high_later, low]
+    assert store.claim() is None
+
+
+def test_claim_marks_running_and_counts_attempts(store):
+    (job_id,) = store.enqueue([{"url": "https://a.test/"}], [0])
+    row = store.claim()
+    assert row["id"] == job_id
+    assert row["status"] == "running"
+    assert row["attempts"] == 1
+    assert row["started"] is not None
+    assert store.counts() == {"running": 1}
+
+
+def test_concurrent_claims_never_share_a_job(store):
+    ids = store.enqueue([{"url": f"https://a.test/{i}"} for i in range(40)], [0] * 40)
+
+    def drain():
+        claimed = []
+        while (row := store.claim()) is not None:
+            claimed.append(row["id"])
+        return claimed
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        claimed = [job_id for part in pool.map(lambda _: drain(), range(8)) for job_id in part]
+    assert sorted(claimed) == sorted(ids)
+
+
+def test_sweep_leaves_running_jobs_within_their_lease(store):
+    store.enqueue([{"url": "https://a.test/"}], [0])
+    store.claim()
+    store.sweep()
+    assert store.counts() == {"running": 1}
+
+
+def test_sweep_requeues_a_lost_job_with_attempts_left(store):
+    (job_id,) = store.enqueue([{"url": "https://a.test/"}], [0])
+    store.claim()
+    expire_lease(store, job_id)
+    store.sweep()
+    assert store.get(job_id)["status"] == "queued"
+    assert store.claim()["attempts"] == 2
+
+
+def test_sweep_fails_a_job_out_of_attempts(store):
+    (job_id,) = store.enqueue([{"url": "https://a.test/"}], [0])
+    for _ in range(app.JOB_MAX_ATTEMPTS):
+        assert store.claim()["id"] == job_id
+        expire_lease(store, job_id)
+        store.sweep()
+    row = store.get(job_id)
+    assert row["status"] == "failed"
+    result = json.loads(row["result"])
+    assert result["reason"] == "JOB_ABANDONED"
+    assert result["url"] == "https://a.test/"
+    assert store.claim() is None
+
+
+def test_sweep_drops_expired_results(store):
+    kept, expired = store.enqueue([{"url": "https://a.test/1"}, {"url": "https://a.test/2"}], [0, 0])
+    for job_id in (kept, expired):
+        store.claim()
+        store.finish(job_id, "done", {"ok": True})
+    conn = store._connect()
+    try:
+        conn.execute("UPDATE jobs SET expires = ? WHERE id = ?", (time.time() - 1, expired))
+    finally:
+        conn.close()
+    store.sweep()
+    assert store.get(kept) is not None
+    assert store.get(expired) is None